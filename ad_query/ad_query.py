@@ -6,6 +6,7 @@ Açıklama: Active Directory Sorgu Aracı
 - User ve Computer obje sorgulaması
 - LDAPS (636) bağlantısı
 - Attribute normalizasyonu
+- Schema/root DSE forest başına diske cache'lenir
 - JSON çıktı formatı
 """
 
@@ -13,13 +14,16 @@ import sys
 import os
 import json
 import ssl
+import re
+import time
 from datetime import datetime, timedelta
 
 # ============================================
 # MODÜL KONTROLÜ
 # ============================================
 try:
-    from ldap3 import Server, Connection, SUBTREE, ALL
+    from ldap3 import Server, Connection, SUBTREE, BASE, ALL, NONE
+    from ldap3.protocol.rfc4512 import DsaInfo, SchemaInfo
     LDAP_AVAILABLE = True
 except ImportError:
     print(json.dumps({
@@ -41,6 +45,8 @@ AD_ATTRIBUTES = sys.argv[4] if len(sys.argv) > 4 else None
 AD_USER = os.getenv("AD_USER")
 AD_PASSWORD = os.getenv("AD_PASSWORD")
 DEBUG = os.getenv("AD_QUERY_DEBUG", "false").lower() == "true"
+SCHEMA_CACHE_DIR = os.path.expanduser(os.getenv("AD_QUERY_SCHEMA_CACHE_DIR", "~/.cache/ad_query/schema"))
+SCHEMA_CACHE_TTL = int(os.getenv("AD_QUERY_SCHEMA_CACHE_TTL", "604800"))  # Saniye (7 gün), 0 = cache kapalı
 
 # ============================================
 # DEFAULT ATTRIBUTE LİSTELERİ
@@ -131,6 +137,100 @@ def windows_timestamp_to_datetime(timestamp):
         debug_log(f"Timestamp dönüştürme hatası: {timestamp} - {e}")
         return str(timestamp)
 
+# Server'lar get_info=NONE ile oluşturulur. Attribute formatlaması için gereken
+# schema ve root DSE bilgisi forest başına diske cache'lenir; cache geçerliyse
+# DC'den sadece schemaNamingContext okunur (tek küçük BASE search).
+
+def get_schema_naming_context(conn):
+    """Root DSE'den sadece schemaNamingContext oku"""
+    try:
+        conn.search("", "(objectClass=*)", BASE, attributes=["schemaNamingContext"])
+        values = conn.response[0]["raw_attributes"].get("schemaNamingContext") if conn.response else None
+    except Exception as e:
+        debug_log(f"schemaNamingContext okunamadı: {e}")
+        return None
+    
+    if not values:
+        return None
+    value = values[0]
+    return value.decode("utf-8") if isinstance(value, bytes) else str(value)
+
+def get_schema_cache_paths(schema_naming_context):
+    """Forest cache dosyaları (forest adı schemaNamingContext'in DC= bileşenlerinden)"""
+    parts = [part.split("=", 1)[1] for part in schema_naming_context.split(",") if part.strip().lower().startswith("dc=")]
+    forest = re.sub(r"[^a-z0-9.-]", "_", ".".join(parts).lower()) or "default"
+    base_path = os.path.join(SCHEMA_CACHE_DIR, forest)
+    return f"{base_path}.dsa.json", f"{base_path}.schema.json"
+
+def load_cached_server_info(schema_naming_context):
+    """Geçerli cache varsa (DsaInfo, SchemaInfo), yoksa None
+    
+    Cache TTL'i geçtiyse veya cache'teki schemaNamingContext DC'nin
+    bildirdiğinden farklıysa cache geçersizdir.
+    """
+    dsa_path, schema_path = get_schema_cache_paths(schema_naming_context)
+    
+    try:
+        age = time.time() - os.path.getmtime(schema_path)
+        if age > SCHEMA_CACHE_TTL:
+            debug_log(f"Schema cache süresi dolmuş ({int(age)}s): {schema_path}")
+            return None
+        dsa_info = DsaInfo.from_file(dsa_path)
+        schema_info = SchemaInfo.from_file(schema_path)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        warn_log(f"Schema cache okunamadı ({schema_path}): {e}")
+        return None
+    
+    cached_context = dsa_info.other.get("schemaNamingContext") or [""]
+    if str(cached_context[0]).lower() != schema_naming_context.lower():
+        info_log(f"Schema cache geçersiz (schemaNamingContext değişmiş): {schema_path}")
+        return None
+    
+    return dsa_info, schema_info
+
+def save_server_info(server, schema_naming_context):
+    """Server'ın DSE ve schema bilgisini forest cache'ine yaz (atomik)"""
+    try:
+        os.makedirs(SCHEMA_CACHE_DIR, exist_ok=True)
+        for info, path in zip((server.info, server.schema), get_schema_cache_paths(schema_naming_context)):
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as handle:
+                handle.write(info.to_json(indent=None))
+            os.replace(temp_path, path)
+        debug_log(f"Schema cache yazıldı: {SCHEMA_CACHE_DIR}")
+    except Exception as e:
+        warn_log(f"Schema cache yazılamadı: {e}")
+
+def load_server_info(conn):
+    """Bind edilmiş connection'ın server'ına schema ve root DSE bilgisini yükle
+    
+    Önce forest cache'i denenir; yoksa (veya geçersizse) bilgi DC'den tam
+    okunur ve cache'e yazılır. AD_QUERY_SCHEMA_CACHE_TTL=0 cache'i kapatır.
+    """
+    server = conn.server
+    schema_naming_context = get_schema_naming_context(conn) if SCHEMA_CACHE_TTL > 0 else None
+    
+    if schema_naming_context:
+        cached = load_cached_server_info(schema_naming_context)
+        if cached:
+            server.attach_dsa_info(cached[0])
+            server.attach_schema_info(cached[1])
+            info_log("✓ Schema/DSE cache'ten yüklendi")
+            return
+    
+    # Tam okuma: get_info sadece bu çağrı için ALL (sonraki bind'ler tekrar okumaz)
+    server.get_info = ALL
+    try:
+        server.get_info_from_server(conn)
+    finally:
+        server.get_info = NONE
+    info_log("✓ Schema/DSE DC'den okundu")
+    
+    if schema_naming_context and server.info and server.schema:
+        save_server_info(server, schema_naming_context)
+
 def normalize_attribute_value(attr_name, value):
     """Attribute değerini normalize et
     
@@ -251,7 +351,7 @@ ldap_server_url = f"ldaps://{AD_DOMAIN}:636"
 debug_log(f"LDAP Server: {ldap_server_url}")
 
 try:
-    server = Server(AD_DOMAIN, port=636, use_ssl=True, get_info=ALL, tls=tls_config)
+    server = Server(AD_DOMAIN, port=636, use_ssl=True, get_info=NONE, tls=tls_config)
     debug_log("LDAP Server objesi oluşturuldu")
 except Exception as e:
     error_exit("LDAP Server objesi oluşturulamadı", str(e))
@@ -270,6 +370,9 @@ try:
     )
     info_log("✓ LDAP bağlantısı başarılı")
     debug_log(f"Bind successful - Server: {conn.server}")
+    
+    # Schema/DSE: forest cache'inden, yoksa DC'den okunur ve cache'lenir
+    load_server_info(conn)
 except Exception as e:
     error_message = str(e)
     if "invalidCredentials" in error_message or "Invalid credentials" in error_message:
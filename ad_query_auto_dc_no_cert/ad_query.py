@@ -5,7 +5,9 @@ Dosya: roles/vcenter_vm_create/files/ad_query.py
 Açıklama: Active Directory Sorgu Aracı
 - User ve Computer obje sorgulaması
 - LDAPS (636) bağlantısı
+- Site-aware DC seçimi (AD_QUERY_SITE veya CLDAP netlogon ping)
 - Attribute normalizasyonu
+- Schema/root DSE forest başına diske cache'lenir
 - JSON çıktı formatı
 """
 
@@ -13,13 +15,21 @@ import sys
 import os
 import json
 import ssl
+import re
+import socket
+import time
 from datetime import datetime, timedelta
 
 # ============================================
 # MODÜL KONTROLÜ
 # ============================================
 try:
-    from ldap3 import Server, Connection, SUBTREE, ALL
+    from ldap3 import Server, Connection, SUBTREE, BASE, ALL, NONE, DEREF_NEVER
+    from ldap3.operation.search import search_operation, search_result_entry_response_to_dict_fast
+    from ldap3.protocol.rfc4511 import LDAPMessage, MessageID, ProtocolOp
+    from ldap3.protocol.rfc4512 import DsaInfo, SchemaInfo
+    from ldap3.utils.asn1 import encode as ber_encode, decode_message_fast
+    from ldap3.utils.conv import escape_filter_chars
     LDAP_AVAILABLE = True
 except ImportError:
     print(json.dumps({
@@ -41,6 +51,9 @@ AD_ATTRIBUTES = sys.argv[4] if len(sys.argv) > 4 else None
 AD_USER = os.getenv("AD_USER")
 AD_PASSWORD = os.getenv("AD_PASSWORD")
 DEBUG = os.getenv("AD_QUERY_DEBUG", "false").lower() == "true"
+AD_SITE = os.getenv("AD_QUERY_SITE", "auto").strip()  # auto (CLDAP ping), site adı veya none
+SCHEMA_CACHE_DIR = os.path.expanduser(os.getenv("AD_QUERY_SCHEMA_CACHE_DIR", "~/.cache/ad_query/schema"))
+SCHEMA_CACHE_TTL = int(os.getenv("AD_QUERY_SCHEMA_CACHE_TTL", "604800"))  # Saniye (7 gün), 0 = cache kapalı
 
 # ============================================
 # DEFAULT ATTRIBUTE LİSTELERİ
@@ -131,11 +144,123 @@ def windows_timestamp_to_datetime(timestamp):
         debug_log(f"Timestamp dönüştürme hatası: {timestamp} - {e}")
         return str(timestamp)
 
+# ============================================
+# AD SITE (SITE-AWARE DC SEÇİMİ)
+# ============================================
+# Domain SRV kaydı tüm site'lardaki DC'leri (WAN arkasındakiler dahil) döndürür.
+# Client site'ı AD_QUERY_SITE ile verilir veya CLDAP netlogon ping'i ile DC'ye
+# sorulur (UDP 389, cevaptaki ClientSiteName); site'ta DC varsa o seçilir.
+CLDAP_PORT = 389
+CLDAP_TIMEOUT = 1      # Saniye (UDP, cevap yoksa sıradaki DC)
+CLDAP_PING_LIMIT = 3   # Ping atılan en fazla DC
+NETLOGON_NT_VERSION = "\\06\\00\\00\\00"  # NETLOGON_NT_VERSION_5 | 5EX -> NETLOGON_SAM_LOGON_RESPONSE_EX
+
+def read_netlogon_name(data, offset):
+    """RFC 1035 sıkıştırılmış DNS adı: (ad, sonraki alanın offset'i)"""
+    labels = []
+    next_offset = None
+    while data[offset] != 0:
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            pointer = ((length & 0x3F) << 8) | data[offset + 1]
+            if pointer >= offset:
+                raise ValueError("Geçersiz netlogon DNS pointer'ı")
+            if next_offset is None:
+                next_offset = offset + 2
+            offset = pointer
+            continue
+        labels.append(data[offset + 1:offset + 1 + length].decode("utf-8"))
+        offset += 1 + length
+    return ".".join(labels), next_offset if next_offset is not None else offset + 1
+
+def parse_netlogon_response(data):
+    """NETLOGON_SAM_LOGON_RESPONSE_EX'ten (client site, DC site)
+    
+    Opcode(2) Sbz(2) Flags(4) DomainGuid(16) sonrası sırasıyla DnsForestName,
+    DnsDomainName, DnsHostName, NetbiosDomainName, NetbiosComputerName,
+    UserName, DcSiteName, ClientSiteName.
+    """
+    names = []
+    offset = 24
+    for _ in range(8):
+        name, offset = read_netlogon_name(data, offset)
+        names.append(name)
+    return names[7] or None, names[6] or None
+
+def netlogon_ping(dc, domain):
+    """DC'ye CLDAP netlogon ping'i: (client site, DC site)"""
+    search_filter = f"(&(DnsDomain={escape_filter_chars(domain)})(NtVer={NETLOGON_NT_VERSION}))"
+    message = LDAPMessage()
+    message["messageID"] = MessageID(1)
+    message["protocolOp"] = ProtocolOp().setComponentByName(
+        "searchRequest",
+        search_operation("", search_filter, BASE, DEREF_NEVER, ["Netlogon"], 0, 0, False, False, True)
+    )
+    
+    family, _, _, _, address = socket.getaddrinfo(dc, CLDAP_PORT, type=socket.SOCK_DGRAM)[0]
+    with socket.socket(family, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(CLDAP_TIMEOUT)
+        sock.sendto(ber_encode(message), address)
+        data = sock.recv(4096)
+    
+    response = decode_message_fast(data)
+    if response["protocolOp"] != 4:  # searchResEntry
+        raise ValueError("Netlogon cevabı yok")
+    raw_attributes = search_result_entry_response_to_dict_fast(response["payload"], None, None, False)["raw_attributes"]
+    values = raw_attributes.get("netlogon")
+    if not values:
+        raise ValueError("Netlogon attribute'ü boş")
+    return parse_netlogon_response(values[0])
+
+def get_client_site(domain, dc_hostnames):
+    """Client site'ı (AD_QUERY_SITE veya ilk cevap veren DC'nin netlogon cevabı), yoksa None"""
+    if AD_SITE.lower() == "none" or not AD_SITE:
+        return None
+    if AD_SITE.lower() != "auto":
+        return AD_SITE
+    
+    for dc in dc_hostnames[:CLDAP_PING_LIMIT]:
+        try:
+            client_site, dc_site = netlogon_ping(dc, domain)
+        except Exception as e:
+            debug_log(f"CLDAP netlogon ping başarısız ({dc}): {e}")
+            continue
+        
+        debug_log(f"CLDAP netlogon: {dc} (DC site: {dc_site}, client site: {client_site})")
+        if not client_site:
+            # Client IP'si hiçbir site subnet'ine eşlenmemiş, diğer DC'ler de aynı cevabı verir
+            info_log("Client site'ı bulunamadı (subnet tanımlı değil)")
+        return client_site
+    
+    warn_log("CLDAP netlogon ping cevapsız, site'sız DC seçilecek")
+    return None
+
+def discover_site_domain_controller(domain, dc_hostnames):
+    """Client site'ının ilk DC'si (site bilinmiyorsa veya site'ta DC yoksa None)"""
+    import dns.resolver
+    
+    site = get_client_site(domain, dc_hostnames)
+    if not site:
+        return None
+    
+    srv_record = f"_ldap._tcp.{site}._sites.dc._msdcs.{domain}"
+    try:
+        debug_log(f"DNS SRV query: {srv_record}")
+        answers = dns.resolver.resolve(srv_record, 'SRV')
+    except Exception as e:
+        warn_log(f"Site DC'si bulunamadı ({srv_record}): {e}")
+        return None
+    
+    site_dc = str(sorted(answers, key=lambda x: (x.priority, -x.weight))[0].target).rstrip('.')
+    info_log(f"✓ Site '{site}' DC'si: {site_dc}")
+    return site_dc
+
 def discover_domain_controller(domain):
     """DNS SRV query ile DC bul
     
     Domain'den otomatik DC hostname'i bulur.
     Sertifika hostname matching için gerekli.
+    Client site'ında DC varsa site'ın DC'si seçilir.
     
     Örnek:
     - Input: test.local.net
@@ -153,8 +278,9 @@ def discover_domain_controller(domain):
         # Priority/weight sıralamasıyla DC listesi
         dc_list = sorted(answers, key=lambda x: (x.priority, -x.weight))
         
-        # İlk DC'yi al
-        dc_hostname = str(dc_list[0].target).rstrip('.')
+        # İlk DC'yi al (client site'ında DC varsa site'ın ilk DC'si)
+        dc_hostnames = [str(dc.target).rstrip('.') for dc in dc_list]
+        dc_hostname = discover_site_domain_controller(domain, dc_hostnames) or dc_hostnames[0]
         
         info_log(f"✓ DC bulundu: {dc_hostname}")
         debug_log(f"Toplam DC sayısı: {len(dc_list)}")
@@ -177,6 +303,100 @@ def discover_domain_controller(domain):
         warn_log("Domain direkt kullanılacak")
         return domain
 
+# Server'lar get_info=NONE ile oluşturulur. Attribute formatlaması için gereken
+# schema ve root DSE bilgisi forest başına diske cache'lenir; cache geçerliyse
+# DC'den sadece schemaNamingContext okunur (tek küçük BASE search).
+
+def get_schema_naming_context(conn):
+    """Root DSE'den sadece schemaNamingContext oku"""
+    try:
+        conn.search("", "(objectClass=*)", BASE, attributes=["schemaNamingContext"])
+        values = conn.response[0]["raw_attributes"].get("schemaNamingContext") if conn.response else None
+    except Exception as e:
+        debug_log(f"schemaNamingContext okunamadı: {e}")
+        return None
+    
+    if not values:
+        return None
+    value = values[0]
+    return value.decode("utf-8") if isinstance(value, bytes) else str(value)
+
+def get_schema_cache_paths(schema_naming_context):
+    """Forest cache dosyaları (forest adı schemaNamingContext'in DC= bileşenlerinden)"""
+    parts = [part.split("=", 1)[1] for part in schema_naming_context.split(",") if part.strip().lower().startswith("dc=")]
+    forest = re.sub(r"[^a-z0-9.-]", "_", ".".join(parts).lower()) or "default"
+    base_path = os.path.join(SCHEMA_CACHE_DIR, forest)
+    return f"{base_path}.dsa.json", f"{base_path}.schema.json"
+
+def load_cached_server_info(schema_naming_context):
+    """Geçerli cache varsa (DsaInfo, SchemaInfo), yoksa None
+    
+    Cache TTL'i geçtiyse veya cache'teki schemaNamingContext DC'nin
+    bildirdiğinden farklıysa cache geçersizdir.
+    """
+    dsa_path, schema_path = get_schema_cache_paths(schema_naming_context)
+    
+    try:
+        age = time.time() - os.path.getmtime(schema_path)
+        if age > SCHEMA_CACHE_TTL:
+            debug_log(f"Schema cache süresi dolmuş ({int(age)}s): {schema_path}")
+            return None
+        dsa_info = DsaInfo.from_file(dsa_path)
+        schema_info = SchemaInfo.from_file(schema_path)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        warn_log(f"Schema cache okunamadı ({schema_path}): {e}")
+        return None
+    
+    cached_context = dsa_info.other.get("schemaNamingContext") or [""]
+    if str(cached_context[0]).lower() != schema_naming_context.lower():
+        info_log(f"Schema cache geçersiz (schemaNamingContext değişmiş): {schema_path}")
+        return None
+    
+    return dsa_info, schema_info
+
+def save_server_info(server, schema_naming_context):
+    """Server'ın DSE ve schema bilgisini forest cache'ine yaz (atomik)"""
+    try:
+        os.makedirs(SCHEMA_CACHE_DIR, exist_ok=True)
+        for info, path in zip((server.info, server.schema), get_schema_cache_paths(schema_naming_context)):
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as handle:
+                handle.write(info.to_json(indent=None))
+            os.replace(temp_path, path)
+        debug_log(f"Schema cache yazıldı: {SCHEMA_CACHE_DIR}")
+    except Exception as e:
+        warn_log(f"Schema cache yazılamadı: {e}")
+
+def load_server_info(conn):
+    """Bind edilmiş connection'ın server'ına schema ve root DSE bilgisini yükle
+    
+    Önce forest cache'i denenir; yoksa (veya geçersizse) bilgi DC'den tam
+    okunur ve cache'e yazılır. AD_QUERY_SCHEMA_CACHE_TTL=0 cache'i kapatır.
+    """
+    server = conn.server
+    schema_naming_context = get_schema_naming_context(conn) if SCHEMA_CACHE_TTL > 0 else None
+    
+    if schema_naming_context:
+        cached = load_cached_server_info(schema_naming_context)
+        if cached:
+            server.attach_dsa_info(cached[0])
+            server.attach_schema_info(cached[1])
+            info_log("✓ Schema/DSE cache'ten yüklendi")
+            return
+    
+    # Tam okuma: get_info sadece bu çağrı için ALL (sonraki bind'ler tekrar okumaz)
+    server.get_info = ALL
+    try:
+        server.get_info_from_server(conn)
+    finally:
+        server.get_info = NONE
+    info_log("✓ Schema/DSE DC'den okundu")
+    
+    if schema_naming_context and server.info and server.schema:
+        save_server_info(server, schema_naming_context)
+
 def normalize_attribute_value(attr_name, value):
     """Attribute değerini normalize et
     
@@ -353,7 +573,7 @@ try:
         AD_SERVER,
         port=636,
         use_ssl=True,
-        get_info=ALL,
+        get_info=NONE,
         tls=tls_config,
         connect_timeout=LDAP_TIMEOUT
     )
@@ -376,6 +596,9 @@ try:
     )
     info_log("✓ LDAP bağlantısı başarılı")
     debug_log(f"Bind successful - Server: {conn.server}")
+    
+    # Schema/DSE: forest cache'inden, yoksa DC'den okunur ve cache'lenir
+    load_server_info(conn)
 except Exception as e:
     error_message = str(e)
     if "invalidCredentials" in error_message or "Invalid credentials" in error_message:
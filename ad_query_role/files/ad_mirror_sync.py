@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Dosya: roles/ad_query/files/ad_mirror_sync.py
+Açıklama: Active Directory -> yerel SQLite mirror senkronizasyonu
+
+Özellikler:
+- User, Computer, Group objeleri domain başına tek SQLite dosyasında tutulur
+  (ad_query.py --source=mirror bu dosyadan cevap verir)
+- Incremental sync: highestCommittedUSN watermark + (uSNChanged>=N) paged search
+- Silinen objeler tombstone'lardan (Show Deleted control) mirror'dan düşülür
+- Değişip artık sync filtresine uymayan objeler (örn. objectClass değişimi) düşülür
+- base_dn dışına tombstone bırakmadan çıkan objeleri sadece tam sync (--full) temizler
+- USN DC'ye özel: sync DC'si değişirse tam sync yapılır
+- DC discovery, failover, TLS, schema cache ve normalizasyon ad_query.py'den
+
+Kullanım: ad_mirror_sync.py <domain> [--full]
+"""
+
+import sys
+import os
+import json
+import sqlite3
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import ad_query
+from ad_query import info_log, debug_log, error_exit
+
+# ============================================
+# PARAMETRELER
+# ============================================
+SYNC_ARGS = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+SYNC_DOMAIN = SYNC_ARGS[0] if SYNC_ARGS else None
+FULL_SYNC = "--full" in sys.argv[1:]
+
+# Default attribute listelerine ek olarak mirror'a yazılacak attribute'ler
+EXTRA_ATTRIBUTES = [attr.strip().lower() for attr in os.getenv("AD_MIRROR_ATTRIBUTES", "").split(",") if attr.strip()]
+
+MIRROR_ATTRIBUTES = {
+    "user": ad_query.DEFAULT_USER_ATTRIBUTES + EXTRA_ATTRIBUTES,
+    "computer": ad_query.DEFAULT_COMPUTER_ATTRIBUTES + EXTRA_ATTRIBUTES,
+    "group": ad_query.DEFAULT_GROUP_ATTRIBUTES + EXTRA_ATTRIBUTES
+}
+
+# ============================================
+# LDAP TANIMLARI
+# ============================================
+SHOW_DELETED_OID = "1.2.840.113556.1.4.417"
+SYNC_FILTER = "(|(&(objectClass=user)(objectCategory=person))(objectClass=computer)(objectClass=group))"
+SYNC_CONTROL_ATTRIBUTES = ["objectGUID", "objectClass", "uSNChanged"]
+
+MIRROR_SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    guid TEXT PRIMARY KEY,
+    object_type TEXT NOT NULL,
+    search_key TEXT COLLATE NOCASE,
+    dn TEXT NOT NULL,
+    server TEXT,
+    usn_changed INTEGER,
+    attributes TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS objects_lookup ON objects (object_type, search_key);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# ============================================
+# MIRROR VERİTABANI
+# ============================================
+
+def open_mirror(mirror_path):
+    """Mirror veritabanını aç (yoksa oluştur, dizin sadece kullanıcıya açık)"""
+    os.makedirs(os.path.dirname(mirror_path), mode=0o700, exist_ok=True)
+    db = sqlite3.connect(mirror_path)
+    db.execute("PRAGMA journal_mode=WAL")  # Sync sırasında okuyan ad_query eski snapshot'ı görür
+    db.executescript(MIRROR_SCHEMA)
+    return db
+
+def load_sync_state(db):
+    """Son sync durumu (server, domain, highest_usn, synced_at)"""
+    return dict(db.execute("SELECT key, value FROM sync_state").fetchall())
+
+def save_sync_state(db, state):
+    """Sync durumunu yaz (transaction içinde)"""
+    db.executemany("INSERT OR REPLACE INTO sync_state (key, value) VALUES (?, ?)", list(state.items()))
+
+# ============================================
+# LDAP OKUMA
+# ============================================
+
+def read_highest_usn(conn):
+    """Root DSE'den DC'nin highestCommittedUSN değeri"""
+    conn.search("", "(objectClass=*)", ad_query.BASE, attributes=["highestCommittedUSN"])
+    values = ad_query.get_raw_values(conn.response[0]["raw_attributes"], "highestCommittedUSN") if conn.response else []
+    if not values:
+        raise RuntimeError("highestCommittedUSN okunamadı")
+    value = values[0]
+    return int(value.decode("utf-8") if isinstance(value, bytes) else value)
+
+def get_first_raw(raw_attributes, attr_name):
+    """Raw attribute'ün ilk değeri (yoksa None)"""
+    values = ad_query.get_raw_values(raw_attributes, attr_name)
+    return values[0] if values else None
+
+def get_object_type(raw_attributes):
+    """objectClass listesinden mirror object tipi (user/computer/group)"""
+    classes = [value.decode("utf-8").lower() if isinstance(value, bytes) else str(value).lower()
+               for value in ad_query.get_raw_values(raw_attributes, "objectClass")]
+    if "computer" in classes:
+        return "computer"
+    if "group" in classes:
+        return "group"
+    if "user" in classes:
+        return "user"
+    return None
+
+def get_search_attributes():
+    """Sync search'ünde okunacak attribute'ler (tüm tipler + kontrol attribute'leri)"""
+    attributes = []
+    for attr in SYNC_CONTROL_ATTRIBUTES + [attr for attrs in MIRROR_ATTRIBUTES.values() for attr in attrs] + list(ad_query.SEARCH_KEY_ATTRIBUTES.values()):
+        if attr.lower() not in [existing.lower() for existing in attributes]:
+            attributes.append(attr)
+    return ad_query.get_search_attributes(attributes)
+
+def build_mirror_row(conn, server, response):
+    """Search response'undan mirror satırı (tip dışı objeler için None)"""
+    raw_attributes = response["raw_attributes"]
+    object_type = get_object_type(raw_attributes)
+    guid = get_first_raw(raw_attributes, "objectGUID")
+    if object_type is None or guid is None:
+        return None
+    
+    requested_attributes = MIRROR_ATTRIBUTES[object_type]
+    read_members = "member" in requested_attributes
+    record = ad_query.build_response_record(conn, response, requested_attributes, read_members)
+    
+    search_key = get_first_raw(raw_attributes, ad_query.SEARCH_KEY_ATTRIBUTES[object_type])
+    usn_changed = get_first_raw(raw_attributes, "uSNChanged")
+    
+    return (
+        bytes(guid).hex(),
+        object_type,
+        search_key.decode("utf-8") if isinstance(search_key, bytes) else search_key,
+        response["dn"],
+        server,
+        int(usn_changed) if usn_changed is not None else None,
+        json.dumps(record["attributes"], ensure_ascii=False)
+    )
+
+def sync_changed_objects(conn, db, server, base_dn, from_usn):
+    """uSNChanged >= from_usn olan objeleri mirror'a yaz (sayfa sayfa)
+    
+    Sadece SYNC_FILTER'a uyan objeler yazılır; uymaz hale gelenleri
+    sync_unmatched_objects düşer. base_dn dışına çıkan (ve tombstone
+    bırakmayan) objeler incremental sync'te görünmez, tam sync gerekir.
+    
+    Returns: (yazılan obje sayısı, incremental'da yazılan GUID'ler / tam sync'te None)
+    """
+    search_filter = f"(&{SYNC_FILTER}(uSNChanged>={from_usn}))" if from_usn > 0 else SYNC_FILTER
+    debug_log(f"Sync filter: {search_filter}")
+    
+    count = 0
+    synced_guids = set() if from_usn > 0 else None
+    for page in ad_query.iter_paged_search(conn, base_dn, search_filter, get_search_attributes()):
+        rows = []
+        for response in page:
+            if response.get("type") != "searchResEntry":
+                continue
+            row = build_mirror_row(conn, server, response)
+            if row is not None:
+                rows.append(row)
+        
+        db.executemany(
+            "INSERT OR REPLACE INTO objects (guid, object_type, search_key, dn, server, usn_changed, attributes) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            rows
+        )
+        count += len(rows)
+        if synced_guids is not None:
+            synced_guids.update(row[0] for row in rows)
+        debug_log(f"Sync: {count} obje yazıldı")
+    
+    return count, synced_guids
+
+def delete_objects(db, guids):
+    """GUID listesini mirror'dan sil (silinen satır sayısı)"""
+    before = db.total_changes
+    db.executemany("DELETE FROM objects WHERE guid = ?", [(guid,) for guid in guids])
+    return db.total_changes - before
+
+def iter_page_guids(page):
+    """Search sayfasındaki objelerin GUID'leri (hex)"""
+    for response in page:
+        if response.get("type") != "searchResEntry":
+            continue
+        guid = get_first_raw(response["raw_attributes"], "objectGUID")
+        if guid is not None:
+            yield bytes(guid).hex()
+
+def sync_unmatched_objects(conn, db, base_dn, from_usn, synced_guids):
+    """from_usn sonrası değişip artık SYNC_FILTER'a uymayan objeleri mirror'dan düş
+    
+    Değişen objeler tip filtresi olmadan aranır; sync_changed_objects'in
+    yazmadığı GUID'ler filtre dışına çıkmıştır. İki search arasında filtreye
+    yeniden giren obje silinse de uSNChanged'i watermark'tan büyük olduğundan
+    sonraki sync'te geri yazılır.
+    """
+    search_filter = f"(uSNChanged>={from_usn})"
+    
+    count = 0
+    for page in ad_query.iter_paged_search(conn, base_dn, search_filter, ["objectGUID"]):
+        count += delete_objects(db, [guid for guid in iter_page_guids(page) if guid not in synced_guids])
+    
+    return count
+
+def sync_deleted_objects(conn, db, base_dn, from_usn):
+    """from_usn sonrası silinen objeleri (tombstone) mirror'dan düş"""
+    search_filter = f"(&(isDeleted=TRUE)(uSNChanged>={from_usn}))"
+    controls = [(SHOW_DELETED_OID, True, None)]
+    
+    count = 0
+    for page in ad_query.iter_paged_search(conn, base_dn, search_filter, ["objectGUID"], controls=controls):
+        count += delete_objects(db, list(iter_page_guids(page)))
+    
+    return count
+
+# ============================================
+# MAIN
+# ============================================
+
+def main():
+    """Ana akış"""
+    if not SYNC_DOMAIN:
+        error_exit("Domain parametresi eksik", "Kullanım: ad_mirror_sync.py <domain> [--full]")
+    
+    if not ad_query.AD_USER or not ad_query.AD_PASSWORD:
+        error_exit("AD credentials eksik", "AD_USER ve AD_PASSWORD environment variable'ları gerekli")
+    
+    if ad_query.GC_MODE:
+        error_exit("Mirror sync GC modunda çalışmaz", "AD_QUERY_GC kapalı olmalı (mirror domain başına tutulur)")
+    
+    mirror_path = ad_query.get_mirror_path(SYNC_DOMAIN)
+    try:
+        db = open_mirror(mirror_path)
+        state = load_sync_state(db)
+    except (sqlite3.Error, OSError) as e:
+        error_exit(f"Mirror açılamadı: {mirror_path}", str(e))
+    
+    base_dn = ad_query.generate_base_dn(SYNC_DOMAIN)
+    dc_list = ad_query.discover_all_domain_controllers(SYNC_DOMAIN)
+    tls_config = ad_query.create_tls_config()
+    
+    server, conn = ad_query.test_credentials_on_first_dc(dc_list, tls_config)
+    ad_query.load_server_info(conn)
+    
+    try:
+        # Watermark search'ten önce okunur: sync sırasındaki değişiklikler sonraki sync'te gelir
+        highest_usn = read_highest_usn(conn)
+        
+        incremental = (
+            not FULL_SYNC
+            and state.get("server") == server
+            and state.get("domain", "").lower() == SYNC_DOMAIN.lower()
+            and state.get("highest_usn") is not None
+        )
+        from_usn = int(state["highest_usn"]) + 1 if incremental else 0
+        
+        info_log("=" * 60)
+        info_log(f"MIRROR SYNC ({'incremental' if incremental else 'full'})")
+        info_log("=" * 60)
+        info_log(f"Server: {server}")
+        info_log(f"USN: {from_usn} -> {highest_usn}")
+        
+        with db:
+            if not incremental:
+                db.execute("DELETE FROM objects")
+            
+            upserted, synced_guids = sync_changed_objects(conn, db, server, base_dn, from_usn)
+            deleted = 0
+            if incremental:
+                deleted += sync_deleted_objects(conn, db, base_dn, from_usn)
+                deleted += sync_unmatched_objects(conn, db, base_dn, from_usn, synced_guids)
+            
+            save_sync_state(db, {
+                "server": server,
+                "domain": SYNC_DOMAIN,
+                "highest_usn": str(highest_usn),
+                "synced_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            })
+        
+        total = db.execute("SELECT COUNT(*) FROM objects").fetchone()[0]
+    
+    except Exception as e:
+        error_exit("Mirror sync başarısız", str(e))
+    
+    finally:
+        ad_query.release_connection(conn)
+        db.close()
+    
+    info_log(f"✓ Sync tamamlandı: {upserted} güncellendi, {deleted} silindi, toplam {total}")
+    
+    print(json.dumps({
+        "success": True,
+        "domain": SYNC_DOMAIN,
+        "server": server,
+        "mode": "incremental" if incremental else "full",
+        "from_usn": from_usn,
+        "to_usn": highest_usn,
+        "upserted": upserted,
+        "deleted": deleted,
+        "total": total,
+        "mirror": mirror_path
+    }, ensure_ascii=False))
+    sys.exit(0)
+
+if __name__ == "__main__":
+    main()
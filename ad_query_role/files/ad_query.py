@@ -7,25 +7,58 @@ Açıklama: Active Directory Multi-DC Query Aracı
 Özellikler:
 - User, Computer, Group obje sorgulaması
 - Multi-DC support (DNS SRV discovery)
-- Retry logic (her DC için 3 retry, 5s interval)
+- Site-aware discovery: client site'ının (AD_QUERY_SITE veya CLDAP netlogon ping)
+  DC'leri listenin başına alınır, diğer DC'ler failover/replication için sonda
+- ServerPool failover: active health check, erişilemeyen DC beklemeden atlanır
+- Retry/backoff bütçesi tüm sorgu için (DC başına değil), exponential backoff
+- DC'ler eşzamanlı sorgulanır (limitli), ilk bulan DC kazanır, diğerleri iptal edilir
 - Certificate fallback (yoksa CERT_NONE)
-- Tek bind (credential test), sonra multi-DC search
-- Group member sample (count + ilk N üye)
+- Credential test bind'i search aşamasında aynı DC için tekrar kullanılır
+- Group member range retrieval (member;range=X-Y): sample, count veya full liste
 - Attribute normalizasyonu (timestamp, binary, null)
+- Schema/root DSE forest başına diske cache'lenir (her bind'da tam okuma yok)
+- Batch mod: terim listesi (JSON liste, @dosya veya stdin) tek bind üzerinde
+  chunk'lı OR filtreleriyle sorgulanır, sonuç terim bazlı dict olarak döner
+- Export mod: LDAP filtresi + base DN ile paged search (Simple Paged Results),
+  kayıtlar NDJSON olarak stdout'a veya dosyaya stream edilir (bellek sayfa ile sınırlı)
+- Transitive üyelik: group -> tüm nested üyeler (LDAP_MATCHING_RULE_IN_CHAIN),
+  user -> tüm nested gruplar (tokenGroups + batch SID çözümleme)
+- DN çözümleme (opsiyonel): member/memberof/manager DN'leri chunk'lı OR filtreleriyle
+  tek connection'da okunur (LRU cache), friendly name'li objeler olarak döner
+- Sonuç cache'i (opsiyonel): TTL içindeki sonuçlar DC'ye gitmeden döner, süresi dolan
+  kayıt uSNChanged/whenChanged base read'i ile doğrulanır
+- Mirror kaynak (--source=mirror): ad_mirror_sync.py'nin tuttuğu yerel SQLite
+  index'inden DC'ye gitmeden cevap
+- Global Catalog modu (--gc): forest'taki tüm domain'ler tek search'te (port 3269,
+  _gc._tcp SRV), sonuçta object'in domain'i, attribute'ler PAS ile sınırlı
 """
 
 import sys
 import os
 import json
 import ssl
+import re
+import hashlib
+import socket
+import sqlite3
 import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta
 
 # ============================================
 # MODÜL KONTROLÜ
 # ============================================
 try:
-    from ldap3 import Server, Connection, SUBTREE, ALL, Tls
+    from ldap3 import Server, ServerPool, Connection, SUBTREE, BASE, ALL, NONE, FIRST, DEREF_NEVER, Tls, set_config_parameter
+    from ldap3.core.exceptions import LDAPServerPoolExhaustedError
+    from ldap3.operation.search import search_operation, search_result_entry_response_to_dict_fast
+    from ldap3.protocol.rfc4511 import LDAPMessage, MessageID, ProtocolOp
+    from ldap3.protocol.rfc4512 import DsaInfo, SchemaInfo
+    from ldap3.protocol.formatters.formatters import format_sid
+    from ldap3.utils.conv import escape_filter_chars, escape_bytes
+    from ldap3.utils.asn1 import encode as ber_encode, decode_message_fast
     LDAP_AVAILABLE = True
 except ImportError:
     print(json.dumps({
@@ -44,20 +77,43 @@ except ImportError:
 # ============================================
 # PARAMETRELER
 # ============================================
-AD_OBJECT = sys.argv[1].lower() if len(sys.argv) > 1 else None
-AD_DOMAIN = sys.argv[2] if len(sys.argv) > 2 else None
-AD_SEARCH = sys.argv[3] if len(sys.argv) > 3 else None
-AD_ATTRIBUTES = sys.argv[4] if len(sys.argv) > 4 and sys.argv[4].strip() else None
+# --source=ldap|mirror ve --gc opsiyonları pozisyonel parametrelerden ayrılır
+ARGS = [arg for arg in sys.argv[1:] if not arg.startswith("--source=") and arg != "--gc"]
+SOURCE_OPTIONS = [arg.split("=", 1)[1] for arg in sys.argv[1:] if arg.startswith("--source=")]
+
+AD_OBJECT = ARGS[0].lower() if len(ARGS) > 0 else None
+AD_DOMAIN = ARGS[1] if len(ARGS) > 1 else None
+AD_SEARCH = ARGS[2] if len(ARGS) > 2 else None  # Tek terim, JSON liste, "@/dosya/yolu", "-" (stdin) veya LDAP filtresi (export)
+AD_ATTRIBUTES = ARGS[3] if len(ARGS) > 3 and ARGS[3].strip() else None
 
 # Environment Variables
 AD_USER = os.getenv("AD_USER")
 AD_PASSWORD = os.getenv("AD_PASSWORD")
 AD_CERT_PATH = os.getenv("AD_CERT_PATH", "/etc/ssl/certs/ad_chain.crt")
 LDAP_TIMEOUT = int(os.getenv("LDAP_TIMEOUT", "10"))
-MAX_RETRIES = int(os.getenv("AD_QUERY_MAX_RETRIES", "3"))
-RETRY_DELAY = int(os.getenv("AD_QUERY_RETRY_DELAY", "5"))
+MAX_RETRIES = int(os.getenv("AD_QUERY_MAX_RETRIES", "3"))          # Sorgu geneli toplam retry bütçesi
+RETRY_DELAY = int(os.getenv("AD_QUERY_RETRY_DELAY", "5"))          # Backoff başlangıcı (her retry'da 2 katı)
+RETRY_DELAY_MAX = int(os.getenv("AD_QUERY_RETRY_DELAY_MAX", "30"))
 MEMBER_SAMPLE_SIZE = int(os.getenv("MEMBER_SAMPLE_SIZE", "10"))
+MEMBER_MODE = os.getenv("AD_QUERY_MEMBER_MODE", "count").lower()   # sample / count / full
+BATCH_SIZE = int(os.getenv("AD_QUERY_BATCH_SIZE", "50"))
+SEARCH_CONCURRENCY = int(os.getenv("AD_QUERY_SEARCH_CONCURRENCY", "4"))  # Aynı anda sorgulanan DC sayısı
 DEBUG = os.getenv("AD_QUERY_DEBUG", "false").lower() == "true"
+SCHEMA_CACHE_DIR = os.path.expanduser(os.getenv("AD_QUERY_SCHEMA_CACHE_DIR", "~/.cache/ad_query/schema"))
+SCHEMA_CACHE_TTL = int(os.getenv("AD_QUERY_SCHEMA_CACHE_TTL", "604800"))  # Saniye (7 gün), 0 = cache kapalı
+EXPORT_PAGE_SIZE = int(os.getenv("AD_QUERY_EXPORT_PAGE_SIZE", "500"))  # AD MaxPageSize default 1000
+EXPORT_BASE_DN = os.getenv("AD_QUERY_EXPORT_BASE_DN")                  # Boşsa domain base DN
+EXPORT_FILE = os.getenv("AD_QUERY_EXPORT_FILE")                        # Boşsa NDJSON stdout'a yazılır
+RESOLVE_DNS = os.getenv("AD_QUERY_RESOLVE_DNS", "false").lower() == "true"
+RESOLVE_ATTRIBUTES = [attr.strip().lower() for attr in os.getenv("AD_QUERY_RESOLVE_ATTRIBUTES", "samaccountname,displayname").split(",") if attr.strip()]
+RESOLVE_CACHE_SIZE = int(os.getenv("AD_QUERY_RESOLVE_CACHE_SIZE", "10000"))  # Çalışma boyunca tutulan DN sayısı
+RESULT_CACHE_DIR = os.path.expanduser(os.getenv("AD_QUERY_RESULT_CACHE_DIR", "~/.cache/ad_query/results"))
+RESULT_CACHE_TTL = int(os.getenv("AD_QUERY_RESULT_CACHE_TTL", "0"))  # Saniye, 0 = cache kapalı (default)
+QUERY_SOURCE = (SOURCE_OPTIONS[-1] if SOURCE_OPTIONS else os.getenv("AD_QUERY_SOURCE", "ldap")).lower()  # ldap / mirror
+MIRROR_DIR = os.path.expanduser(os.getenv("AD_QUERY_MIRROR_DIR", "~/.cache/ad_query/mirror"))
+GC_MODE = "--gc" in sys.argv[1:] or os.getenv("AD_QUERY_GC", "false").lower() == "true"
+AD_SITE = os.getenv("AD_QUERY_SITE", "auto").strip()  # auto (CLDAP ping), site adı veya none
+GC_BASE_DN = os.getenv("AD_QUERY_GC_BASE_DN", "")  # Boşsa tüm forest (GC'de boş base tüm NC'leri kapsar)
 
 # ============================================
 # DEFAULT ATTRIBUTE LİSTELERİ
@@ -77,6 +133,30 @@ DEFAULT_GROUP_ATTRIBUTES = [
     "member", "memberof", "whencreated", "whenchanged", "grouptype", "mail"
 ]
 
+DEFAULT_EXPORT_ATTRIBUTES = [
+    "cn", "distinguishedname", "samaccountname", "objectclass", "whenchanged"
+]
+
+DEFAULT_TRANSITIVE_ATTRIBUTES = [
+    "cn", "samaccountname", "objectclass"
+]
+
+# ============================================
+# SEARCH FILTER TANIMLARI
+# ============================================
+# Object tipine göre class filtresi ve arama teriminin eşleştiği attribute
+OBJECT_CLASS_FILTERS = {
+    "user": "(objectClass=user)(objectCategory=person)",
+    "computer": "(objectClass=computer)",
+    "group": "(objectClass=group)"
+}
+
+SEARCH_KEY_ATTRIBUTES = {
+    "user": "sAMAccountName",
+    "computer": "cn",
+    "group": "cn"
+}
+
 # ============================================
 # YARDIMCI FONKSİYONLAR
 # ============================================
@@ -109,34 +189,53 @@ def generate_base_dn(domain):
     debug_log(f"Base DN: {base_dn}")
     return base_dn
 
+def get_dn_domain(dn):
+    """DN'in DC= bileşenlerinden domain adı (CN=x,DC=emea,DC=corp,DC=com -> emea.corp.com)"""
+    parts = [part.split("=", 1)[1] for part in dn.split(",") if part.strip().lower().startswith("dc=")]
+    return ".".join(part.strip() for part in parts).lower()
+
+def get_srv_record(domain, site=None):
+    """DC (GC modunda GC) SRV kaydı, site verilirse site'a özel kayıt"""
+    if GC_MODE:
+        return f"_gc._tcp.{site}._sites.{domain}" if site else f"_gc._tcp.{domain}"
+    return f"_ldap._tcp.{site}._sites.dc._msdcs.{domain}" if site else f"_ldap._tcp.dc._msdcs.{domain}"
+
+def query_srv_hosts(srv_record):
+    """SRV kaydındaki host'lar (priority/weight sıralı)"""
+    debug_log(f"DNS SRV query: {srv_record}")
+    answers = dns.resolver.resolve(srv_record, 'SRV')
+    
+    # Priority/weight sıralaması
+    dc_list_sorted = sorted(answers, key=lambda x: (x.priority, -x.weight))
+    dc_hostnames = [str(dc.target).rstrip('.') for dc in dc_list_sorted]
+    
+    for idx, (dc, srv) in enumerate(zip(dc_hostnames, dc_list_sorted)):
+        debug_log(f"  DC #{idx+1}: {dc} (priority={srv.priority}, weight={srv.weight})")
+    
+    return dc_hostnames
+
 def discover_all_domain_controllers(domain):
-    """DNS SRV query ile tüm DC'leri bul ve sırala"""
-    srv_record = f"_ldap._tcp.dc._msdcs.{domain}"
+    """DNS SRV query ile tüm DC'leri (GC modunda forest'in GC'lerini) bul ve sırala
+    
+    Client site'ı biliniyorsa site'ın DC'leri listenin başındadır.
+    """
+    srv_record = get_srv_record(domain)
     
     if not DNS_AVAILABLE:
         warn_log("dnspython modülü yok, domain direkt kullanılacak")
         return [domain]
     
     try:
-        debug_log(f"DNS SRV query: {srv_record}")
-        answers = dns.resolver.resolve(srv_record, 'SRV')
-        
-        # Priority/weight sıralaması
-        dc_list_sorted = sorted(answers, key=lambda x: (x.priority, -x.weight))
-        dc_hostnames = [str(dc.target).rstrip('.') for dc in dc_list_sorted]
-        
+        dc_hostnames = query_srv_hosts(srv_record)
         info_log(f"✓ {len(dc_hostnames)} DC bulundu")
-        for idx, (dc, srv) in enumerate(zip(dc_hostnames, dc_list_sorted)):
-            debug_log(f"  DC #{idx+1}: {dc} (priority={srv.priority}, weight={srv.weight})")
-        
-        return dc_hostnames
-        
     except dns.resolver.NXDOMAIN:
         warn_log(f"DNS SRV kaydı bulunamadı: {srv_record}")
         return [domain]
     except Exception as e:
         warn_log(f"DC discovery başarısız: {e}")
         return [domain]
+    
+    return discover_site_domain_controllers(domain, dc_hostnames)
 
 def windows_timestamp_to_datetime(timestamp):
     """Windows FILETIME timestamp'i datetime'a çevir"""
@@ -216,7 +315,7 @@ def create_tls_config():
             debug_log(f"  CA File: {AD_CERT_PATH}")
             
             return tls_config
-            
+        
         except Exception as e:
             error_exit(f"SSL sertifika yüklenemedi: {AD_CERT_PATH}", str(e))
     else:
@@ -232,64 +331,645 @@ def create_tls_config():
         info_log("✓ SSL context oluşturuldu (certificate validation: DISABLED)")
         return tls_config
 
+def create_server(dc, tls_config):
+    """DC için LDAPS Server objesi (schema/DSE bind sırasında okunmaz, bkz. load_server_info)"""
+    return Server(
+        dc,
+        port=GC_PORT if GC_MODE else 636,
+        use_ssl=True,
+        get_info=NONE,
+        tls=tls_config,
+        connect_timeout=LDAP_TIMEOUT
+    )
+
+def create_connection(server):
+    """Server (veya ServerPool) için Connection oluştur (bind edilmemiş)"""
+    return Connection(
+        server,
+        user=AD_USER,
+        password=AD_PASSWORD,
+        auto_bind=False,
+        raise_exceptions=True,
+        auto_range=False,  # member range'leri ldap3 yerine read_member_ranges ile okunur
+        receive_timeout=LDAP_TIMEOUT
+    )
+
+def release_connection(conn):
+    """Connection'ı kapat (hata yutulur)"""
+    try:
+        conn.unbind()
+    except Exception:
+        pass
+
+def is_credential_error(error_message):
+    """Hata mesajı credential hatası mı"""
+    return "invalidCredentials" in error_message or "Invalid credentials" in error_message
+
+# ============================================
+# AD SITE (SITE-AWARE DISCOVERY)
+# ============================================
+# Domain SRV kaydı tüm site'lardaki DC'leri (WAN arkasındakiler dahil) döndürür.
+# Client site'ı AD_QUERY_SITE ile verilir veya CLDAP netlogon ping'i ile DC'ye
+# sorulur (UDP 389, cevaptaki ClientSiteName client IP'sinin subnet eşleşmesi).
+# Site'ın SRV kaydındaki DC'ler listenin başına alınır; diğer DC'ler listede kalır
+# (site DC'leri erişilemezse failover, henüz replike olmamış object'ler için arama).
+CLDAP_PORT = 389
+CLDAP_TIMEOUT = 1      # Saniye (UDP, cevap yoksa sıradaki DC)
+CLDAP_PING_LIMIT = 3   # Ping atılan en fazla DC
+NETLOGON_NT_VERSION = "\\06\\00\\00\\00"  # NETLOGON_NT_VERSION_5 | 5EX -> NETLOGON_SAM_LOGON_RESPONSE_EX
+
+def read_netlogon_name(data, offset):
+    """RFC 1035 sıkıştırılmış DNS adı: (ad, sonraki alanın offset'i)"""
+    labels = []
+    next_offset = None
+    while data[offset] != 0:
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            pointer = ((length & 0x3F) << 8) | data[offset + 1]
+            if pointer >= offset:
+                raise ValueError("Geçersiz netlogon DNS pointer'ı")
+            if next_offset is None:
+                next_offset = offset + 2
+            offset = pointer
+            continue
+        labels.append(data[offset + 1:offset + 1 + length].decode("utf-8"))
+        offset += 1 + length
+    return ".".join(labels), next_offset if next_offset is not None else offset + 1
+
+def parse_netlogon_response(data):
+    """NETLOGON_SAM_LOGON_RESPONSE_EX'ten (client site, DC site)
+    
+    Opcode(2) Sbz(2) Flags(4) DomainGuid(16) sonrası sırasıyla DnsForestName,
+    DnsDomainName, DnsHostName, NetbiosDomainName, NetbiosComputerName,
+    UserName, DcSiteName, ClientSiteName.
+    """
+    names = []
+    offset = 24
+    for _ in range(8):
+        name, offset = read_netlogon_name(data, offset)
+        names.append(name)
+    return names[7] or None, names[6] or None
+
+def netlogon_ping(dc, domain):
+    """DC'ye CLDAP netlogon ping'i: (client site, DC site)"""
+    search_filter = f"(&(DnsDomain={escape_filter_chars(domain)})(NtVer={NETLOGON_NT_VERSION}))"
+    message = LDAPMessage()
+    message["messageID"] = MessageID(1)
+    message["protocolOp"] = ProtocolOp().setComponentByName(
+        "searchRequest",
+        search_operation("", search_filter, BASE, DEREF_NEVER, ["Netlogon"], 0, 0, False, False, True)
+    )
+    
+    family, _, _, _, address = socket.getaddrinfo(dc, CLDAP_PORT, type=socket.SOCK_DGRAM)[0]
+    with socket.socket(family, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(CLDAP_TIMEOUT)
+        sock.sendto(ber_encode(message), address)
+        data = sock.recv(4096)
+    
+    response = decode_message_fast(data)
+    if response["protocolOp"] != 4:  # searchResEntry
+        raise ValueError("Netlogon cevabı yok")
+    raw_attributes = search_result_entry_response_to_dict_fast(response["payload"], None, None, False)["raw_attributes"]
+    values = get_raw_values(raw_attributes, "Netlogon")
+    if not values:
+        raise ValueError("Netlogon attribute'ü boş")
+    return parse_netlogon_response(values[0])
+
+def get_client_site(domain, dc_hostnames):
+    """Client site'ı (AD_QUERY_SITE veya ilk cevap veren DC'nin netlogon cevabı), yoksa None"""
+    if AD_SITE.lower() == "none" or not AD_SITE:
+        return None
+    if AD_SITE.lower() != "auto":
+        return AD_SITE
+    
+    for dc in dc_hostnames[:CLDAP_PING_LIMIT]:
+        try:
+            client_site, dc_site = netlogon_ping(dc, domain)
+        except Exception as e:
+            debug_log(f"CLDAP netlogon ping başarısız ({dc}): {e}")
+            continue
+        
+        debug_log(f"CLDAP netlogon: {dc} (DC site: {dc_site}, client site: {client_site})")
+        if not client_site:
+            # Client IP'si hiçbir site subnet'ine eşlenmemiş, diğer DC'ler de aynı cevabı verir
+            info_log("Client site'ı bulunamadı (subnet tanımlı değil), global DC listesi kullanılacak")
+        return client_site
+    
+    warn_log("CLDAP netlogon ping cevapsız, global DC listesi kullanılacak")
+    return None
+
+def discover_site_domain_controllers(domain, dc_hostnames):
+    """Client site'ının DC'leri önde, kalan global DC'ler sonda (site yoksa global liste)"""
+    site = get_client_site(domain, dc_hostnames)
+    if not site:
+        return dc_hostnames
+    
+    srv_record = get_srv_record(domain, site)
+    try:
+        site_dcs = query_srv_hosts(srv_record)
+    except Exception as e:
+        warn_log(f"Site DC'leri bulunamadı ({srv_record}): {e}")
+        warn_log("Global DC listesi kullanılacak")
+        return dc_hostnames
+    
+    local_dcs = [dc for dc in site_dcs if dc.lower() in [host.lower() for host in dc_hostnames]]
+    ordered = local_dcs + [dc for dc in dc_hostnames if dc.lower() not in [host.lower() for host in local_dcs]]
+    info_log(f"✓ Site '{site}': {len(local_dcs)} DC önde (toplam: {len(ordered)})")
+    return ordered
+
+# ============================================
+# SCHEMA / ROOT DSE CACHE
+# ============================================
+# Server'lar get_info=NONE ile oluşturulur. Attribute formatlaması için gereken
+# schema ve root DSE bilgisi forest başına diske cache'lenir; cache geçerliyse
+# DC'den sadece schemaNamingContext okunur (tek küçük BASE search).
+
+def get_schema_naming_context(conn):
+    """Root DSE'den sadece schemaNamingContext oku"""
+    try:
+        conn.search("", "(objectClass=*)", BASE, attributes=["schemaNamingContext"])
+        values = conn.response[0]["raw_attributes"].get("schemaNamingContext") if conn.response else None
+    except Exception as e:
+        debug_log(f"schemaNamingContext okunamadı: {e}")
+        return None
+    
+    if not values:
+        return None
+    value = values[0]
+    return value.decode("utf-8") if isinstance(value, bytes) else str(value)
+
+def get_forest_cache_base(schema_naming_context):
+    """Forest cache dosyalarının ortak yolu (uzantısız)"""
+    forest = re.sub(r"[^a-z0-9.-]", "_", get_dn_domain(schema_naming_context)) or "default"
+    return os.path.join(SCHEMA_CACHE_DIR, forest)
+
+def get_schema_cache_paths(schema_naming_context):
+    """Forest cache dosyaları (forest adı schemaNamingContext'in DC= bileşenlerinden)"""
+    base_path = get_forest_cache_base(schema_naming_context)
+    return f"{base_path}.dsa.json", f"{base_path}.schema.json"
+
+def load_cached_server_info(schema_naming_context):
+    """Geçerli cache varsa (DsaInfo, SchemaInfo), yoksa None
+    
+    Cache TTL'i geçtiyse veya cache'teki schemaNamingContext DC'nin
+    bildirdiğinden farklıysa cache geçersizdir.
+    """
+    dsa_path, schema_path = get_schema_cache_paths(schema_naming_context)
+    
+    try:
+        age = time.time() - os.path.getmtime(schema_path)
+        if age > SCHEMA_CACHE_TTL:
+            debug_log(f"Schema cache süresi dolmuş ({int(age)}s): {schema_path}")
+            return None
+        dsa_info = DsaInfo.from_file(dsa_path)
+        schema_info = SchemaInfo.from_file(schema_path)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        warn_log(f"Schema cache okunamadı ({schema_path}): {e}")
+        return None
+    
+    cached_context = dsa_info.other.get("schemaNamingContext") or [""]
+    if str(cached_context[0]).lower() != schema_naming_context.lower():
+        info_log(f"Schema cache geçersiz (schemaNamingContext değişmiş): {schema_path}")
+        return None
+    
+    return dsa_info, schema_info
+
+def save_server_info(server, schema_naming_context):
+    """Server'ın DSE ve schema bilgisini forest cache'ine yaz (atomik)"""
+    try:
+        os.makedirs(SCHEMA_CACHE_DIR, exist_ok=True)
+        for info, path in zip((server.info, server.schema), get_schema_cache_paths(schema_naming_context)):
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as handle:
+                handle.write(info.to_json(indent=None))
+            os.replace(temp_path, path)
+        debug_log(f"Schema cache yazıldı: {SCHEMA_CACHE_DIR}")
+    except Exception as e:
+        warn_log(f"Schema cache yazılamadı: {e}")
+
+def load_server_info(conn):
+    """Bind edilmiş connection'ın server'ına schema ve root DSE bilgisini yükle
+    
+    Önce forest cache'i denenir; yoksa (veya geçersizse) bilgi DC'den tam
+    okunur ve cache'e yazılır. AD_QUERY_SCHEMA_CACHE_TTL=0 cache'i kapatır.
+    """
+    server = conn.server
+    schema_naming_context = get_schema_naming_context(conn) if SCHEMA_CACHE_TTL > 0 else None
+    
+    if schema_naming_context:
+        cached = load_cached_server_info(schema_naming_context)
+        if cached:
+            server.attach_dsa_info(cached[0])
+            server.attach_schema_info(cached[1])
+            info_log("✓ Schema/DSE cache'ten yüklendi")
+            return
+    
+    # Tam okuma: get_info sadece bu çağrı için ALL (sonraki bind'ler tekrar okumaz)
+    server.get_info = ALL
+    try:
+        server.get_info_from_server(conn)
+    finally:
+        server.get_info = NONE
+    info_log("✓ Schema/DSE DC'den okundu")
+    
+    if schema_naming_context and server.info and server.schema:
+        save_server_info(server, schema_naming_context)
+
+def share_server_info(source_server, servers):
+    """Yüklenen schema/DSE bilgisini aynı forest'taki diğer DC Server'larına ver"""
+    for server in servers:
+        if server is not source_server:
+            server.attach_dsa_info(source_server.info)
+            server.attach_schema_info(source_server.schema)
+
+# ============================================
+# GLOBAL CATALOG
+# ============================================
+# GC (LDAPS 3269) forest'taki her domain'in objelerini tutar ama sadece partial
+# attribute set (PAS, isMemberOfPartialAttributeSet=TRUE) attribute'lerini.
+# PAS schema'dan okunur ve schema cache'i ile aynı TTL'le forest başına cache'lenir;
+# istenen attribute'lerden PAS dışındakiler search'ten çıkarılır ve raporlanır.
+GC_PORT = 3269
+PAS_FILTER = "(&(objectClass=attributeSchema)(isMemberOfPartialAttributeSet=TRUE))"
+
+def read_partial_attribute_set(conn, schema_naming_context):
+    """Schema'dan PAS attribute'lerinin lDAPDisplayName listesi (küçük harf)"""
+    attributes = []
+    for page in iter_paged_search(conn, schema_naming_context, PAS_FILTER, ["lDAPDisplayName"]):
+        for response in page:
+            if response.get("type") != "searchResEntry":
+                continue
+            for value in get_raw_values(response["raw_attributes"], "lDAPDisplayName"):
+                attributes.append((value.decode("utf-8") if isinstance(value, bytes) else str(value)).lower())
+    return attributes
+
+def load_partial_attribute_set(conn):
+    """PAS attribute listesi (forest cache'i veya schema), okunamazsa None"""
+    schema_naming_context = get_schema_naming_context(conn)
+    if not schema_naming_context:
+        return None
+    
+    cache_path = f"{get_forest_cache_base(schema_naming_context)}.pas.json"
+    if SCHEMA_CACHE_TTL > 0:
+        try:
+            if time.time() - os.path.getmtime(cache_path) <= SCHEMA_CACHE_TTL:
+                with open(cache_path, encoding="utf-8") as handle:
+                    return json.load(handle)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            warn_log(f"PAS cache okunamadı ({cache_path}): {e}")
+    
+    try:
+        attributes = read_partial_attribute_set(conn, schema_naming_context)
+    except Exception as e:
+        warn_log(f"PAS schema'dan okunamadı: {e}")
+        return None
+    info_log(f"✓ PAS schema'dan okundu: {len(attributes)} attribute")
+    
+    if SCHEMA_CACHE_TTL > 0 and attributes:
+        try:
+            os.makedirs(SCHEMA_CACHE_DIR, exist_ok=True)
+            temp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as handle:
+                json.dump(attributes, handle)
+            os.replace(temp_path, cache_path)
+        except Exception as e:
+            warn_log(f"PAS cache yazılamadı: {e}")
+    
+    return attributes
+
+def limit_to_partial_attribute_set(conn, requested_attributes):
+    """İstenen attribute'leri PAS ile sınırla: (kalan liste, çıkarılanlar)
+    
+    PAS okunamazsa liste olduğu gibi kullanılır (GC PAS dışı attribute'leri
+    zaten döndürmez, sonuçta N/A görünürler).
+    """
+    partial_attributes = load_partial_attribute_set(conn)
+    if not partial_attributes:
+        warn_log("PAS bilinmiyor, attribute listesi sınırlanmadı")
+        return requested_attributes, []
+    
+    partial_attributes = set(partial_attributes) | {"distinguishedname"}
+    kept = [attr for attr in requested_attributes if attr.split(";", 1)[0] in partial_attributes]
+    excluded = [attr for attr in requested_attributes if attr not in kept]
+    if excluded:
+        warn_log(f"GC'de olmayan (PAS dışı) attribute'ler çıkarıldı: {', '.join(excluded)}")
+    return kept, excluded
+
+def get_query_base_dn(domain):
+    """Sorgu base DN'i (GC modunda forest geneli veya AD_QUERY_GC_BASE_DN)"""
+    if GC_MODE:
+        debug_log(f"GC Base DN: {GC_BASE_DN or '(forest geneli)'}")
+        return GC_BASE_DN
+    return generate_base_dn(domain)
+
+# ============================================
+# GROUP MEMBER (RANGE RETRIEVAL)
+# ============================================
+# AD çok değerli attribute'leri tek okumada MaxValRange (default 1500) değerle
+# sınırlar ve kalanını member;range=X-Y ile parça parça verir. member hiçbir
+# zaman tam liste olarak istenmez:
+#   sample: tek küçük range (ilk MEMBER_SAMPLE_SIZE üye), count sadece grup küçükse bilinir
+#   count:  tüm range'ler sırayla okunur, sadece sayı + sample tutulur
+#   full:   tüm range'ler okunur, tam liste döner
+MEMBER_MODES = ["sample", "count", "full"]
+MEMBER_RANGES = {}  # entry DN (lower) -> normalize edilmiş member değeri
+
+def get_search_attributes(requested_attributes):
+    """Search'te istenecek attribute'ler (member yerine member;range=...)"""
+    if MEMBER_MODE == "sample":
+        member_range = f"member;range=0-{MEMBER_SAMPLE_SIZE - 1}"
+    else:
+        member_range = "member;range=0-*"
+    return [member_range if attr.lower() == "member" else attr for attr in requested_attributes]
+
+def has_member_range(attributes):
+    """Attribute listesinde member range'i var mı"""
+    return any(attr.lower().startswith("member;range=") for attr in attributes)
+
+def parse_member_range(raw_attributes):
+    """Raw attribute dict'inden member değerleri ve range sonu (son range ise None)"""
+    for name, values in raw_attributes.items():
+        attr_type, _, returned_range = name.partition(";range=")
+        if attr_type.lower() != "member":
+            continue
+        high = returned_range.partition("-")[2] if returned_range else "*"
+        members = [value.decode("utf-8", "replace") if isinstance(value, bytes) else value for value in values or []]
+        return members, None if high == "*" else int(high)
+    return [], None
+
+def iter_member_ranges(conn, dn, members, high):
+    """İlk range'den (members, high) başlayarak kalan range'leri base search ile sırayla üret"""
+    yield members
+    
+    while high is not None:
+        conn.search(
+            search_base=dn,
+            search_filter="(objectClass=*)",
+            search_scope=BASE,
+            attributes=[f"member;range={high + 1}-*"]
+        )
+        if not conn.response:
+            break
+        members, high = parse_member_range(conn.response[0].get("raw_attributes", {}))
+        debug_log(f"Member range: {dn} (+{len(members)})")
+        yield members
+
+def read_member_ranges(conn, dn, raw_attributes):
+    """Entry'nin member değerini range'ler üzerinden oku ve normalize et
+    
+    conn, entry'nin okunduğu connection olmalı (range'ler aynı DC'den okunur).
+    count modunda bellekte sadece sample tutulur; sample modunda ilk
+    range'den sonrası okunmaz (grup daha büyükse count None döner).
+    """
+    members, high = parse_member_range(raw_attributes)
+    if MEMBER_MODE == "sample":
+        ranges = [members]
+        complete = high is None
+    else:
+        ranges = iter_member_ranges(conn, dn, members, high)
+        complete = True
+    
+    count = 0
+    sample = []
+    full_list = [] if MEMBER_MODE == "full" else None
+    
+    for chunk in ranges:
+        count += len(chunk)
+        if len(sample) < MEMBER_SAMPLE_SIZE:
+            sample.extend(chunk[:MEMBER_SAMPLE_SIZE - len(sample)])
+        if full_list is not None:
+            full_list.extend(chunk)
+    
+    if count == 0:
+        return "N/A"
+    
+    value = {"count": count if complete else None, "sample": sample, "complete": complete}
+    if full_list is not None:
+        value["members"] = full_list
+    return value
+
+def load_member_ranges(conn, entries, attributes):
+    """Bulunan entry'lerin member range'lerini oku (MEMBER_RANGES'a yazılır)"""
+    if not has_member_range(attributes):
+        return
+    
+    for entry in entries:
+        MEMBER_RANGES[entry.entry_dn.lower()] = read_member_ranges(conn, entry.entry_dn, entry.entry_raw_attributes)
+
+# ============================================
+# DC HAVUZU (FAILOVER)
+# ============================================
+# Tüm DC'ler tek ServerPool'da (FIRST, active check, exhaust): erişilemeyen DC
+# sorgu boyunca tekrar denenmez. Retry/backoff bütçesi DC başına değil tüm
+# sorgu için geçerlidir.
+SERVER_POOL = None
+DC_SERVERS = {}                # dc -> Server (havuzdaki obje)
+ALIVE_DCS = set()              # Aktif check'ten geçen DC'ler
+DEAD_DCS = set()               # Tükenmiş (exhausted) DC'ler
+RETRY_STATE = {"used": 0}
+STATE_LOCK = threading.Lock()  # Eşzamanlı search thread'leri aynı durumu günceller
+
+def build_server_pool(dc_list, tls_config):
+    """DC listesi için ServerPool oluştur (sıra DNS priority/weight sırası)"""
+    global SERVER_POOL
+    
+    # Havuz turları arasında ldap3 kendi başına beklemez, bekleme retry bütçesinden yapılır
+    set_config_parameter("POOLING_LOOP_TIMEOUT", 0)
+    set_config_parameter("CHECK_AVAILABILITY_TIMEOUT", min(LDAP_TIMEOUT, 5))
+    
+    for dc in dc_list:
+        DC_SERVERS[dc] = create_server(dc, tls_config)
+    
+    SERVER_POOL = ServerPool([DC_SERVERS[dc] for dc in dc_list], FIRST, active=1, exhaust=True)
+    return SERVER_POOL
+
+def get_pool_states():
+    """Havuzdaki DC'lerin ldap3 ServerState listesi"""
+    states = []
+    for pool_state in SERVER_POOL.pool_states.values():
+        states.extend(pool_state.server_states)
+    return states
+
+def sync_pool_health():
+    """ServerPool'un active check sonuçlarını DC durumlarına aktar"""
+    for state in get_pool_states():
+        dc = state.server.host
+        if not state.available:
+            mark_dc_dead(dc, "havuz active check başarısız")
+        elif state.last_checked_time.year > 1:
+            ALIVE_DCS.add(dc)
+
+def mark_dc_dead(dc, reason):
+    """DC'yi sorgu boyunca tükenmiş işaretle (havuz da tekrar seçmez)"""
+    with STATE_LOCK:
+        ALIVE_DCS.discard(dc)
+        newly_dead = dc not in DEAD_DCS
+        DEAD_DCS.add(dc)
+        
+        for state in get_pool_states():
+            if state.server.host == dc:
+                state.available = False
+                state.last_checked_time = datetime.now()
+    
+    if newly_dead:
+        warn_log(f"DC havuz dışı bırakıldı: {dc} ({reason})")
+
+def check_dc_health(dc):
+    """Aktif sağlık kontrolü (LDAPS portuna TCP bağlantısı)"""
+    if DC_SERVERS[dc].check_availability():
+        ALIVE_DCS.add(dc)
+        return True
+    mark_dc_dead(dc, "health check başarısız")
+    return False
+
+def is_dc_alive(dc):
+    """DC kullanılabilir mi (sonuç sorgu boyunca hatırlanır)"""
+    if dc in DEAD_DCS:
+        return False
+    if dc in ALIVE_DCS:
+        return True
+    return check_dc_health(dc)
+
+def is_cancelled(cancelled):
+    """Search iptal edildi mi (cancelled: search_across_all_dcs çağrısının Event'i veya None)"""
+    return cancelled is not None and cancelled.is_set()
+
+def consume_retry(cancelled=None):
+    """Sorgu geneli retry bütçesinden bir hak kullan (exponential backoff ile bekle)
+    
+    Returns: bütçe bittiyse (veya beklerken search iptal edildiyse) False
+    """
+    with STATE_LOCK:
+        if RETRY_STATE["used"] >= MAX_RETRIES:
+            debug_log(f"Retry bütçesi tükendi ({MAX_RETRIES})")
+            return False
+        
+        RETRY_STATE["used"] += 1
+        used = RETRY_STATE["used"]
+    
+    delay = min(RETRY_DELAY * 2 ** (used - 1), RETRY_DELAY_MAX)
+    debug_log(f"Retry {used}/{MAX_RETRIES} öncesi bekleniyor ({delay}s)...")
+    if cancelled is None:
+        time.sleep(delay)
+        return True
+    return not cancelled.wait(delay)
+
+def handle_dc_failure(dc, error, cancelled=None):
+    """Bağlantı/search hatası sonrası karar: aynı DC'de retry mı, sonraki DC mi
+    
+    DC health check'ten geçmezse beklemeden bırakılır; geçerse retry
+    bütçeden düşülür. Bütçe bittiyse DC tükenmiş sayılır.
+    
+    Returns: retry yapılacaksa True
+    """
+    error_message = str(error)
+    debug_log(f"Bağlantı hatası ({dc}): {error_message}")
+    
+    # Search iptal edildiyse DC'yi işaretlemeden bırak
+    if is_cancelled(cancelled):
+        return False
+    
+    # Certificate error özel loglama
+    if "certificate" in error_message.lower() or "ssl" in error_message.lower():
+        warn_log(f"SSL/Certificate hatası: {dc}")
+    
+    if not check_dc_health(dc):
+        return False
+    
+    if consume_retry(cancelled):
+        return True
+    
+    mark_dc_dead(dc, "retry bütçesi tükendi")
+    return False
+
+def connect_to_dc(dc, tried_info, cancelled=None):
+    """DC'ye bağlan ve bind et (tükenmiş DC beklemeden atlanır)
+    
+    Returns: bind edilmiş Connection veya None (tried_info["status"] işaretlenir)
+    """
+    if not is_dc_alive(dc):
+        tried_info["status"] = "skipped_dead"
+        info_log(f"DC atlandı (erişilemez): {dc}")
+        return None
+    
+    while True:
+        tried_info["attempts"] += 1
+        try:
+            debug_log(f"Bind: {dc} (attempt {tried_info['attempts']})")
+            conn = create_connection(DC_SERVERS[dc])
+            conn.bind()
+            return conn
+        except Exception as e:
+            if not handle_dc_failure(dc, e, cancelled):
+                tried_info["status"] = "connection_failed"
+                warn_log(f"Bağlantı başarısız ({tried_info['attempts']} deneme sonrası): {dc}")
+                return None
+
 def test_credentials_on_first_dc(dc_list, tls_config):
-    """İlk erişilebilir DC'de credential test yap"""
+    """Havuzdaki ilk erişilebilir DC'de credential test yap
+    
+    DC seçimi ServerPool active check'i ile yapılır (erişilemeyen DC'ler
+    beklemeden atlanır ve tükenmiş işaretlenir). Başarılı bind edilen
+    connection kapatılmaz, search aşamasında aynı DC için tekrar kullanılır
+    (ikinci TLS handshake, bind ve schema okuması yok).
+    
+    Returns: (dc, bound connection)
+    """
     
     info_log("=" * 60)
     info_log("CREDENTİAL TEST (İlk erişilebilir DC)")
     info_log("=" * 60)
     
-    for dc in dc_list:
-        for attempt in range(1, MAX_RETRIES + 1):
-            try:
-                debug_log(f"Credential test: {dc} (attempt {attempt}/{MAX_RETRIES})")
-                
-                server = Server(
-                    dc,
-                    port=636,
-                    use_ssl=True,
-                    get_info=ALL,
-                    tls=tls_config,
-                    connect_timeout=LDAP_TIMEOUT
-                )
-                
-                conn = Connection(
-                    server,
-                    user=AD_USER,
-                    password=AD_PASSWORD,
-                    auto_bind=False,
-                    raise_exceptions=True
+    server_pool = build_server_pool(dc_list, tls_config)
+    
+    while True:
+        conn = create_connection(server_pool)
+        
+        try:
+            debug_log(f"Credential test (havuz: {len(dc_list)} DC, kullanılan retry: {RETRY_STATE['used']}/{MAX_RETRIES})")
+            
+            # Bind işlemi (credential test)
+            if conn.bind():
+                dc = conn.server.host
+                sync_pool_health()
+                info_log(f"✓ Credential test başarılı: {dc}")
+                return dc, conn  # Başarılı DC ve bind edilmiş connection
+            else:
+                # Bind başarısız - credential hatası
+                error_exit(
+                    "LDAP authentication başarısız",
+                    f"Kullanıcı adı veya şifre hatalı (test DC: {conn.server.host})"
                 )
-                
-                # Bind işlemi (credential test)
-                if conn.bind():
-                    info_log(f"✓ Credential test başarılı: {dc}")
-                    conn.unbind()
-                    return dc  # Başarılı DC döndür
-                else:
-                    # Bind başarısız - credential hatası
-                    error_exit(
-                        "LDAP authentication başarısız",
-                        f"Kullanıcı adı veya şifre hatalı (test DC: {dc})"
-                    )
-                
-            except Exception as e:
-                error_message = str(e)
-                
-                # Credential hatası → tüm DC'leri durdur
-                if "invalidCredentials" in error_message or "Invalid credentials" in error_message:
-                    error_exit("LDAP authentication başarısız", "Kullanıcı adı veya şifre hatalı")
-                
-                # Bağlantı hatası → retry
-                debug_log(f"Bağlantı hatası ({dc}): {error_message}")
-                
-                if attempt < MAX_RETRIES:
-                    debug_log(f"Retry {attempt}/{MAX_RETRIES} sonrası bekleniyor ({RETRY_DELAY}s)...")
-                    time.sleep(RETRY_DELAY)
-                else:
-                    warn_log(f"DC erişilemedi ({MAX_RETRIES} retry sonrası): {dc}")
-                    # Sonraki DC'ye geç
-                    break
+        
+        except LDAPServerPoolExhaustedError:
+            # Havuzdaki tüm DC'ler tükendi → bütçe varsa bekleyip havuzu baştan dene
+            sync_pool_health()
+            warn_log(f"Havuzdaki tüm DC'ler erişilemez ({len(dc_list)} adet)")
+            if not consume_retry():
+                break
+            for pool_state in server_pool.pool_states.values():
+                pool_state.refresh()
+            DEAD_DCS.clear()
+            ALIVE_DCS.clear()
+        
+        except Exception as e:
+            error_message = str(e)
+            
+            # Credential hatası → tüm DC'leri durdur
+            if is_credential_error(error_message):
+                error_exit("LDAP authentication başarısız", "Kullanıcı adı veya şifre hatalı")
+            
+            # Seçilen DC TCP check'ten geçti ama bağlantı/bind başarısız → havuzdan çıkar, sonraki DC
+            dc = conn.server.host
+            sync_pool_health()
+            if "certificate" in error_message.lower() or "ssl" in error_message.lower():
+                warn_log(f"SSL/Certificate hatası: {dc}")
+            debug_log(f"Bağlantı hatası ({dc}): {error_message}")
+            mark_dc_dead(dc, "credential test bağlantısı başarısız")
     
     # Hiçbir DC'ye erişilemedi
     error_exit(
@@ -297,34 +977,36 @@ def test_credentials_on_first_dc(dc_list, tls_config):
         f"Tüm DC'ler ({len(dc_list)} adet) erişilemez durumda"
     )
 
-def search_object_on_dc(dc, base_dn, search_filter, attributes, tls_config):
-    """Bir DC'de object ara (retry ile)"""
+def search_object_on_dc(dc, base_dn, search_filter, attributes, bound_conn=None, cancelled=None):
+    """Bir DC'de object ara (retry sorgu geneli bütçeden)
+    
+    bound_conn (credential test connection'ı) verilirse ilk deneme onunla
+    yapılır; hata alırsa sonraki denemeler yeni connection açar. Verilen
+    connection burada kapatılmaz. cancelled (Event) set edildiyse bağlantı
+    ve search öncesi durulur (status: cancelled).
+    """
     
     tried_info = {"hostname": dc, "status": "unknown", "attempts": 0}
     
-    for attempt in range(1, MAX_RETRIES + 1):
-        tried_info["attempts"] = attempt
+    conn = bound_conn
+    if conn is not None:
+        tried_info["attempts"] = 1
+    
+    while True:
+        # Başka bir DC object'i bulduysa bu DC'de devam etme
+        if not is_cancelled(cancelled) and conn is None:
+            conn = connect_to_dc(dc, tried_info, cancelled)
+            if conn is None:
+                return {"found": False, "tried_info": tried_info}
+        
+        if is_cancelled(cancelled):
+            tried_info["status"] = "cancelled"
+            if conn is not None and conn is not bound_conn:
+                release_connection(conn)
+            return {"found": False, "tried_info": tried_info}
         
         try:
-            debug_log(f"Search: {dc} (attempt {attempt}/{MAX_RETRIES})")
-            
-            server = Server(
-                dc,
-                port=636,
-                use_ssl=True,
-                get_info=ALL,
-                tls=tls_config,
-                connect_timeout=LDAP_TIMEOUT
-            )
-            
-            conn = Connection(
-                server,
-                user=AD_USER,
-                password=AD_PASSWORD,
-                auto_bind=True,
-                raise_exceptions=True,
-                receive_timeout=LDAP_TIMEOUT
-            )
+            debug_log(f"Search: {dc} (attempt {tried_info['attempts']}{', mevcut bind' if conn is bound_conn else ''})")
             
             # Search
             conn.search(
@@ -335,59 +1017,109 @@ def search_object_on_dc(dc, base_dn, search_filter, attributes, tls_config):
             )
             
             if len(conn.entries) > 0:
-                # Object bulundu
+                # Object bulundu (member range'leri aynı connection ile okunur)
+                entries = conn.entries
+                load_member_ranges(conn, entries, attributes)
                 tried_info["status"] = "success"
                 debug_log(f"✓ Object bulundu: {dc}")
-                return {"found": True, "entries": conn.entries, "tried_info": tried_info}
+                return {"found": True, "entries": entries, "tried_info": tried_info}
             else:
                 # Object yok
                 tried_info["status"] = "not_found"
                 debug_log(f"Object bulunamadı: {dc}")
-                conn.unbind()
+                if conn is not bound_conn:
+                    conn.unbind()
                 return {"found": False, "tried_info": tried_info}
         
         except Exception as e:
-            error_message = str(e)
-            debug_log(f"Search hatası ({dc}): {error_message}")
+            # Mevcut connection koptuysa sonraki denemeler yeni connection ile yapılır
+            if conn is not bound_conn:
+                release_connection(conn)
+            conn = None
             
-            # Certificate error özel loglama
-            if "certificate" in error_message.lower() or "ssl" in error_message.lower():
-                warn_log(f"SSL/Certificate hatası: {dc}")
+            if is_cancelled(cancelled):
+                tried_info["status"] = "cancelled"
+                return {"found": False, "tried_info": tried_info}
             
-            if attempt < MAX_RETRIES:
-                debug_log(f"Retry {attempt}/{MAX_RETRIES} sonrası bekleniyor ({RETRY_DELAY}s)...")
-                time.sleep(RETRY_DELAY)
-            else:
+            if not handle_dc_failure(dc, e, cancelled):
                 tried_info["status"] = "connection_failed"
-                warn_log(f"Bağlantı başarısız ({MAX_RETRIES} retry sonrası): {dc}")
+                warn_log(f"Search başarısız ({tried_info['attempts']} deneme sonrası): {dc}")
                 return {"found": False, "tried_info": tried_info}
+
+def timed_search_on_dc(dc, base_dn, search_filter, attributes, bound_conn=None, cancelled=None):
+    """search_object_on_dc + DC bazlı süre (tried_info["latency_ms"])"""
+    if is_cancelled(cancelled):
+        return {"found": False, "tried_info": {"hostname": dc, "status": "cancelled", "attempts": 0, "latency_ms": None}}
     
-    return {"found": False, "tried_info": tried_info}
+    info_log(f"DC sorgulanıyor: {dc}")
+    started = time.monotonic()
+    result = search_object_on_dc(dc, base_dn, search_filter, attributes, bound_conn=bound_conn, cancelled=cancelled)
+    result["tried_info"]["latency_ms"] = round((time.monotonic() - started) * 1000)
+    return result
 
-def search_across_all_dcs(dc_list, base_dn, search_filter, attributes, tls_config):
-    """Tüm DC'leri sırayla tara"""
+def search_across_all_dcs(dc_list, base_dn, search_filter, attributes, bound_dc=None, bound_conn=None):
+    """Tüm DC'leri eşzamanlı tara, ilk bulan DC kazanır
+    
+    En fazla SEARCH_CONCURRENCY DC aynı anda sorgulanır (bound_dc için
+    bound_conn tekrar kullanılır). Object bulununca sırada bekleyen DC'ler
+    iptal edilir; çalışanlar retry beklemesinde veya bir sonraki adımda durur
+    ve dönmeden önce beklenir (bound_conn çağıran tarafta tekrar kullanılır,
+    hiçbir worker onu kullanır durumda kalmaz). Süren bir search en fazla
+    LDAP timeout kadar sürer. İptal Event'i her çağrıya özeldir.
+    tried_servers DC listesi sırasındadır (status ve latency_ms ile).
+    """
     
     info_log("=" * 60)
-    info_log("MULTI-DC SEARCH")
+    info_log(f"MULTI-DC SEARCH (eşzamanlı: {min(SEARCH_CONCURRENCY, len(dc_list))} DC)")
     info_log("=" * 60)
     
-    tried_servers = []
+    results = {}
+    found_dc = None
+    cancelled = threading.Event()  # İlk bulan DC'den sonra set edilir
     
-    for dc in dc_list:
-        info_log(f"DC sorgulanıyor: {dc}")
-        
-        result = search_object_on_dc(dc, base_dn, search_filter, attributes, tls_config)
-        tried_servers.append(result["tried_info"])
-        
-        if result["found"]:
-            info_log(f"✓ Object bulundu: {dc}")
-            return {
-                "success": True,
-                "found": True,
-                "server": dc,
-                "entries": result["entries"],
-                "tried_servers": tried_servers
-            }
+    executor = ThreadPoolExecutor(max_workers=min(SEARCH_CONCURRENCY, len(dc_list)))
+    futures = {
+        executor.submit(timed_search_on_dc, dc, base_dn, search_filter, attributes,
+                        bound_conn if dc == bound_dc else None, cancelled): dc
+        for dc in dc_list
+    }
+    
+    try:
+        for future in as_completed(futures):
+            dc = futures[future]
+            results[dc] = future.result()
+            
+            if results[dc]["found"]:
+                found_dc = dc
+                break
+    finally:
+        # Sıradakiler başlamaz, çalışanlar durur; bound_conn serbest kalana kadar beklenir
+        cancelled.set()
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=True)
+    
+    # Sonuna kadar çalışan DC'lerin gerçek durumu (örn. not_found, cancelled)
+    for future, dc in futures.items():
+        if dc not in results and not future.cancelled() and future.exception() is None:
+            results[dc] = future.result()
+    
+    # Hiç başlamayan (iptal edilen) DC'ler
+    tried_servers = [
+        results[dc]["tried_info"] if dc in results
+        else {"hostname": dc, "status": "cancelled", "attempts": 0, "latency_ms": None}
+        for dc in dc_list
+    ]
+    
+    if found_dc is not None:
+        info_log(f"✓ Object bulundu: {found_dc}")
+        return {
+            "success": True,
+            "found": True,
+            "server": found_dc,
+            "entries": results[found_dc]["entries"],
+            "tried_servers": tried_servers
+        }
     
     # Hiçbir DC'de bulunamadı
     info_log("✗ Object hiçbir DC'de bulunamadı")
@@ -397,184 +1129,1175 @@ def search_across_all_dcs(dc_list, base_dn, search_filter, attributes, tls_confi
         "tried_servers": tried_servers
     }
 
+def search_batch_on_dc(dc, base_dn, object_type, search_terms, attributes, bound_conn=None):
+    """Bir DC'de terim listesini tek bind ile ara (chunk'lı OR filtreleri)
+    
+    bound_conn (credential test connection'ı) verilirse yeni bind yapılmaz
+    ve connection burada kapatılmaz. Search hatasında (retry bütçesi
+    yettiği sürece) yeniden bağlanılır ve kalan chunk'tan devam edilir.
+    
+    Returns: {"entries": {terim (lower): entry}, "tried_info": {...}}
+    """
+    
+    tried_info = {"hostname": dc, "status": "unknown", "attempts": 0, "searched": len(search_terms), "found": 0}
+    key_attribute = SEARCH_KEY_ATTRIBUTES[object_type]
+    
+    conn = bound_conn
+    if conn is not None:
+        tried_info["attempts"] = 1
+    
+    entries = {}
+    start = 0
+    while start < len(search_terms):
+        if conn is None:
+            conn = connect_to_dc(dc, tried_info)
+            if conn is None:
+                # Yarım kalan chunk'lardaki terimler sonraki DC'de aranır
+                tried_info["found"] = len(entries)
+                return {"entries": entries, "tried_info": tried_info}
+        
+        chunk = search_terms[start:start + BATCH_SIZE]
+        search_filter = build_batch_filter(object_type, chunk)
+        debug_log(f"Batch search: {dc} ({start + 1}-{start + len(chunk)}/{len(search_terms)})")
+        
+        try:
+            conn.search(
+                search_base=base_dn,
+                search_filter=search_filter,
+                search_scope=SUBTREE,
+                attributes=attributes
+            )
+            chunk_entries = conn.entries
+            load_member_ranges(conn, chunk_entries, attributes)
+        except Exception as e:
+            warn_log(f"Batch search hatası ({dc}): {e}")
+            if conn is not bound_conn:
+                release_connection(conn)
+            conn = None
+            
+            if not handle_dc_failure(dc, e):
+                tried_info["status"] = "connection_failed"
+                tried_info["found"] = len(entries)
+                return {"entries": entries, "tried_info": tried_info}
+            continue
+        
+        # Entry'ler arama attribute'ü üzerinden terime eşlenir (AD karşılaştırması case-insensitive)
+        for entry in chunk_entries:
+            try:
+                key = str(entry[key_attribute].value).lower()
+            except Exception:
+                continue
+            entries.setdefault(key, entry)
+        
+        start += BATCH_SIZE
+    
+    if conn is not None and conn is not bound_conn:
+        release_connection(conn)
+    
+    tried_info["found"] = len(entries)
+    tried_info["status"] = "success" if len(entries) == len(search_terms) else "partial" if entries else "not_found"
+    return {"entries": entries, "tried_info": tried_info}
+
+def search_batch_across_all_dcs(dc_list, base_dn, object_type, search_terms, attributes, bound_dc=None, bound_conn=None):
+    """Terim listesini DC'lerde sırayla ara; bulunamayanlar sonraki DC'ye kalır
+    
+    Her DC'de tek bind yapılır (bound_dc için bound_conn tekrar kullanılır).
+    Her terim için denenen DC'ler (tek sorgudaki tried_servers formatında)
+    ayrıca tutulur.
+    
+    Returns: {"found": {terim: (dc, entry)}, "tried_servers": [...], "term_tried_servers": {terim: [...]}}
+    """
+    
+    info_log("=" * 60)
+    info_log(f"MULTI-DC BATCH SEARCH ({len(search_terms)} terim, chunk: {BATCH_SIZE})")
+    info_log("=" * 60)
+    
+    found = {}
+    tried_servers = []
+    term_tried_servers = {term: [] for term in search_terms}
+    pending = list(search_terms)
+    
+    for dc in dc_list:
+        if not pending:
+            break
+        
+        info_log(f"DC sorgulanıyor: {dc} ({len(pending)} terim)")
+        
+        result = search_batch_on_dc(dc, base_dn, object_type, pending, attributes,
+                                    bound_conn=bound_conn if dc == bound_dc else None)
+        tried_info = result["tried_info"]
+        tried_servers.append(tried_info)
+        
+        still_pending = []
+        for term in pending:
+            entry = result["entries"].get(term.lower())
+            if entry is not None:
+                status = "success"
+                found[term] = (dc, entry)
+            else:
+                status = tried_info["status"] if tried_info["status"] in ("connection_failed", "skipped_dead") else "not_found"
+                still_pending.append(term)
+            term_tried_servers[term].append({"hostname": dc, "status": status, "attempts": tried_info["attempts"]})
+        
+        info_log(f"✓ {dc}: {len(pending) - len(still_pending)} bulundu, {len(still_pending)} kaldı")
+        pending = still_pending
+    
+    return {"found": found, "tried_servers": tried_servers, "term_tried_servers": term_tried_servers}
+
 # ============================================
-# PARAMETRELERİ DOĞRULA
+# PARAMETRELER VE FİLTRELER
 # ============================================
 
-debug_log("=" * 60)
-debug_log("AD QUERY SCRIPT BAŞLATILIYOR")
-debug_log("=" * 60)
-
-if not AD_OBJECT:
-    error_exit("AD_OBJECT parametresi eksik", "Kullanım: ad_query.py <user|computer|group> <domain> <search> [attributes]")
+def read_search_terms(handle):
+    """Dosya/stdin içeriğinden terim listesi oku (JSON liste veya satır başına bir terim)"""
+    content = handle.read()
+    if content.lstrip().startswith("["):
+        try:
+            terms = json.loads(content)
+        except json.JSONDecodeError as e:
+            error_exit("Geçersiz search term JSON listesi", str(e))
+    else:
+        terms = [line for line in content.splitlines() if not line.strip().startswith("#")]
+    return terms
 
-if AD_OBJECT not in ['user', 'computer', 'group']:
-    error_exit(f"Geçersiz AD_OBJECT: {AD_OBJECT}", "Geçerli değerler: user, computer, group")
+def load_search_terms(search):
+    """AD_SEARCH parametresinden batch terim listesini yükle
+    
+    JSON liste, "@/dosya/yolu" veya "-" (stdin) batch modunu açar; diğer
+    değerler tek terimdir (None döner). Terimler kırpılır, tekrar edenler
+    (case-insensitive) çıkarılır, sıra korunur.
+    """
+    if search == "-":
+        terms = read_search_terms(sys.stdin)
+    elif search.startswith("@"):
+        path = search[1:]
+        if not os.path.isfile(path):
+            error_exit(f"Search term dosyası bulunamadı: {path}")
+        with open(path, encoding="utf-8") as handle:
+            terms = read_search_terms(handle)
+    elif search.lstrip().startswith("["):
+        try:
+            terms = json.loads(search)
+        except json.JSONDecodeError as e:
+            error_exit("Geçersiz search term JSON listesi", str(e))
+    else:
+        return None
+    
+    if not isinstance(terms, list):
+        error_exit("Search term listesi JSON liste olmalı")
+    
+    unique_terms = []
+    seen = set()
+    for term in terms:
+        term = str(term).strip()
+        if term and term.lower() not in seen:
+            seen.add(term.lower())
+            unique_terms.append(term)
+    
+    if not unique_terms:
+        error_exit("Search term listesi boş")
+    
+    return unique_terms
 
-if not AD_DOMAIN:
-    error_exit("AD_DOMAIN parametresi eksik")
+def validate_parameters():
+    """Parametreleri doğrula (hata varsa çık)"""
+    if not AD_OBJECT:
+        error_exit("AD_OBJECT parametresi eksik", "Kullanım: ad_query.py <user|computer|group|export|transitive_members|transitive_groups> <domain> <search|JSON liste|@dosya|-|LDAP filtresi> [attributes] [--source=ldap|mirror] [--gc]")
+    
+    if AD_OBJECT not in ['user', 'computer', 'group', 'export', 'transitive_members', 'transitive_groups']:
+        error_exit(f"Geçersiz AD_OBJECT: {AD_OBJECT}", "Geçerli değerler: user, computer, group, export, transitive_members, transitive_groups")
+    
+    if not AD_DOMAIN:
+        error_exit("AD_DOMAIN parametresi eksik")
+    
+    if not AD_SEARCH:
+        error_exit("AD_SEARCH parametresi eksik")
+    
+    if not AD_USER or not AD_PASSWORD:
+        error_exit("AD credentials eksik", "AD_USER ve AD_PASSWORD environment variable'ları gerekli")
+    
+    if BATCH_SIZE < 1:
+        error_exit(f"Geçersiz AD_QUERY_BATCH_SIZE: {BATCH_SIZE}")
+    
+    if SEARCH_CONCURRENCY < 1:
+        error_exit(f"Geçersiz AD_QUERY_SEARCH_CONCURRENCY: {SEARCH_CONCURRENCY}")
+    
+    if MEMBER_MODE not in MEMBER_MODES:
+        error_exit(f"Geçersiz AD_QUERY_MEMBER_MODE: {MEMBER_MODE}", f"Geçerli değerler: {', '.join(MEMBER_MODES)}")
+    
+    if MEMBER_SAMPLE_SIZE < 1:
+        error_exit(f"Geçersiz MEMBER_SAMPLE_SIZE: {MEMBER_SAMPLE_SIZE}")
+    
+    if QUERY_SOURCE not in ["ldap", "mirror"]:
+        error_exit(f"Geçersiz --source: {QUERY_SOURCE}", "Geçerli değerler: ldap, mirror")
+    
+    if QUERY_SOURCE == "mirror" and AD_OBJECT not in OBJECT_CLASS_FILTERS:
+        error_exit(f"--source=mirror {AD_OBJECT} sorgusunu desteklemiyor", "Geçerli object tipleri: user, computer, group")
+    
+    if GC_MODE and (QUERY_SOURCE == "mirror" or AD_OBJECT in TRANSITIVE_LOOKUPS):
+        error_exit(f"--gc {AD_OBJECT if AD_OBJECT in TRANSITIVE_LOOKUPS else '--source=mirror'} ile kullanılamaz", "GC modu user, computer, group ve export sorgularında geçerli")
+    
+    if RESOLVE_DNS and (RESOLVE_CACHE_SIZE < 1 or not RESOLVE_ATTRIBUTES):
+        error_exit("Geçersiz DN çözümleme ayarı", "AD_QUERY_RESOLVE_CACHE_SIZE >= 1 ve AD_QUERY_RESOLVE_ATTRIBUTES dolu olmalı")
+    
+    if AD_OBJECT == "export":
+        if EXPORT_PAGE_SIZE < 1:
+            error_exit(f"Geçersiz AD_QUERY_EXPORT_PAGE_SIZE: {EXPORT_PAGE_SIZE}")
+        
+        if not (AD_SEARCH.strip().startswith("(") and AD_SEARCH.strip().endswith(")")):
+            error_exit(f"Geçersiz export filtresi: {AD_SEARCH}", "Export modunda AD_SEARCH parantezli bir LDAP filtresi olmalı, örn: (objectClass=user)")
 
-if not AD_SEARCH:
-    error_exit("AD_SEARCH parametresi eksik")
+def get_requested_attributes(object_type, custom_attributes):
+    """Custom attribute listesi veya object tipine göre default liste"""
+    if custom_attributes:
+        requested_attributes = [attr.strip().lower() for attr in custom_attributes.split(",")]
+        info_log(f"Custom attribute listesi: {len(requested_attributes)} attribute")
+    else:
+        if object_type == "user":
+            requested_attributes = DEFAULT_USER_ATTRIBUTES
+        elif object_type == "computer":
+            requested_attributes = DEFAULT_COMPUTER_ATTRIBUTES
+        elif object_type == "export":
+            requested_attributes = DEFAULT_EXPORT_ATTRIBUTES
+        elif object_type in TRANSITIVE_LOOKUPS:
+            requested_attributes = DEFAULT_TRANSITIVE_ATTRIBUTES
+        else:  # group
+            requested_attributes = DEFAULT_GROUP_ATTRIBUTES
+        
+        info_log(f"Default {object_type} attribute listesi: {len(requested_attributes)} attribute")
+    
+    debug_log(f"Attributes: {', '.join(requested_attributes)}")
+    return requested_attributes
 
-if not AD_USER or not AD_PASSWORD:
-    error_exit("AD credentials eksik", "AD_USER ve AD_PASSWORD environment variable'ları gerekli")
+def build_search_filter(object_type, search_term):
+    """Tek terim için search filter (terim olduğu gibi kullanılır, wildcard desteklenir)"""
+    return f"(&{OBJECT_CLASS_FILTERS[object_type]}({SEARCH_KEY_ATTRIBUTES[object_type]}={search_term}))"
 
-debug_log(f"Object Type: {AD_OBJECT}")
-debug_log(f"Domain: {AD_DOMAIN}")
-debug_log(f"Search Term: {AD_SEARCH}")
-debug_log(f"Custom Attributes: {AD_ATTRIBUTES if AD_ATTRIBUTES else 'None (using defaults)'}")
-debug_log(f"Timeout: {LDAP_TIMEOUT}s")
-debug_log(f"Max Retries: {MAX_RETRIES}")
-debug_log(f"Retry Delay: {RETRY_DELAY}s")
+def build_batch_filter(object_type, search_terms):
+    """Terim listesi için OR filtresi (terimler escape edilir, eşleşme birebir)"""
+    key_attribute = SEARCH_KEY_ATTRIBUTES[object_type]
+    terms_filter = "".join(f"({key_attribute}={escape_filter_chars(term)})" for term in search_terms)
+    return f"(&{OBJECT_CLASS_FILTERS[object_type]}(|{terms_filter}))"
 
 # ============================================
-# ATTRIBUTE LİSTESİNİ BELİRLE
+# SONUÇ İŞLEME
 # ============================================
 
-if AD_ATTRIBUTES:
-    requested_attributes = [attr.strip().lower() for attr in AD_ATTRIBUTES.split(",")]
-    info_log(f"Custom attribute listesi: {len(requested_attributes)} attribute")
-    debug_log(f"Attributes: {', '.join(requested_attributes)}")
-else:
-    if AD_OBJECT == "user":
-        requested_attributes = DEFAULT_USER_ATTRIBUTES
-    elif AD_OBJECT == "computer":
-        requested_attributes = DEFAULT_COMPUTER_ATTRIBUTES
-    else:  # group
-        requested_attributes = DEFAULT_GROUP_ATTRIBUTES
-    
-    info_log(f"Default {AD_OBJECT} attribute listesi: {len(requested_attributes)} attribute")
-    debug_log(f"Attributes: {', '.join(requested_attributes)}")
+def extract_attributes(entry, requested_attributes):
+    """Entry'den istenen attribute'leri normalize ederek al"""
+    attributes = {}
+    missing_attributes = []
+    
+    for attr in requested_attributes:
+        try:
+            if attr.lower() == "member" and entry.entry_dn.lower() in MEMBER_RANGES:
+                attributes[attr] = MEMBER_RANGES[entry.entry_dn.lower()]
+            elif hasattr(entry, attr):
+                raw_value = getattr(entry, attr).value
+                debug_log(f"Attribute '{attr}': {type(raw_value).__name__}")
+                normalized_value = normalize_attribute_value(attr, raw_value)
+                attributes[attr] = normalized_value
+            else:
+                debug_log(f"Attribute '{attr}': NOT FOUND")
+                attributes[attr] = "N/A"
+                missing_attributes.append(attr)
+        except Exception as e:
+            warn_log(f"Attribute '{attr}' işlenirken hata: {e}")
+            attributes[attr] = "N/A"
+            missing_attributes.append(attr)
+    
+    if missing_attributes:
+        warn_log(f"Eksik attributes ({len(missing_attributes)}): {', '.join(missing_attributes)}")
+    
+    return attributes
 
-# ============================================
-# SEARCH FILTER BELİRLE
-# ============================================
+def extract_response_attributes(response_attributes, requested_attributes, member_value=None):
+    """Paged search response'undaki attribute'leri normalize et (export kaydı, entry başına log yok)"""
+    values = {name.lower(): value for name, value in response_attributes.items()}
+    attributes = {attr: normalize_attribute_value(attr, values.get(attr.lower())) for attr in requested_attributes}
+    if member_value is not None:
+        attributes["member"] = member_value
+    return attributes
 
-if AD_OBJECT == "user":
-    search_filter = f"(&(objectClass=user)(objectCategory=person)(sAMAccountName={AD_SEARCH}))"
-elif AD_OBJECT == "computer":
-    search_filter = f"(&(objectClass=computer)(cn={AD_SEARCH}))"
-else:  # group
-    search_filter = f"(&(objectClass=group)(cn={AD_SEARCH}))"
+def build_found_output(search_term, entry, server, credential_test_dc, tried_servers, requested_attributes):
+    """Bulunan object için çıktı (tek sorgu ve batch sonuçlarında aynı format)"""
+    output = {
+        "success": True,
+        "found": True,
+        "object_type": AD_OBJECT,
+        "domain": AD_DOMAIN,
+        "server": server,
+        "credential_test_dc": credential_test_dc,
+        "search_term": search_term,
+        "dn": entry.entry_dn,
+        "tried_servers": tried_servers,
+        "attributes": extract_attributes(entry, requested_attributes)
+    }
+    if GC_MODE:
+        output["source_domain"] = get_dn_domain(entry.entry_dn)
+    return output
 
-debug_log(f"Search Filter: {search_filter}")
+def build_not_found_output(search_term, credential_test_dc, tried_servers):
+    """Bulunamayan object için çıktı"""
+    return {
+        "success": True,
+        "found": False,
+        "object_type": AD_OBJECT,
+        "domain": AD_DOMAIN,
+        "search_term": search_term,
+        "credential_test_dc": credential_test_dc,
+        "tried_servers": tried_servers,
+        "message": f"{AD_OBJECT.capitalize()} '{search_term}' hiçbir DC'de bulunamadı"
+    }
 
 # ============================================
-# BASE DN OLUŞTUR
+# DN ÇÖZÜMLEME (FRIENDLY NAME)
 # ============================================
+# DN değerli attribute'lerdeki DN'ler (AD_QUERY_RESOLVE_DNS=true) tek tek sorgu
+# yerine BATCH_SIZE'lık (|(distinguishedName=...)...) filtreleriyle, sorgunun
+# connection'ı üzerinde okunur. Bir enrich geçişinin çözümleri o geçişe ait
+# dict'te tutulur (LRU'dan atılsa da kaybolmaz); sınırlı LRU sadece çağrılar
+# arası tekrar okumayı önler. Domain'de bulunamayan DN'ler {"dn": ...} kalır.
+DN_VALUED_ATTRIBUTES = ["member", "memberof", "manager", "managedby", "directreports"]
+RESOLVE_CACHE = OrderedDict()  # DN (lower) -> çözülmüş obje veya None (domain'de yok)
 
-base_dn = generate_base_dn(AD_DOMAIN)
-info_log(f"Base DN: {base_dn}")
+def cache_resolved_dn(dn, value):
+    """LRU'ya ekle, limit aşılırsa en eski kaydı at"""
+    RESOLVE_CACHE[dn.lower()] = value
+    RESOLVE_CACHE.move_to_end(dn.lower())
+    if len(RESOLVE_CACHE) > RESOLVE_CACHE_SIZE:
+        RESOLVE_CACHE.popitem(last=False)
 
-# ============================================
-# DC DISCOVERY
-# ============================================
+def get_resolved_dn(dn, resolved):
+    """DN'in friendly name objesi (çözülmediyse veya bulunamadıysa sadece dn)"""
+    value = resolved.get(dn.lower())
+    if value is None:
+        return {"dn": dn}
+    return value
 
-info_log("=" * 60)
-info_log("DC DISCOVERY")
-info_log("=" * 60)
+def collect_dn_values(value):
+    """Normalize edilmiş attribute değerindeki DN'ler (string, liste veya member dict'i)"""
+    if isinstance(value, dict):
+        return value.get("members", value.get("sample", []))
+    if isinstance(value, list):
+        return [item for item in value if isinstance(item, str)]
+    if isinstance(value, str) and value != "N/A":
+        return [value]
+    return []
 
-dc_list = discover_all_domain_controllers(AD_DOMAIN)
-info_log(f"DC listesi hazır: {len(dc_list)} DC")
+def replace_dn_values(value, resolved):
+    """Attribute değerindeki DN string'lerini çözülmüş objelerle değiştir"""
+    if isinstance(value, dict):
+        enriched = dict(value)
+        for key in ("sample", "members"):
+            if key in enriched:
+                enriched[key] = [get_resolved_dn(dn, resolved) for dn in enriched[key]]
+        return enriched
+    if isinstance(value, list):
+        return [get_resolved_dn(item, resolved) if isinstance(item, str) else item for item in value]
+    if isinstance(value, str) and value != "N/A":
+        return get_resolved_dn(value, resolved)
+    return value
+
+def resolve_dn_names(conn, base_dn, dns):
+    """DN'leri çöz: cache'te olmayanlar chunk'lı OR filtreleriyle okunur
+    
+    Returns: bu çağrının çözümleri {DN (lower): obje veya None}; hata olursa
+    kalan DN'ler dict'te yer almaz (çözülmeden döner)
+    """
+    resolved = {}
+    pending = []
+    for dn in dns:
+        key = dn.lower()
+        if key in resolved:
+            continue
+        if key in RESOLVE_CACHE:
+            RESOLVE_CACHE.move_to_end(key)
+            resolved[key] = RESOLVE_CACHE[key]
+        else:
+            resolved[key] = None
+            pending.append(dn)
+    
+    if not pending:
+        return resolved
+    
+    debug_log(f"DN çözümleme: {len(pending)} DN ({len(dns) - len(pending)} cache'ten)")
+    
+    for start in range(0, len(pending), BATCH_SIZE):
+        chunk = pending[start:start + BATCH_SIZE]
+        search_filter = "(|" + "".join(f"(distinguishedName={escape_filter_chars(dn)})" for dn in chunk) + ")"
+        try:
+            conn.search(
+                search_base=base_dn,
+                search_filter=search_filter,
+                search_scope=SUBTREE,
+                attributes=RESOLVE_ATTRIBUTES
+            )
+        except Exception as e:
+            warn_log(f"DN çözümleme başarısız, kalan DN'ler ham döner: {e}")
+            return resolved
+        
+        found = set()
+        for response in conn.response:
+            if response.get("type") != "searchResEntry":
+                continue
+            found.add(response["dn"].lower())
+            entry = {"dn": response["dn"]}
+            entry.update(extract_response_attributes(response["attributes"], RESOLVE_ATTRIBUTES))
+            resolved[response["dn"].lower()] = entry
+            cache_resolved_dn(response["dn"], entry)
+        
+        for dn in chunk:
+            if dn.lower() not in found:
+                cache_resolved_dn(dn, None)
+    
+    return resolved
+
+def enrich_dn_attributes(conn, base_dn, attribute_dicts):
+    """Attribute dict'lerindeki DN değerlerini tek seferde çözüp yerinde zenginleştir"""
+    if not RESOLVE_DNS:
+        return
+    
+    dns = []
+    for attributes in attribute_dicts:
+        for attr, value in attributes.items():
+            if attr.lower() in DN_VALUED_ATTRIBUTES:
+                dns.extend(collect_dn_values(value))
+    
+    resolved = resolve_dn_names(conn, base_dn, dns)
+    
+    for attributes in attribute_dicts:
+        for attr in list(attributes):
+            if attr.lower() in DN_VALUED_ATTRIBUTES:
+                attributes[attr] = replace_dn_values(attributes[attr], resolved)
 
 # ============================================
-# TLS KONFİGÜRASYONU
+# SONUÇ CACHE (TTL)
 # ============================================
+# user/computer/group sonuçları (object tipi, domain, terim, attribute seti)
+# anahtarıyla diske yazılır. TTL içindeki kayıt DNS/TLS/bind olmadan döner.
+# Süresi dolan kayıt bind sonrası tek base read ile doğrulanır: uSNChanged DC'ye
+# özel olduğundan aynı DC'de uSNChanged, farklı DC'de whenChanged karşılaştırılır.
+# Sadece bulunan object'ler cache'lenir.
+CACHE_VALIDATION_ATTRIBUTES = ["uSNChanged", "whenChanged"]
 
-info_log("=" * 60)
-info_log("SSL/TLS KONFİGÜRASYONU")
-info_log("=" * 60)
+def is_result_cache_enabled():
+    """Sonuç cache'i bu sorgu tipi için açık mı (GC'de uSNChanged doğrulaması yok)"""
+    return RESULT_CACHE_TTL > 0 and AD_OBJECT in OBJECT_CLASS_FILTERS and not GC_MODE
 
-tls_config = create_tls_config()
+def get_result_cache_path(search_term, requested_attributes):
+    """Cache dosyası (çıktıyı değiştiren ayarlar da anahtara dahil)"""
+    key = json.dumps([
+        AD_OBJECT,
+        AD_DOMAIN.lower(),
+        search_term.lower(),
+        sorted(attr.lower() for attr in requested_attributes),
+        MEMBER_MODE,
+        MEMBER_SAMPLE_SIZE,
+        RESOLVE_ATTRIBUTES if RESOLVE_DNS else None
+    ])
+    return os.path.join(RESULT_CACHE_DIR, hashlib.sha256(key.encode("utf-8")).hexdigest() + ".json")
 
-# ============================================
-# CREDENTİAL TEST (İlk DC'de)
-# ============================================
+def add_cache_validation_attributes(search_attributes):
+    """Cache açıksa doğrulama attribute'lerini search'e ekle"""
+    if not is_result_cache_enabled():
+        return search_attributes
+    
+    lowered = [attr.lower() for attr in search_attributes]
+    return search_attributes + [attr for attr in CACHE_VALIDATION_ATTRIBUTES if attr.lower() not in lowered]
 
-credential_test_dc = test_credentials_on_first_dc(dc_list, tls_config)
-info_log(f"✓ Credential test tamamlandı: {credential_test_dc}")
+def get_validation_values(raw_attributes):
+    """Raw attribute'lerden uSNChanged / whenChanged (string)"""
+    values = {}
+    for attr in CACHE_VALIDATION_ATTRIBUTES:
+        raw = get_raw_values(raw_attributes, attr)
+        value = raw[0] if raw else None
+        values[attr.lower()] = value.decode("utf-8") if isinstance(value, bytes) else value
+    return values
 
-# ============================================
-# MULTI-DC SEARCH
-# ============================================
+def build_cached_output(record, status, age=None):
+    """Cache kaydından çıktı (cache: hit / revalidated)"""
+    output = dict(record["output"])
+    output["cache"] = status
+    if age is not None:
+        output["cache_age"] = int(age)
+    return output
 
-search_result = search_across_all_dcs(dc_list, base_dn, search_filter, requested_attributes, tls_config)
+def write_cache_record(path, record):
+    """Cache kaydını atomik yaz (dizin sadece kullanıcıya açık)"""
+    try:
+        os.makedirs(RESULT_CACHE_DIR, mode=0o700, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as handle:
+            json.dump(record, handle, ensure_ascii=False)
+        os.replace(temp_path, path)
+    except Exception as e:
+        warn_log(f"Sonuç cache'i yazılamadı: {e}")
+
+def lookup_cached_results(search_terms, requested_attributes):
+    """Terimleri cache'te ara
+    
+    Returns: ({terim: çıktı} TTL içindekiler, {terim: (kayıt, dosya)} süresi dolanlar)
+    """
+    fresh = {}
+    stale = {}
+    if not is_result_cache_enabled():
+        return fresh, stale
+    
+    for term in search_terms:
+        path = get_result_cache_path(term, requested_attributes)
+        try:
+            with open(path, encoding="utf-8") as handle:
+                record = json.load(handle)
+        except FileNotFoundError:
+            continue
+        except Exception as e:
+            warn_log(f"Sonuç cache'i okunamadı ({path}): {e}")
+            continue
+        
+        age = time.time() - record.get("stored_at", 0)
+        if age <= RESULT_CACHE_TTL:
+            fresh[term] = build_cached_output(record, "hit", age)
+        else:
+            stale[term] = (record, path)
+    
+    if fresh or stale:
+        info_log(f"Sonuç cache'i: {len(fresh)} geçerli, {len(stale)} süresi dolmuş, {len(search_terms) - len(fresh) - len(stale)} yok")
+    return fresh, stale
+
+def revalidate_cached_results(conn, dc, stale_results, cached_results):
+    """Süresi dolan kayıtları base read ile doğrula; değişmeyenler cached_results'a eklenir"""
+    for term, (record, path) in stale_results.items():
+        try:
+            conn.search(
+                search_base=record["dn"],
+                search_filter="(objectClass=*)",
+                search_scope=BASE,
+                attributes=CACHE_VALIDATION_ATTRIBUTES
+            )
+            current = get_validation_values(conn.response[0]["raw_attributes"]) if conn.response else None
+        except Exception as e:
+            debug_log(f"Cache doğrulama başarısız ({term}): {e}")
+            current = None
+        
+        # uSNChanged sadece aynı DC'de karşılaştırılabilir
+        key = "usnchanged" if dc == record.get("server") else "whenchanged"
+        if current is None or current[key] is None or current[key] != record["validation"].get(key):
+            debug_log(f"Cache kaydı değişmiş, yeniden sorgulanacak: {term}")
+            continue
+        
+        record["stored_at"] = time.time()
+        if key == "whenchanged":
+            # Sonraki doğrulamalar bu DC'nin uSNChanged'i ile yapılabilsin
+            record["server"] = dc
+            record["validation"] = current
+        write_cache_record(path, record)
+        cached_results[term] = build_cached_output(record, "revalidated")
+        debug_log(f"✓ Cache kaydı doğrulandı: {term}")
+
+def store_cached_result(search_term, output, requested_attributes, entry=None):
+    """Sorgulanan sonucu cache'e yaz (sadece bulunanlar) ve cache: miss olarak işaretle"""
+    if not is_result_cache_enabled():
+        return
+    
+    if entry is not None:
+        write_cache_record(get_result_cache_path(search_term, requested_attributes), {
+            "stored_at": time.time(),
+            "server": output["server"],
+            "dn": entry.entry_dn,
+            "validation": get_validation_values(entry.entry_raw_attributes),
+            "output": output
+        })
+    output["cache"] = "miss"
 
 # ============================================
-# SONUÇ İŞLEME
+# SORGU MODLARI
 # ============================================
 
-if not search_result["found"]:
-    # Object bulunamadı
+def run_single_query(dc_list, base_dn, requested_attributes, credential_test_dc, bound_conn):
+    """Tek terim sorgusu (mevcut çıktı formatı)"""
+    search_filter = build_search_filter(AD_OBJECT, AD_SEARCH)
+    debug_log(f"Search Filter: {search_filter}")
+    
+    search_attributes = add_cache_validation_attributes(get_search_attributes(requested_attributes))
+    search_result = search_across_all_dcs(dc_list, base_dn, search_filter, search_attributes,
+                                          bound_dc=credential_test_dc, bound_conn=bound_conn)
+    
+    if not search_result["found"]:
+        info_log("=" * 60)
+        info_log("SORGU TAMAMLANDI - OBJECT BULUNAMADI")
+        info_log("=" * 60)
+        output = build_not_found_output(AD_SEARCH, credential_test_dc, search_result["tried_servers"])
+        store_cached_result(AD_SEARCH, output, requested_attributes)
+        return output
+    
+    # Object bulundu - attribute'leri işle
+    entry = search_result["entries"][0]
+    info_log(f"✓ Object bulundu: {AD_SEARCH}")
+    debug_log(f"DN: {entry.entry_dn}")
+    
+    output = build_found_output(
+        AD_SEARCH,
+        entry,
+        search_result["server"],
+        credential_test_dc,
+        search_result["tried_servers"],
+        requested_attributes
+    )
+    enrich_dn_attributes(bound_conn, base_dn, [output["attributes"]])
+    store_cached_result(AD_SEARCH, output, requested_attributes, entry)
+    
+    info_log("=" * 60)
+    info_log("SORGU TAMAMLANDI")
+    info_log("=" * 60)
+    info_log(f"DN: {entry.entry_dn}")
+    info_log(f"Server: {search_result['server']}")
+    info_log(f"Attributes: {len(output['attributes'])} adet")
+    
+    return output
+
+def build_batch_output(search_terms, results, credential_test_dc, tried_servers):
+    """Batch çıktısı (terim bazlı sonuçlar + özet)"""
+    found_count = sum(1 for result in results.values() if result["found"])
+    
+    info_log("=" * 60)
+    info_log("BATCH SORGU TAMAMLANDI")
+    info_log("=" * 60)
+    info_log(f"Bulunan: {found_count}/{len(search_terms)}")
+    
     output = {
         "success": True,
-        "found": False,
+        "batch": True,
         "object_type": AD_OBJECT,
         "domain": AD_DOMAIN,
-        "search_term": AD_SEARCH,
         "credential_test_dc": credential_test_dc,
-        "tried_servers": search_result["tried_servers"],
-        "message": f"{AD_OBJECT.capitalize()} '{AD_SEARCH}' hiçbir DC'de bulunamadı"
+        "total_requested": len(search_terms),
+        "found_count": found_count,
+        "not_found_count": len(search_terms) - found_count,
+        "tried_servers": tried_servers,
+        "results": results
+    }
+    if is_result_cache_enabled():
+        output["cache_hits"] = sum(1 for result in results.values() if result.get("cache") in ("hit", "revalidated"))
+    return output
+
+def run_batch_query(search_terms, dc_list, base_dn, requested_attributes, credential_test_dc, bound_conn, cached_results=None):
+    """Batch sorgu: terim bazlı sonuç dict'i (her sonuç tek sorgu formatında)
+    
+    cached_results'taki terimler (sonuç cache'i) DC'lerde aranmaz.
+    """
+    cached_results = cached_results or {}
+    query_terms = [term for term in search_terms if term not in cached_results]
+    
+    # Entry'leri terime eşlemek için arama attribute'ü her zaman okunur
+    key_attribute = SEARCH_KEY_ATTRIBUTES[AD_OBJECT]
+    search_attributes = add_cache_validation_attributes(get_search_attributes(requested_attributes))
+    if key_attribute.lower() not in [attr.lower() for attr in search_attributes]:
+        search_attributes.append(key_attribute)
+    
+    batch_result = search_batch_across_all_dcs(dc_list, base_dn, AD_OBJECT, query_terms, search_attributes,
+                                               bound_dc=credential_test_dc, bound_conn=bound_conn)
+    
+    results = {}
+    for term in search_terms:
+        if term in cached_results:
+            results[term] = cached_results[term]
+            continue
+        
+        term_tried_servers = batch_result["term_tried_servers"][term]
+        if term in batch_result["found"]:
+            server, entry = batch_result["found"][term]
+            debug_log(f"✓ {term}: {entry.entry_dn}")
+            results[term] = build_found_output(term, entry, server, credential_test_dc, term_tried_servers, requested_attributes)
+        else:
+            results[term] = build_not_found_output(term, credential_test_dc, term_tried_servers)
+    
+    enrich_dn_attributes(bound_conn, base_dn, [results[term]["attributes"] for term in query_terms if results[term]["found"]])
+    
+    for term in query_terms:
+        entry = batch_result["found"][term][1] if term in batch_result["found"] else None
+        store_cached_result(term, results[term], requested_attributes, entry)
+    
+    return build_batch_output(search_terms, results, credential_test_dc, batch_result["tried_servers"])
+
+# ============================================
+# EXPORT (PAGED SEARCH)
+# ============================================
+# Sayfalar aynı DC'den okunmalı (paged cookie DC'ye özel): export credential test
+# DC'sinin bind edilmiş connection'ı üzerinde çalışır, DC failover yapılmaz.
+PAGED_RESULTS_OID = "1.2.840.113556.1.4.319"
+
+def iter_paged_search(conn, base_dn, search_filter, attributes, controls=None):
+    """Paged search: her sayfanın response listesini üret
+    
+    Cookie sayfa dönmeden önce alınır; sayfa işlenirken aynı connection'da
+    başka search (ör. member range) yapılabilir. controls paged control'e
+    ek olarak gönderilir (ör. Show Deleted).
+    """
+    cookie = None
+    while True:
+        conn.search(
+            search_base=base_dn,
+            search_filter=search_filter,
+            search_scope=SUBTREE,
+            attributes=attributes,
+            paged_size=EXPORT_PAGE_SIZE,
+            paged_cookie=cookie,
+            controls=controls
+        )
+        page = conn.response
+        result_controls = conn.result.get("controls") or {}
+        cookie = result_controls.get(PAGED_RESULTS_OID, {}).get("value", {}).get("cookie")
+        
+        yield page
+        
+        if not cookie:
+            return
+
+def build_response_record(conn, response, requested_attributes, read_members):
+    """Search response'undan {dn, attributes} kaydı (member range'leri conn ile okunur)"""
+    member_value = read_member_ranges(conn, response["dn"], response["raw_attributes"]) if read_members else None
+    record = {
+        "dn": response["dn"],
+        "attributes": extract_response_attributes(response["attributes"], requested_attributes, member_value)
     }
+    if GC_MODE:
+        record["source_domain"] = get_dn_domain(response["dn"])
+    return record
+
+def open_export_output():
+    """Export hedefi: (handle, geçici dosya yolu) - stdout için geçici dosya yok"""
+    if not EXPORT_FILE or EXPORT_FILE == "-":
+        return sys.stdout, None
+    
+    tmp_path = f"{EXPORT_FILE}.tmp.{os.getpid()}"
+    return open(tmp_path, "w", encoding="utf-8"), tmp_path
+
+def close_export_output(handle, tmp_path, success):
+    """Dosyaya export başarılıysa geçici dosyayı hedefe taşı, değilse sil"""
+    if tmp_path is None:
+        handle.flush()
+        return
+    
+    handle.close()
+    if success:
+        os.replace(tmp_path, EXPORT_FILE)
+    else:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+def run_export(base_dn, requested_attributes, credential_test_dc, bound_conn):
+    """Paged search ile export: her entry bir NDJSON satırı, sayfa sayfa yazılır"""
+    export_base_dn = EXPORT_BASE_DN or base_dn
+    search_filter = AD_SEARCH.strip()
+    
+    info_log("=" * 60)
+    info_log("EXPORT (PAGED SEARCH)")
+    info_log("=" * 60)
+    info_log(f"Server: {credential_test_dc}")
+    info_log(f"Base DN: {export_base_dn}")
+    info_log(f"Filter: {search_filter}")
+    info_log(f"Page Size: {EXPORT_PAGE_SIZE}")
+    
+    search_attributes = get_search_attributes(requested_attributes)
+    read_members = has_member_range(search_attributes)
+    
+    handle, tmp_path = open_export_output()
+    count = 0
+    pages = 0
+    error = None
+    
+    try:
+        for page in iter_paged_search(bound_conn, export_base_dn, search_filter, search_attributes):
+            pages += 1
+            records = [
+                build_response_record(bound_conn, response, requested_attributes, read_members)
+                for response in page if response.get("type") == "searchResEntry"
+            ]
+            enrich_dn_attributes(bound_conn, base_dn, [record["attributes"] for record in records])
+            
+            for record in records:
+                handle.write(json.dumps(record, ensure_ascii=False) + "\n")
+            count += len(records)
+            
+            debug_log(f"Sayfa {pages}: toplam {count} kayıt")
+    
+    except Exception as e:
+        error = str(e)
+        warn_log(f"Export {pages + 1}. sayfada kesildi: {error}")
+    
+    finally:
+        close_export_output(handle, tmp_path, error is None)
     
     info_log("=" * 60)
-    info_log("SORGU TAMAMLANDI - OBJECT BULUNAMADI")
+    info_log("EXPORT TAMAMLANDI" if error is None else "EXPORT BAŞARISIZ")
     info_log("=" * 60)
+    info_log(f"Kayıt: {count}, Sayfa: {pages}")
     
-    print(json.dumps(output, ensure_ascii=False, indent=2 if DEBUG else None))
-    sys.exit(0)
+    output = {
+        "success": error is None,
+        "export": True,
+        "domain": AD_DOMAIN,
+        "server": credential_test_dc,
+        "base_dn": export_base_dn,
+        "filter": search_filter,
+        "page_size": EXPORT_PAGE_SIZE,
+        "pages": pages,
+        "count": count,
+        "output": EXPORT_FILE if tmp_path else "stdout"
+    }
+    if error is not None:
+        output["error"] = "Export yarıda kesildi"
+        output["details"] = error
+    return output
+
+# ============================================
+# TRANSITIVE ÜYELİK
+# ============================================
+# Nested üyelik client tarafında seviye seviye gezilmez:
+#   transitive_members: (memberOf:1.2.840.113556.1.4.1941:=<grup DN>) tek paged search
+#   transitive_groups:  user'ın tokenGroups'u (base read) + SID'lerin chunk'lı OR filtresiyle çözümü
+# Object DN'i ve üyelik aynı DC'den okunur (credential test connection'ı).
+IN_CHAIN_RULE_OID = "1.2.840.113556.1.4.1941"  # LDAP_MATCHING_RULE_IN_CHAIN
+TRANSITIVE_LOOKUPS = {
+    "transitive_members": "group",
+    "transitive_groups": "user"
+}
 
-# Object bulundu - attribute'leri işle
-entry = search_result["entries"][0]
-info_log(f"✓ Object bulundu: {AD_SEARCH}")
-debug_log(f"DN: {entry.entry_dn}")
+def find_object_dn(conn, base_dn, object_type, search_term):
+    """Object'in DN'ini bul (bulunamazsa None)"""
+    conn.search(
+        search_base=base_dn,
+        search_filter=build_search_filter(object_type, search_term),
+        search_scope=SUBTREE,
+        attributes=["distinguishedName"]
+    )
+    for response in conn.response:
+        if response.get("type") == "searchResEntry":
+            return response["dn"]
+    return None
+
+def get_raw_values(raw_attributes, attr_name):
+    """Raw attribute dict'inden değer listesi (isim case-insensitive)"""
+    for name, values in raw_attributes.items():
+        if name.lower() == attr_name.lower():
+            return values or []
+    return []
 
-attributes = {}
-missing_attributes = []
+def get_transitive_members(conn, base_dn, group_dn, requested_attributes):
+    """Grubun tüm nested üyeleri (in-chain matching rule, paged)"""
+    search_filter = f"(memberOf:{IN_CHAIN_RULE_OID}:={escape_filter_chars(group_dn)})"
+    search_attributes = get_search_attributes(requested_attributes)
+    read_members = has_member_range(search_attributes)
+    debug_log(f"Transitive filter: {search_filter}")
+    
+    results = []
+    for page in iter_paged_search(conn, base_dn, search_filter, search_attributes):
+        for response in page:
+            if response.get("type") == "searchResEntry":
+                results.append(build_response_record(conn, response, requested_attributes, read_members))
+    
+    return {"results": results}
 
-for attr in requested_attributes:
+def get_transitive_groups(conn, base_dn, user_dn, requested_attributes):
+    """User'ın tüm nested grupları (tokenGroups + batch SID çözümleme)
+    
+    tokenGroups constructed attribute'tür, sadece base search ile okunur.
+    Domain partition'da bulunamayan SID'ler (ör. başka domain'deki
+    universal gruplar) unresolved_sids olarak döner.
+    """
+    conn.search(
+        search_base=user_dn,
+        search_filter="(objectClass=*)",
+        search_scope=BASE,
+        attributes=["tokenGroups"]
+    )
+    sids = []
+    for response in conn.response:
+        if response.get("type") == "searchResEntry":
+            sids = [bytes(sid) for sid in get_raw_values(response["raw_attributes"], "tokenGroups")]
+    debug_log(f"tokenGroups: {len(sids)} SID")
+    
+    search_attributes = get_search_attributes(requested_attributes)
+    read_members = has_member_range(search_attributes)
+    if "objectsid" not in [attr.lower() for attr in search_attributes]:
+        search_attributes.append("objectSid")
+    
+    results = []
+    resolved = set()
+    for start in range(0, len(sids), BATCH_SIZE):
+        chunk = sids[start:start + BATCH_SIZE]
+        search_filter = "(|" + "".join(f"(objectSid={escape_bytes(sid)})" for sid in chunk) + ")"
+        conn.search(
+            search_base=base_dn,
+            search_filter=search_filter,
+            search_scope=SUBTREE,
+            attributes=search_attributes
+        )
+        page = conn.response
+        for response in page:
+            if response.get("type") != "searchResEntry":
+                continue
+            for sid in get_raw_values(response["raw_attributes"], "objectSid"):
+                resolved.add(bytes(sid))
+            results.append(build_response_record(conn, response, requested_attributes, read_members))
+    
+    return {
+        "results": results,
+        "unresolved_sids": [format_sid(sid) for sid in sids if sid not in resolved]
+    }
+
+def run_transitive_query(base_dn, requested_attributes, credential_test_dc, bound_conn):
+    """Transitive üyelik sorgusu (nesting derinliğinden bağımsız 1-2 round trip)"""
+    object_type = TRANSITIVE_LOOKUPS[AD_OBJECT]
+    
+    info_log("=" * 60)
+    info_log(f"TRANSITIVE SORGU ({AD_OBJECT})")
+    info_log("=" * 60)
+    info_log(f"Server: {credential_test_dc}")
+    
     try:
-        if hasattr(entry, attr):
-            raw_value = getattr(entry, attr).value
-            debug_log(f"Attribute '{attr}': {type(raw_value).__name__}")
-            normalized_value = normalize_attribute_value(attr, raw_value)
-            attributes[attr] = normalized_value
+        object_dn = find_object_dn(bound_conn, base_dn, object_type, AD_SEARCH)
+        if object_dn is None:
+            info_log(f"✗ {object_type.capitalize()} bulunamadı: {AD_SEARCH}")
+            return {
+                "success": True,
+                "found": False,
+                "object_type": AD_OBJECT,
+                "domain": AD_DOMAIN,
+                "server": credential_test_dc,
+                "search_term": AD_SEARCH,
+                "message": f"{object_type.capitalize()} '{AD_SEARCH}' bulunamadı ({credential_test_dc})"
+            }
+        
+        info_log(f"✓ {object_type.capitalize()} bulundu: {object_dn}")
+        if AD_OBJECT == "transitive_members":
+            lookup = get_transitive_members(bound_conn, base_dn, object_dn, requested_attributes)
         else:
-            debug_log(f"Attribute '{attr}': NOT FOUND")
-            attributes[attr] = "N/A"
-            missing_attributes.append(attr)
+            lookup = get_transitive_groups(bound_conn, base_dn, object_dn, requested_attributes)
+        enrich_dn_attributes(bound_conn, base_dn, [record["attributes"] for record in lookup["results"]])
+    
     except Exception as e:
-        warn_log(f"Attribute '{attr}' işlenirken hata: {e}")
-        attributes[attr] = "N/A"
-        missing_attributes.append(attr)
-
-if missing_attributes:
-    warn_log(f"Eksik attributes ({len(missing_attributes)}): {', '.join(missing_attributes)}")
+        error_exit(f"Transitive sorgu başarısız: {credential_test_dc}", str(e))
+    
+    info_log("=" * 60)
+    info_log("TRANSITIVE SORGU TAMAMLANDI")
+    info_log("=" * 60)
+    info_log(f"Sonuç: {len(lookup['results'])} adet")
+    
+    output = {
+        "success": True,
+        "found": True,
+        "object_type": AD_OBJECT,
+        "domain": AD_DOMAIN,
+        "server": credential_test_dc,
+        "search_term": AD_SEARCH,
+        "dn": object_dn,
+        "count": len(lookup["results"]),
+        "results": lookup["results"]
+    }
+    if "unresolved_sids" in lookup:
+        output["unresolved_sids"] = lookup["unresolved_sids"]
+    return output
 
 # ============================================
-# JSON ÇIKTI
+# MIRROR (SQLITE)
 # ============================================
+# ad_mirror_sync.py user/computer/group'ları normalize edilmiş haliyle domain
+# başına bir SQLite dosyasına yazar (uSNChanged watermark ile incremental).
+# --source=mirror sorguları DNS/TLS/bind olmadan bu index'ten cevaplanır;
+# sonuç mirror'ın son sync anı kadar günceldir (mirror_synced_at).
 
-output = {
-    "success": True,
-    "found": True,
-    "object_type": AD_OBJECT,
-    "domain": AD_DOMAIN,
-    "server": search_result["server"],
-    "credential_test_dc": credential_test_dc,
-    "search_term": AD_SEARCH,
-    "dn": entry.entry_dn,
-    "tried_servers": search_result["tried_servers"],
-    "attributes": attributes
-}
+def get_mirror_path(domain):
+    """Domain'in mirror veritabanı dosyası"""
+    name = re.sub(r"[^a-z0-9.-]", "_", domain.lower())
+    return os.path.join(MIRROR_DIR, f"{name}.sqlite")
 
-info_log("=" * 60)
-info_log("SORGU TAMAMLANDI")
-info_log("=" * 60)
-info_log(f"DN: {entry.entry_dn}")
-info_log(f"Server: {search_result['server']}")
-info_log(f"Attributes: {len(attributes)} adet")
+def build_mirror_output(search_term, row, requested_attributes, synced_at):
+    """Mirror satırından tek sorgu formatında çıktı"""
+    if row is None:
+        return {
+            "success": True,
+            "found": False,
+            "source": "mirror",
+            "object_type": AD_OBJECT,
+            "domain": AD_DOMAIN,
+            "search_term": search_term,
+            "mirror_synced_at": synced_at,
+            "message": f"{AD_OBJECT.capitalize()} '{search_term}' mirror'da bulunamadı"
+        }
+    
+    dn, server, stored_json = row
+    stored = json.loads(stored_json)
+    missing = [attr for attr in requested_attributes if attr not in stored]
+    if missing:
+        debug_log(f"Mirror'da olmayan attribute'ler ({search_term}): {', '.join(missing)}")
+    
+    return {
+        "success": True,
+        "found": True,
+        "source": "mirror",
+        "object_type": AD_OBJECT,
+        "domain": AD_DOMAIN,
+        "server": server,
+        "search_term": search_term,
+        "dn": dn,
+        "mirror_synced_at": synced_at,
+        "attributes": {attr: stored.get(attr, "N/A") for attr in requested_attributes}
+    }
+
+def run_mirror_query(search_terms, requested_attributes):
+    """Tek veya batch sorguyu yerel mirror'dan cevapla"""
+    mirror_path = get_mirror_path(AD_DOMAIN)
+    if not os.path.isfile(mirror_path):
+        error_exit(f"Mirror bulunamadı: {mirror_path}", f"Önce senkronize edin: ad_mirror_sync.py {AD_DOMAIN}")
+    
+    started = time.monotonic()
+    try:
+        db = sqlite3.connect(f"file:{mirror_path}?mode=ro", uri=True)
+        try:
+            state = dict(db.execute("SELECT key, value FROM sync_state").fetchall())
+            synced_at = state.get("synced_at")
+            terms = [AD_SEARCH] if search_terms is None else search_terms
+            results = {}
+            for term in terms:
+                row = db.execute(
+                    "SELECT dn, server, attributes FROM objects WHERE object_type = ? AND search_key = ? COLLATE NOCASE",
+                    (AD_OBJECT, term)
+                ).fetchone()
+                results[term] = build_mirror_output(term, row, requested_attributes, synced_at)
+        finally:
+            db.close()
+    except sqlite3.Error as e:
+        error_exit(f"Mirror okunamadı: {mirror_path}", str(e))
+    
+    info_log(f"✓ Mirror sorgusu: {len(results)} terim, {round((time.monotonic() - started) * 1000, 1)} ms")
+    
+    if search_terms is None:
+        return results[AD_SEARCH]
+    
+    found_count = sum(1 for result in results.values() if result["found"])
+    return {
+        "success": True,
+        "batch": True,
+        "source": "mirror",
+        "object_type": AD_OBJECT,
+        "domain": AD_DOMAIN,
+        "total_requested": len(search_terms),
+        "found_count": found_count,
+        "not_found_count": len(search_terms) - found_count,
+        "mirror_synced_at": synced_at,
+        # Mirror'da DC'ye gidilmez; DC sorgusu batch çıktısıyla aynı anahtarlar
+        "credential_test_dc": None,
+        "tried_servers": [],
+        "results": results
+    }
+
+# ============================================
+# MAIN
+# ============================================
+
+def main():
+    """Ana akış"""
+    debug_log("=" * 60)
+    debug_log("AD QUERY SCRIPT BAŞLATILIYOR")
+    debug_log("=" * 60)
+    
+    validate_parameters()
+    search_terms = load_search_terms(AD_SEARCH) if AD_OBJECT in OBJECT_CLASS_FILTERS else None
+    
+    debug_log(f"Object Type: {AD_OBJECT}")
+    debug_log(f"Domain: {AD_DOMAIN}")
+    if AD_OBJECT == "export":
+        info_log(f"Export mod: {AD_SEARCH}")
+    elif AD_OBJECT in TRANSITIVE_LOOKUPS:
+        info_log(f"Transitive mod: {AD_SEARCH}")
+    elif search_terms is None:
+        debug_log(f"Search Term: {AD_SEARCH}")
+    else:
+        info_log(f"Batch mod: {len(search_terms)} terim")
+    debug_log(f"Custom Attributes: {AD_ATTRIBUTES if AD_ATTRIBUTES else 'None (using defaults)'}")
+    debug_log(f"Timeout: {LDAP_TIMEOUT}s")
+    debug_log(f"Retry Budget: {MAX_RETRIES} (sorgu geneli)")
+    debug_log(f"Retry Delay: {RETRY_DELAY}s (max {RETRY_DELAY_MAX}s)")
+    
+    requested_attributes = get_requested_attributes(AD_OBJECT, AD_ATTRIBUTES)
+    
+    # Mirror kaynak: DC'ye gidilmez
+    if QUERY_SOURCE == "mirror":
+        output = run_mirror_query(search_terms, requested_attributes)
+        print(json.dumps(output, ensure_ascii=False, indent=2 if DEBUG else None))
+        sys.exit(0)
+    
+    base_dn = get_query_base_dn(AD_DOMAIN)
+    info_log(f"Base DN: {base_dn or '(forest geneli, GC)'}")
+    
+    # Sonuç cache'i: tüm terimler TTL içindeyse DC'ye hiç gidilmez
+    cache_terms = [AD_SEARCH] if search_terms is None else search_terms
+    cached_results, stale_results = lookup_cached_results(cache_terms, requested_attributes)
+    if cached_results and len(cached_results) == len(cache_terms):
+        info_log("✓ Sonuç cache'ten döndü (DC sorgusu yok)")
+        if search_terms is None:
+            output = cached_results[AD_SEARCH]
+        else:
+            output = build_batch_output(search_terms, cached_results, None, [])
+        print(json.dumps(output, ensure_ascii=False, indent=2 if DEBUG else None))
+        sys.exit(0)
+    
+    # DC discovery
+    info_log("=" * 60)
+    info_log("DC DISCOVERY")
+    info_log("=" * 60)
+    
+    dc_list = discover_all_domain_controllers(AD_DOMAIN)
+    info_log(f"DC listesi hazır: {len(dc_list)} DC")
+    
+    # TLS konfigürasyonu
+    info_log("=" * 60)
+    info_log("SSL/TLS KONFİGÜRASYONU")
+    info_log("=" * 60)
+    
+    tls_config = create_tls_config()
+    
+    # Credential test (ilk DC'de) - bind edilen connection search'te tekrar kullanılır
+    credential_test_dc, bound_conn = test_credentials_on_first_dc(dc_list, tls_config)
+    info_log(f"✓ Credential test tamamlandı: {credential_test_dc}")
+    
+    # Schema/DSE bir kez yüklenir (forest cache'i veya credential test DC'si), tüm DC'lerde kullanılır
+    load_server_info(bound_conn)
+    share_server_info(bound_conn.server, DC_SERVERS.values())
+    
+    # GC: sadece PAS attribute'leri istenir
+    excluded_attributes = []
+    if GC_MODE:
+        requested_attributes, excluded_attributes = limit_to_partial_attribute_set(bound_conn, requested_attributes)
+    
+    # Export ve transitive sorgular credential test DC'sinde, diğerleri multi-DC
+    try:
+        revalidate_cached_results(bound_conn, credential_test_dc, stale_results, cached_results)
+        
+        if AD_OBJECT == "export":
+            output = run_export(base_dn, requested_attributes, credential_test_dc, bound_conn)
+        elif AD_OBJECT in TRANSITIVE_LOOKUPS:
+            output = run_transitive_query(base_dn, requested_attributes, credential_test_dc, bound_conn)
+        elif search_terms is None and AD_SEARCH in cached_results:
+            output = cached_results[AD_SEARCH]
+        elif search_terms is None:
+            output = run_single_query(dc_list, base_dn, requested_attributes, credential_test_dc, bound_conn)
+        else:
+            output = run_batch_query(search_terms, dc_list, base_dn, requested_attributes, credential_test_dc, bound_conn, cached_results)
+    finally:
+        release_connection(bound_conn)
+    
+    if GC_MODE:
+        output["global_catalog"] = True
+        output["excluded_attributes"] = excluded_attributes
+    
+    # Export: NDJSON kayıtlarından sonra özet JSON tek satır
+    print(json.dumps(output, ensure_ascii=False, indent=2 if DEBUG and AD_OBJECT != "export" else None))
+    sys.exit(0 if output["success"] else 1)
 
-print(json.dumps(output, ensure_ascii=False, indent=2 if DEBUG else None))
-sys.exit(0)
+if __name__ == "__main__":
+    main()
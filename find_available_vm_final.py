@@ -4,13 +4,14 @@
 
 """
 VM Name Finder - Final Version
-- AD: Sertifika zorunlu, LDAPS (636), DC discovery
+- AD: Sertifika zorunlu, LDAPS (636), DC discovery (client site DCs first)
 - Preflight: Test AD and vCenter connectivity
 - Personal mode: Loop 01-99, find first available name
 - Standard mode: Check single VM name availability
 - Windows: AD check (all DCs), then vCenter (parallel async)
 - Linux: vCenter only (parallel async)
 - NetBIOS: Windows hostname 15 karakter limiti kontrolü
+- vCenter: shared vcenter_connection.py pool (deploy next to this script)
 
 Parameters:
   1. VM_NAME: "personal" or VM name
@@ -27,12 +28,25 @@ import json
 import sys
 import asyncio
 import os
+import socket
 import traceback
-from pyVim.connect import SmartConnect, Disconnect
 from pyVmomi import vim
 
+from vcenter_connection import (
+    get_vcenter_connection,
+    cleanup_connections,
+    call_with_reconnect,
+    get_call_summary,
+    check_call_budget
+)
+
 try:
-    from ldap3 import Server, Connection, Tls, SUBTREE, ALL
+    from ldap3 import Server, Connection, Tls, SUBTREE, NONE
+    from ldap3 import BASE, DEREF_NEVER
+    from ldap3.operation.search import search_operation, search_result_entry_response_to_dict_fast
+    from ldap3.protocol.rfc4511 import LDAPMessage, MessageID, ProtocolOp
+    from ldap3.utils.asn1 import encode as ber_encode, decode_message_fast
+    from ldap3.utils.conv import escape_filter_chars
     LDAP_AVAILABLE = True
 except ImportError:
     LDAP_AVAILABLE = False
@@ -68,6 +82,7 @@ VC_USERNAME = os.getenv("VC_USER")
 VC_PASSWORD = os.getenv("VC_PASS")
 AD_USERNAME = os.getenv("AD_USER")
 AD_PASSWORD = os.getenv("AD_PASS")
+AD_SITE = os.getenv("AD_SITE", "auto").strip()  # auto (CLDAP ping), site name or none
 
 # Validate inputs
 if not VM_NAME:
@@ -87,50 +102,6 @@ if OS_FAMILY == "windows":
         print(json.dumps({"available": False, "reason": f"AD certificate not found: {AD_CERT_PATH}"}))
         sys.exit(1)
 
-# SSL context for vCenter
-vc_ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
-vc_ssl_context.check_hostname = False
-vc_ssl_context.verify_mode = ssl.CERT_NONE
-
-# Connection pool
-VC_CONNECTIONS = {}
-
-def get_vcenter_connection(vc_host):
-    """Get or create vCenter connection from pool
-    
-    Improved: Handles None values and retries
-    """
-    # Başarısız bağlantıları temizle
-    if vc_host in VC_CONNECTIONS and VC_CONNECTIONS[vc_host] is None:
-        del VC_CONNECTIONS[vc_host]
-    
-    if vc_host not in VC_CONNECTIONS:
-        try:
-            connection = SmartConnect(
-                host=vc_host,
-                user=VC_USERNAME,
-                pwd=VC_PASSWORD,
-                sslContext=vc_ssl_context
-            )
-            # Başarılı olursa pool'a ekle
-            VC_CONNECTIONS[vc_host] = connection
-            return connection
-        except Exception as e:
-            # Başarısız olursa pool'a ekleme, None dön
-            print(f"[ERROR] Failed to connect to {vc_host}: {str(e)}")
-            return None
-    
-    return VC_CONNECTIONS[vc_host]
-
-def cleanup_connections():
-    """Cleanup all vCenter connections"""
-    for vc_host, connection in VC_CONNECTIONS.items():
-        try:
-            if connection is not None:
-                Disconnect(connection)
-        except:
-            pass
-
 # ============================================
 # WINDOWS HOSTNAME LENGTH CHECK
 # ============================================
@@ -192,11 +163,126 @@ def validate_windows_hostname(vm_name, mode="standard"):
 # DC DISCOVERY
 # ============================================
 
+# ============================================
+# AD SITE (SITE-AWARE DC ORDERING)
+# ============================================
+# The domain SRV record lists DCs in every site, including ones across the WAN.
+# The client site comes from AD_SITE or a CLDAP netlogon ping (UDP 389,
+# ClientSiteName in the response); DCs of that site are queried first.
+
+CLDAP_PORT = 389
+CLDAP_TIMEOUT = 1      # Seconds (UDP, next DC if no answer)
+CLDAP_PING_LIMIT = 3   # Max DCs to ping
+NETLOGON_NT_VERSION = "\\06\\00\\00\\00"  # NETLOGON_NT_VERSION_5 | 5EX -> NETLOGON_SAM_LOGON_RESPONSE_EX
+
+def read_netlogon_name(data, offset):
+    """RFC 1035 compressed DNS name: (name, offset of the next field)"""
+    labels = []
+    next_offset = None
+    while data[offset] != 0:
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            pointer = ((length & 0x3F) << 8) | data[offset + 1]
+            if pointer >= offset:
+                raise ValueError("Invalid netlogon DNS pointer")
+            if next_offset is None:
+                next_offset = offset + 2
+            offset = pointer
+            continue
+        labels.append(data[offset + 1:offset + 1 + length].decode("utf-8"))
+        offset += 1 + length
+    return ".".join(labels), next_offset if next_offset is not None else offset + 1
+
+def parse_netlogon_response(data):
+    """(client site, DC site) from NETLOGON_SAM_LOGON_RESPONSE_EX
+    
+    After Opcode(2) Sbz(2) Flags(4) DomainGuid(16): DnsForestName,
+    DnsDomainName, DnsHostName, NetbiosDomainName, NetbiosComputerName,
+    UserName, DcSiteName, ClientSiteName.
+    """
+    names = []
+    offset = 24
+    for _ in range(8):
+        name, offset = read_netlogon_name(data, offset)
+        names.append(name)
+    return names[7] or None, names[6] or None
+
+def netlogon_ping(dc, domain):
+    """CLDAP netlogon ping to a DC: (client site, DC site)"""
+    search_filter = f"(&(DnsDomain={escape_filter_chars(domain)})(NtVer={NETLOGON_NT_VERSION}))"
+    message = LDAPMessage()
+    message["messageID"] = MessageID(1)
+    message["protocolOp"] = ProtocolOp().setComponentByName(
+        "searchRequest",
+        search_operation("", search_filter, BASE, DEREF_NEVER, ["Netlogon"], 0, 0, False, False, True)
+    )
+    
+    family, _, _, _, address = socket.getaddrinfo(dc, CLDAP_PORT, type=socket.SOCK_DGRAM)[0]
+    with socket.socket(family, socket.SOCK_DGRAM) as sock:
+        sock.settimeout(CLDAP_TIMEOUT)
+        sock.sendto(ber_encode(message), address)
+        data = sock.recv(4096)
+    
+    response = decode_message_fast(data)
+    if response["protocolOp"] != 4:  # searchResEntry
+        raise ValueError("No netlogon response")
+    raw_attributes = search_result_entry_response_to_dict_fast(response["payload"], None, None, False)["raw_attributes"]
+    values = raw_attributes.get("netlogon")
+    if not values:
+        raise ValueError("Empty netlogon attribute")
+    return parse_netlogon_response(values[0])
+
+def get_client_site(domain, dc_hostnames):
+    """Client site (AD_SITE or the first answering DC's netlogon response), None if unknown"""
+    if AD_SITE.lower() == "none" or not AD_SITE:
+        return None
+    if AD_SITE.lower() != "auto":
+        return AD_SITE
+    
+    for dc in dc_hostnames[:CLDAP_PING_LIMIT]:
+        try:
+            client_site, dc_site = netlogon_ping(dc, domain)
+        except Exception as e:
+            print(f"[WARN] CLDAP netlogon ping failed ({dc}): {e}")
+            continue
+        
+        if not client_site:
+            # Client IP is not mapped to any site subnet (every DC answers the same)
+            print(f"[INFO] Client site unknown (no matching subnet), DC site of {dc}: {dc_site}")
+        return client_site
+    
+    print("[WARN] No CLDAP netlogon response, using SRV order")
+    return None
+
+def order_dcs_by_site(domain, dc_hostnames):
+    """Move DCs of the client site to the front (all DCs stay in the list)
+    
+    The AD check must see every DC (a name created on a remote DC may not
+    have replicated yet), so remote DCs are queried last, not dropped.
+    """
+    site = get_client_site(domain, dc_hostnames)
+    if not site:
+        return dc_hostnames
+    
+    srv_record = f"_ldap._tcp.{site}._sites.dc._msdcs.{domain}"
+    try:
+        print(f"[INFO] DNS SRV query: {srv_record}")
+        answers = dns.resolver.resolve(srv_record, 'SRV')
+    except Exception as e:
+        print(f"[WARN] No DCs found for site {site}: {e}")
+        return dc_hostnames
+    
+    site_dcs = [str(dc.target).rstrip('.') for dc in sorted(answers, key=lambda x: (x.priority, -x.weight))]
+    local_dcs = [dc for dc in site_dcs if dc in dc_hostnames]
+    ordered = local_dcs + [dc for dc in dc_hostnames if dc not in local_dcs]
+    print(f"[INFO] Site {site}: {len(local_dcs)} local DCs first: {', '.join(ordered)}")
+    return ordered
+
 def discover_domain_controllers(domain):
     """DNS SRV query to discover all DCs
     
     Returns:
-        list: DC hostnames sorted by priority/weight
+        list: DC hostnames, client site DCs first, then by priority/weight
     """
     if not DNS_AVAILABLE:
         print(f"[ERROR] dnspython required for DC discovery")
@@ -213,7 +299,7 @@ def discover_domain_controllers(domain):
         dc_hostnames = [str(dc.target).rstrip('.') for dc in dc_list]
         
         print(f"[INFO] Found {len(dc_hostnames)} DCs: {', '.join(dc_hostnames)}")
-        return dc_hostnames
+        return order_dcs_by_site(domain, dc_hostnames)
         
     except Exception as e:
         print(f"[ERROR] DC discovery failed: {e}")
@@ -253,7 +339,7 @@ def test_ad_bind(dc_hostname):
             dc_hostname,
             port=636,
             use_ssl=True,
-            get_info=ALL,
+            get_info=NONE,  # Schema/DSE gerekmiyor (sadece bind ve entry sayısı)
             tls=tls_config,
             connect_timeout=10
         )
@@ -367,7 +453,7 @@ def check_ad_on_dc(vm_name, dc_hostname):
             dc_hostname,
             port=636,
             use_ssl=True,
-            get_info=ALL,
+            get_info=NONE,  # Schema/DSE gerekmiyor (sadece bind ve entry sayısı)
             tls=tls_config,
             connect_timeout=5
         )
@@ -429,13 +515,14 @@ def check_ad_all_dcs(vm_name, dc_list):
 def sync_check_vcenter_simple(vm_name, vc_host, datacenter_path):
     """Check if VM exists in vCenter (simplified)"""
     try:
-        si = get_vcenter_connection(vc_host)
-        if not si:
-            return False
-        
         # Tek arama yap - inventory path ile
         inventory_path = f"{datacenter_path}/{vm_name}"
-        vm = si.content.searchIndex.FindByInventoryPath(inventory_path)
+        
+        # Oturum düşmüşse (NotAuthenticated) yeniden bağlanıp bir kez tekrar dener
+        vm = call_with_reconnect(
+            vc_host,
+            lambda si: si.content.searchIndex.FindByInventoryPath(inventory_path)
+        )
         
         # Alternatif arama kaldırıldı - performans için
         return vm is not None
@@ -618,6 +705,18 @@ async def main():
         # Find/check VM name
         result = await find_available_vm(dc_list)
         
+        # SOAP çağrı özeti (VC_INSTRUMENT) ve çağrı bütçesi kontrolü
+        call_summary = get_call_summary()
+        if call_summary:
+            result["vcenter_calls"] = call_summary
+            print(f"[INFO] vCenter SOAP calls: {call_summary['total_calls']} ({call_summary['total_time_sec']} sec)")
+        
+        budget_error = check_call_budget()
+        if budget_error:
+            print(f"[ERROR] {budget_error}")
+            print(json.dumps({**result, "available": False, "reason": budget_error}))
+            sys.exit(1)
+        
         # Output JSON result (last line for Ansible parsing)
         print(json.dumps(result))
         
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+# Dosya: benchmark/benchmark_find_vms.py
+# Açıklama: find_vms_for_snapshot.py için Çevrimdışı Benchmark (sentetik envanter)
+
+"""
+Offline VM Finder Benchmark
+- Runs the real find_vms_for_snapshot.py search path (domain target index,
+  find_vm_across_targets, optional storage admission) against a synthetic
+  inventory from vsphere_sim.py - no vCenter needed
+- One case per (inventory size, folder depth, input list size) combination
+- Reports wall time, simulated SOAP call counts (total and top calls) and
+  peak Python memory (tracemalloc) of every case
+- Peak memory is measured in a second pass so tracemalloc overhead does
+  not distort the wall time
+
+Parameters:
+  1. INVENTORY_SIZES: comma separated VM counts per vCenter (default "1000,10000,50000")
+  2. FOLDER_DEPTHS: comma separated folder depths (default "1,4")
+  3. INPUT_SIZES: comma separated input list sizes (default "10,100")
+  4. LOOKUP: "name" (default) or "uuid"
+
+Results are printed to stdout as JSON, progress and the table to stderr.
+"""
+
+import contextlib
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+FILES_DIR = os.path.join(os.path.dirname(BENCHMARK_DIR), "files")
+
+import vsphere_sim
+
+# Parameters from command line
+INVENTORY_SIZES = sys.argv[1] if len(sys.argv) > 1 else "1000,10000,50000"
+FOLDER_DEPTHS = sys.argv[2] if len(sys.argv) > 2 else "1,4"
+INPUT_SIZES = sys.argv[3] if len(sys.argv) > 3 else "10,100"
+LOOKUP = sys.argv[4].lower() if len(sys.argv) > 4 else "name"
+
+# Tuning from environment variables
+LATENCY_MS = float(os.getenv("BENCH_LATENCY_MS", "0"))
+PROJECTED_RTT_MS = float(os.getenv("BENCH_PROJECTED_RTT_MS", "2"))
+DATACENTERS = int(os.getenv("BENCH_DATACENTERS", "2"))
+DOMAIN_FOLDERS = int(os.getenv("BENCH_DOMAIN_FOLDERS", "2"))
+SCOPE = os.getenv("BENCH_SCOPE", "folder").lower()  # folder | datacenter
+MISS_PCT = float(os.getenv("BENCH_MISS_PCT", "10"))
+ADMISSION = os.getenv("BENCH_ADMISSION", "false").lower() == "true"
+SEED = int(os.getenv("BENCH_SEED", "42"))
+TOP_CALLS = int(os.getenv("BENCH_TOP_CALLS", "5"))
+
+LOOKUPS = ["name", "uuid"]
+SCOPES = ["folder", "datacenter"]
+
+VC_HOST = "vcenter-bench.local"
+DOMAIN = "domain1"
+
+MB = 1024 * 1024
+
+# ============================================
+# SETUP
+# ============================================
+
+def import_finder():
+    """Import find_vms_for_snapshot.py against the simulated pyVmomi
+    
+    The finder reads its parameters from sys.argv at import time, so argv
+    is swapped for the import; credentials only need to be non-empty.
+    """
+    vsphere_sim.install()
+    os.environ.setdefault("VC_USER", "benchmark")
+    os.environ.setdefault("VC_PASS", "benchmark")
+    sys.path.insert(0, FILES_DIR)
+    
+    argv = sys.argv
+    sys.argv = [os.path.join(FILES_DIR, "find_vms_for_snapshot.py")]
+    try:
+        import find_vms_for_snapshot
+        import vcenter_connection
+    finally:
+        sys.argv = argv
+    return find_vms_for_snapshot, vcenter_connection
+
+def parse_sizes(value, label):
+    """Parse a comma separated list of positive integers"""
+    try:
+        sizes = [int(part) for part in value.split(",") if part.strip()]
+    except ValueError:
+        sizes = []
+    if not sizes or min(sizes) <= 0:
+        print(json.dumps({"success": False, "error": f"Invalid {label}: {value}"}))
+        sys.exit(1)
+    return sizes
+
+def build_search_targets():
+    """Search targets in vcenter_mapping.yaml format for the synthetic vCenter"""
+    datacenters = []
+    for dc_no in range(1, DATACENTERS + 1):
+        dc_name = f"DC{dc_no}"
+        folder = f"/{dc_name}/vm/Domain1" if SCOPE == "folder" else None
+        datacenters.append({"name": dc_name, "domain": DOMAIN, "folder": folder})
+    return [{"name": "vcenter-bench", "hostname": VC_HOST, "datacenters": datacenters}]
+
+def build_entries(inventory, count, rng):
+    """Pick count input entries: existing domain1 VMs plus MISS_PCT unknown ones"""
+    in_scope = [vm for vm in inventory.vms if SCOPE == "datacenter" or is_under_domain1(vm)]
+    
+    missing = int(round(count * MISS_PCT / 100))
+    picked = rng.sample(in_scope, min(count - missing, len(in_scope)))
+    
+    entries = []
+    for vm in picked:
+        if LOOKUP == "uuid":
+            entries.append({"name": vm.props["name"], "uuid": vm.props["summary"].config.uuid})
+        else:
+            entries.append(vm.props["name"])
+    for no in range(count - len(picked)):
+        if LOOKUP == "uuid":
+            entries.append({"name": f"missing-{no}", "uuid": f"00000000-0000-0000-0000-{no:012d}"})
+        else:
+            entries.append(f"missing-{no}")
+    
+    rng.shuffle(entries)
+    return entries
+
+def is_under_domain1(vm):
+    """True if the VM lives below a Domain1 folder"""
+    parent = vm.props["parent"]
+    while isinstance(parent, vsphere_sim.Folder):
+        if parent.props["name"] == "Domain1":
+            return True
+        parent = parent.props.get("parent")
+    return False
+
+def reset_state(finder, connection):
+    """Clear finder caches and the connection pool between cases"""
+    finder.DC_INDEX.clear()
+    finder.TARGET_INDEX.clear()
+    finder.VM_NAME_INDEX.clear()
+    finder.DATASTORE_LEDGER.clear()
+    connection.cleanup_connections()
+    connection.FAILED_CONNECTS.clear()
+
+# ============================================
+# CASES
+# ============================================
+
+def run_search(finder, search_targets, entries):
+    """One full finder pass: target index, per-VM search, optional admission"""
+    found = []
+    errors = 0
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stderr(devnull):
+        targets = finder.get_domain_targets(DOMAIN, search_targets)
+        for entry in entries:
+            result = finder.find_vm_across_targets(finder.parse_vm_entry(entry), targets)
+            if result["found"]:
+                found.append(result["vm_data"])
+            elif result["error"] != "vm_not_found":
+                errors += 1
+        
+        if ADMISSION and found:
+            finder.ADMISSION_CHECK = True
+            found, rejected = finder.admit_vms(found)
+            errors += len(rejected)
+    
+    return len(found), errors
+
+def run_case(finder, connection, vm_count, folder_depth, input_size):
+    """Build the inventory for one case and measure the finder on it"""
+    vsphere_sim.reset()
+    rng = random.Random(SEED)
+    vms_per_datacenter = max(vm_count // DATACENTERS, 1)
+    
+    build_start = time.perf_counter()
+    inventory = vsphere_sim.Inventory(
+        datacenters=DATACENTERS,
+        vms_per_datacenter=vms_per_datacenter,
+        folder_depth=folder_depth,
+        domain_folders=DOMAIN_FOLDERS
+    )
+    vsphere_sim.INVENTORIES[VC_HOST] = inventory
+    build_sec = time.perf_counter() - build_start
+    
+    search_targets = build_search_targets()
+    entries = build_entries(inventory, input_size, rng)
+    
+    # 1. geçiş: süre ve çağrı sayıları
+    reset_state(finder, connection)
+    vsphere_sim.CALL_STATS.clear()
+    start = time.perf_counter()
+    found, errors = run_search(finder, search_targets, entries)
+    wall_sec = time.perf_counter() - start
+    calls = dict(vsphere_sim.CALL_STATS)
+    
+    # 2. geçiş: bellek (tracemalloc süreyi yavaşlattığı için ayrı ölçülür)
+    reset_state(finder, connection)
+    latency_ms = vsphere_sim.LATENCY["seconds"] * 1000
+    vsphere_sim.set_latency(0)
+    tracemalloc.start()
+    run_search(finder, search_targets, entries)
+    peak_bytes = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    vsphere_sim.set_latency(latency_ms)
+    reset_state(finder, connection)
+    
+    total_calls = sum(calls.values())
+    top_calls = sorted(calls.items(), key=lambda item: item[1], reverse=True)[:TOP_CALLS]
+    result = {
+        "inventory_vms": vms_per_datacenter * DATACENTERS,
+        "folder_depth": folder_depth,
+        "input_size": len(entries),
+        "lookup": LOOKUP,
+        "found": found,
+        "errors": errors,
+        "wall_sec": round(wall_sec, 3),
+        "per_vm_ms": round(wall_sec * 1000 / len(entries), 2),
+        "calls": total_calls,
+        "calls_per_vm": round(total_calls / len(entries), 1),
+        "top_calls": [{"call": call, "calls": count} for call, count in top_calls],
+        "peak_memory_mb": round(peak_bytes / MB, 2),
+        "inventory_build_sec": round(build_sec, 2)
+    }
+    
+    # Gecikme simüle edilmediyse gerçek vCenter süresi çağrı sayısından tahmin edilir
+    if not latency_ms:
+        result["projected_sec"] = round(wall_sec + total_calls * PROJECTED_RTT_MS / 1000, 1)
+    
+    return result
+
+# ============================================
+# MAIN
+# ============================================
+
+def print_table(results):
+    """Print a compact result table to stderr"""
+    header = f"{'VMs':>8} {'depth':>5} {'inputs':>6} {'wall s':>9} {'calls':>10} {'calls/vm':>9} {'peak MB':>8} {'proj s':>9}"
+    print(header, file=sys.stderr)
+    print("-" * len(header), file=sys.stderr)
+    for result in results:
+        print(f"{result['inventory_vms']:>8} {result['folder_depth']:>5} {result['input_size']:>6} "
+              f"{result['wall_sec']:>9} {result['calls']:>10} {result['calls_per_vm']:>9} "
+              f"{result['peak_memory_mb']:>8} {result.get('projected_sec', '-'):>9}", file=sys.stderr)
+
+def main():
+    """Main entry point"""
+    if LOOKUP not in LOOKUPS:
+        print(json.dumps({"success": False, "error": f"Invalid lookup: {LOOKUP} ({', '.join(LOOKUPS)})"}))
+        sys.exit(1)
+    
+    if SCOPE not in SCOPES:
+        print(json.dumps({"success": False, "error": f"Invalid BENCH_SCOPE: {SCOPE} ({', '.join(SCOPES)})"}))
+        sys.exit(1)
+    
+    inventory_sizes = parse_sizes(INVENTORY_SIZES, "inventory sizes")
+    folder_depths = parse_sizes(FOLDER_DEPTHS, "folder depths")
+    input_sizes = parse_sizes(INPUT_SIZES, "input sizes")
+    
+    finder, connection = import_finder()
+    vsphere_sim.set_latency(LATENCY_MS)
+    
+    print("=" * 60, file=sys.stderr)
+    print("VM FINDER BENCHMARK (SYNTHETIC INVENTORY)", file=sys.stderr)
+    print("=" * 60, file=sys.stderr)
+    print(f"[INFO] Inventory sizes: {inventory_sizes}", file=sys.stderr)
+    print(f"[INFO] Folder depths: {folder_depths}", file=sys.stderr)
+    print(f"[INFO] Input sizes: {input_sizes}", file=sys.stderr)
+    print(f"[INFO] Lookup: {LOOKUP}, scope: {SCOPE}, datacenters: {DATACENTERS}, latency: {LATENCY_MS} ms", file=sys.stderr)
+    print("=" * 60, file=sys.stderr)
+    
+    results = []
+    for vm_count in inventory_sizes:
+        for folder_depth in folder_depths:
+            for input_size in input_sizes:
+                print(f"[INFO] Case: {vm_count} VMs, depth {folder_depth}, {input_size} input(s)", file=sys.stderr)
+                result = run_case(finder, connection, vm_count, folder_depth, input_size)
+                print(f"[INFO]   {result['wall_sec']} sec, {result['calls']} calls, {result['peak_memory_mb']} MB peak", file=sys.stderr)
+                results.append(result)
+    
+    print("", file=sys.stderr)
+    print_table(results)
+    
+    print(json.dumps({
+        "success": True,
+        "parameters": {
+            "lookup": LOOKUP,
+            "scope": SCOPE,
+            "datacenters": DATACENTERS,
+            "domain_folders": DOMAIN_FOLDERS,
+            "miss_pct": MISS_PCT,
+            "admission": ADMISSION,
+            "latency_ms": LATENCY_MS,
+            "projected_rtt_ms": PROJECTED_RTT_MS,
+            "seed": SEED
+        },
+        "results": results
+    }, indent=2))
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n[INFO] Interrupted by user", file=sys.stderr)
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n[ERROR] Fatal error: {str(e)}", file=sys.stderr)
+        print(json.dumps({
+            "success": False,
+            "error": f"Benchmark error: {str(e)}"
+        }))
+        sys.exit(1)
@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+# Dosya: benchmark/vsphere_sim.py
+# Açıklama: Sentetik vSphere Envanter Simülatörü (çevrimdışı benchmark için)
+
+"""
+Synthetic vSphere Inventory Simulator
+- Imitates the subset of pyVmomi used by find_vms_for_snapshot.py:
+  content tree (Datacenter / vmFolder / nested folders / VMs), container
+  views, PropertyCollector (paged RetrievePropertiesEx with traversal
+  specs), SearchIndex, SessionManager
+- Managed object attributes are lazy properties: every read is counted
+  as one round trip, like pyVmomi's InvokeAccessor
+- Every simulated SOAP call is counted in CALL_STATS and can be delayed
+  by a configurable per-call latency (set_latency)
+- install() registers fake pyVmomi / pyVim modules, so the real scripts
+  run unchanged against INVENTORIES
+
+Not a complete vSphere model: only what the VM finder reads is simulated.
+"""
+
+import itertools
+import sys
+import time
+import types
+import uuid as uuidlib
+from collections import Counter, deque
+
+# "<mo type>.<method/property>" -> call count
+CALL_STATS = Counter()
+
+# Per-call latency in seconds (see set_latency)
+LATENCY = {"seconds": 0.0}
+
+# moref -> managed object (vim.<Type>(moref, stub) lookups)
+REGISTRY = {}
+
+# hostname -> Inventory (SmartConnect target)
+INVENTORIES = {}
+
+GB = 1024 ** 3
+
+_ids = itertools.count(1)
+
+def set_latency(milliseconds):
+    """Set the simulated round-trip latency of every SOAP call"""
+    LATENCY["seconds"] = max(float(milliseconds), 0.0) / 1000
+
+def record_call(mo_type, name):
+    """Count one simulated SOAP round trip (and wait for the latency)"""
+    CALL_STATS[f"{mo_type}.{name}"] += 1
+    if LATENCY["seconds"]:
+        time.sleep(LATENCY["seconds"])
+
+def reset():
+    """Forget all inventories, managed objects and call statistics"""
+    CALL_STATS.clear()
+    REGISTRY.clear()
+    INVENTORIES.clear()
+
+class Data:
+    """Plain data object (vim.* data types, specs and results)"""
+    
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+class ManagedObjectNotFound(Exception):
+    """Raised when a moref is not in the registry"""
+
+class NotAuthenticated(Exception):
+    """vim.fault.NotAuthenticated"""
+
+class InvalidLogin(Exception):
+    """vim.fault.InvalidLogin"""
+
+# ============================================
+# MANAGED OBJECTS
+# ============================================
+
+class ManagedObject:
+    """Managed object with lazy, round-trip counted properties
+    
+    vim.<Type>(moref, stub) returns the registered object, like pyVmomi
+    binding a moref to a stub. Server-side reads (PropertyCollector,
+    container views) use props directly and are not counted per property.
+    """
+    _wsdlName = "ManagedEntity"
+    
+    def __new__(cls, *args, **props):
+        if args:
+            if args[0] not in REGISTRY:
+                raise ManagedObjectNotFound(args[0])
+            return REGISTRY[args[0]]
+        return object.__new__(cls)
+    
+    def __init__(self, *args, **props):
+        if args:
+            return
+        object.__setattr__(self, "_moId", f"{self._wsdlName.lower()}-{next(_ids)}")
+        object.__setattr__(self, "props", props)
+        REGISTRY[self._moId] = self
+    
+    def __getattr__(self, name):
+        props = object.__getattribute__(self, "props")
+        if name in props:
+            record_call(self._wsdlName, name)
+            return props[name]
+        raise AttributeError(name)
+    
+    def get_path(self, path):
+        """Resolve a property path ("summary.config.uuid") server side"""
+        value = self
+        for part in path.split("."):
+            if isinstance(value, ManagedObject):
+                value = value.props.get(part)
+            else:
+                value = getattr(value, part, None)
+            if value is None:
+                return None
+        return value
+    
+    def children(self):
+        """Child entities for container views and inventory paths"""
+        return []
+    
+    def __repr__(self):
+        return f"'vim.{self._wsdlName}:{self._moId}'"
+
+class Folder(ManagedObject):
+    _wsdlName = "Folder"
+    
+    def children(self):
+        return self.props["childEntity"]
+
+class Datacenter(ManagedObject):
+    _wsdlName = "Datacenter"
+    
+    def children(self):
+        return [self.props["vmFolder"], self.props["hostFolder"], self.props["datastoreFolder"]]
+
+class VirtualMachine(ManagedObject):
+    _wsdlName = "VirtualMachine"
+
+class HostSystem(ManagedObject):
+    _wsdlName = "HostSystem"
+
+class Datastore(ManagedObject):
+    _wsdlName = "Datastore"
+
+class ContainerView(ManagedObject):
+    _wsdlName = "ContainerView"
+    
+    def Destroy(self):
+        record_call(self._wsdlName, "Destroy")
+
+class ViewManager(ManagedObject):
+    _wsdlName = "ViewManager"
+    
+    def CreateContainerView(self, container, type, recursive):
+        record_call(self._wsdlName, "CreateContainerView")
+        view = []
+        pending = deque(container.children())
+        while pending:
+            child = pending.popleft()
+            if any(isinstance(child, obj_type) for obj_type in type):
+                view.append(child)
+            if recursive:
+                pending.extend(child.children())
+        return ContainerView(view=view)
+
+class PropertyCollector(ManagedObject):
+    _wsdlName = "PropertyCollector"
+    
+    def __init__(self, *args, **props):
+        super().__init__(*args, **props)
+        object.__setattr__(self, "tokens", {})
+    
+    def collect(self, spec):
+        """Expand object/traversal specs and read the requested properties"""
+        objects = []
+        for obj_spec in spec.objectSet:
+            if not getattr(obj_spec, "skip", False):
+                objects.append(obj_spec.obj)
+            for traversal in getattr(obj_spec, "selectSet", None) or []:
+                value = obj_spec.obj.get_path(traversal.path)
+                objects.extend([value] if isinstance(value, ManagedObject) else value or [])
+        
+        results = []
+        seen = set()
+        for obj in objects:
+            if obj._moId in seen:
+                continue
+            for prop_spec in spec.propSet:
+                if isinstance(obj, prop_spec.type):
+                    seen.add(obj._moId)
+                    prop_set = [Data(name=path, val=obj.get_path(path)) for path in prop_spec.pathSet]
+                    results.append(Data(obj=obj, propSet=[prop for prop in prop_set if prop.val is not None]))
+                    break
+        return results
+    
+    def page(self, objects, max_objects):
+        """Return one page of results, keeping the rest behind a token"""
+        max_objects = max_objects or 100
+        if not objects:
+            return None
+        if len(objects) <= max_objects:
+            return Data(objects=objects, token=None)
+        token = str(next(_ids))
+        self.tokens[token] = (objects[max_objects:], max_objects)
+        return Data(objects=objects[:max_objects], token=token)
+    
+    def RetrievePropertiesEx(self, specSet, options=None):
+        record_call(self._wsdlName, "RetrievePropertiesEx")
+        objects = []
+        for spec in specSet:
+            objects.extend(self.collect(spec))
+        return self.page(objects, getattr(options, "maxObjects", None))
+    
+    def ContinueRetrievePropertiesEx(self, token):
+        record_call(self._wsdlName, "ContinueRetrievePropertiesEx")
+        objects, max_objects = self.tokens.pop(token)
+        return self.page(objects, max_objects)
+    
+    def CancelRetrievePropertiesEx(self, token):
+        record_call(self._wsdlName, "CancelRetrievePropertiesEx")
+        self.tokens.pop(token, None)
+
+class SearchIndex(ManagedObject):
+    _wsdlName = "SearchIndex"
+    
+    def FindAllByUuid(self, datacenter=None, uuid=None, vmSearch=True, instanceUuid=False):
+        record_call(self._wsdlName, "FindAllByUuid")
+        index = self.props["inventory"].instance_uuid_index if instanceUuid else self.props["inventory"].uuid_index
+        return [vm for vm in index.get(uuid, []) if datacenter is None or vm.props["datacenter"] is datacenter]
+    
+    def FindChild(self, entity, name):
+        record_call(self._wsdlName, "FindChild")
+        for child in entity.children():
+            if child.props.get("name") == name:
+                return child
+        return None
+    
+    def FindByInventoryPath(self, inventoryPath):
+        record_call(self._wsdlName, "FindByInventoryPath")
+        node = self.props["inventory"].root
+        for name in [part for part in inventoryPath.strip("/").split("/") if part]:
+            node = next((child for child in node.children() if child.props.get("name") == name), None)
+            if node is None:
+                return None
+        return node
+
+class SessionManager(ManagedObject):
+    _wsdlName = "SessionManager"
+    
+    def Login(self, userName=None, password=None):
+        record_call(self._wsdlName, "Login")
+        self.props["currentSession"] = Data(key=str(next(_ids)), userName=userName)
+        return self.props["currentSession"]
+
+class ServiceInstance(ManagedObject):
+    _wsdlName = "ServiceInstance"
+    
+    def RetrieveContent(self):
+        record_call(self._wsdlName, "RetrieveContent")
+        return self.props["content"]
+
+# ============================================
+# INVENTORY
+# ============================================
+
+class Inventory:
+    """Synthetic inventory of one vCenter
+    
+    Every datacenter gets domain_folders top-level VM folders (Domain1,
+    Domain2, ...), each a chain of folder_depth nested folders; VMs are
+    spread evenly over the leaf folders. Hosts and datastores are shared
+    round-robin. uuid / instanceUuid indexes back SearchIndex lookups.
+    """
+    
+    def __init__(self, datacenters=2, vms_per_datacenter=1000, folder_depth=1, domain_folders=2,
+                 hosts_per_datacenter=8, datastores_per_datacenter=4, duplicate_names=0):
+        self.vms = []
+        self.uuid_index = {}
+        self.instance_uuid_index = {}
+        self.root = Folder(name="Datacenters", childEntity=[], parent=None)
+        
+        for dc_no in range(1, datacenters + 1):
+            dc_name = f"DC{dc_no}"
+            datacenter = Datacenter(name=dc_name, parent=self.root)
+            vm_folder = Folder(name="vm", childEntity=[], parent=datacenter)
+            datacenter.props.update(
+                vmFolder=vm_folder,
+                hostFolder=Folder(name="host", childEntity=[], parent=datacenter),
+                datastoreFolder=Folder(name="datastore", childEntity=[], parent=datacenter)
+            )
+            self.root.props["childEntity"].append(datacenter)
+            
+            hosts = [HostSystem(name=f"esx-{dc_no}-{no}") for no in range(hosts_per_datacenter)]
+            datastores = [
+                Datastore(name=f"ds-{dc_no}-{no}", summary=Data(capacity=10 * 1024 * GB, freeSpace=4 * 1024 * GB, accessible=True))
+                for no in range(datastores_per_datacenter)
+            ]
+            datacenter.props["datastoreFolder"].props["childEntity"].extend(datastores)
+            
+            leaves = []
+            for domain_no in range(1, domain_folders + 1):
+                folder = vm_folder
+                for level in range(folder_depth):
+                    name = f"Domain{domain_no}" if level == 0 else f"L{level}"
+                    child = Folder(name=name, childEntity=[], parent=folder)
+                    folder.props["childEntity"].append(child)
+                    folder = child
+                leaves.append(folder)
+            leaves = leaves or [vm_folder]
+            
+            for vm_no in range(vms_per_datacenter):
+                self.add_vm(f"vm-{dc_name}-{vm_no}", datacenter, leaves[vm_no % len(leaves)],
+                            hosts[vm_no % len(hosts)], datastores[vm_no % len(datastores)])
+            for vm_no in range(duplicate_names):
+                self.add_vm(f"vm-{dc_name}-{vm_no}", datacenter, leaves[-1], hosts[0], datastores[0])
+        
+        self.content = Data(
+            rootFolder=self.root,
+            viewManager=ViewManager(),
+            propertyCollector=PropertyCollector(),
+            searchIndex=SearchIndex(inventory=self),
+            sessionManager=SessionManager(currentSession=Data(key="session-1", userName="benchmark"))
+        )
+    
+    def add_vm(self, name, datacenter, folder, host, datastore):
+        """Create a VM in folder and register it in the uuid indexes"""
+        vm_uuid = str(uuidlib.uuid4())
+        instance_uuid = str(uuidlib.uuid4())
+        datastore_name = datastore.props["name"]
+        vm = VirtualMachine(
+            name=name,
+            parent=folder,
+            datacenter=datacenter,
+            summary=Data(config=Data(
+                uuid=vm_uuid,
+                instanceUuid=instance_uuid,
+                guestId="rhel8_64Guest",
+                numCpu=2,
+                memorySizeMB=4096,
+                vmPathName=f"[{datastore_name}] {name}/{name}.vmx"
+            )),
+            runtime=Data(powerState="poweredOn", host=host),
+            datastore=[datastore],
+            storage=Data(perDatastoreUsage=[Data(datastore=datastore, committed=50 * GB)]),
+            snapshot=None
+        )
+        folder.props["childEntity"].append(vm)
+        self.vms.append(vm)
+        self.uuid_index.setdefault(vm_uuid, []).append(vm)
+        self.instance_uuid_index.setdefault(instance_uuid, []).append(vm)
+        return vm
+
+# ============================================
+# FAKE pyVmomi / pyVim MODULES
+# ============================================
+
+class Stub:
+    """SOAP stub placeholder (vim.<Type>(moref, si._stub))"""
+    
+    def InvokeMethod(self, mo, info, args):
+        return None
+    
+    def InvokeAccessor(self, mo, info):
+        return None
+
+def SmartConnect(host=None, user=None, pwd=None, sslContext=None, **kwargs):
+    """Connect to a registered inventory (login is one round trip)"""
+    record_call("SessionManager", "Login")
+    if host not in INVENTORIES:
+        raise ConnectionError(f"Cannot connect to {host}: no simulated inventory")
+    si = ServiceInstance(content=INVENTORIES[host].content)
+    object.__setattr__(si, "_stub", Stub())
+    return si
+
+def Disconnect(si):
+    """Close a session (no-op)"""
+
+def install():
+    """Register fake pyVmomi / pyVim modules (call before importing the scripts)"""
+    vim = types.ModuleType("pyVmomi.vim")
+    for cls in (Folder, Datacenter, VirtualMachine, HostSystem, Datastore):
+        setattr(vim, cls.__name__, cls)
+    vim.view = Data(ContainerView=ContainerView)
+    vim.fault = Data(NotAuthenticated=NotAuthenticated, InvalidLogin=InvalidLogin)
+    
+    vmodl = types.ModuleType("pyVmomi.vmodl")
+    vmodl.query = Data(PropertyCollector=Data(
+        TraversalSpec=Data,
+        ObjectSpec=Data,
+        PropertySpec=Data,
+        FilterSpec=Data,
+        RetrieveOptions=Data
+    ))
+    vmodl.fault = Data(ManagedObjectNotFound=ManagedObjectNotFound)
+    
+    pyvmomi = types.ModuleType("pyVmomi")
+    pyvmomi.vim = vim
+    pyvmomi.vmodl = vmodl
+    
+    connect = types.ModuleType("pyVim.connect")
+    connect.SmartConnect = SmartConnect
+    connect.Disconnect = Disconnect
+    pyvim = types.ModuleType("pyVim")
+    pyvim.connect = connect
+    
+    sys.modules.update({"pyVmomi": pyvmomi, "pyVim": pyvim, "pyVim.connect": connect})
@@ -5,83 +5,223 @@
 """
 VM Finder for Snapshot Operations
 - Accepts list of VM names from Ansible
+- Entries may also be {"name", "uuid"/"instance_uuid"} dicts (SearchIndex fast path)
 - Searches across multiple vCenters and datacenters (domain-based)
 - Returns JSON with VM details (vcenter, datacenter, folder, uuid, power_state)
+- Large batches: names from stdin ("-") or a file ("@path"), one per line
+- NDJSON output mode: one record per VM as soon as it is resolved, then a summary
 - Skips VMs if multiple found in same datacenter (ambiguous)
+- Name lookups use a name -> moref index built once per search target
+  (one paged PropertyCollector retrieval instead of a read per VM)
+- Storage admission: found VMs are admitted only if their estimated snapshot
+  growth keeps every datastore under SNAPSHOT_DATASTORE_MAX_USED_PCT
 """
 
-import ssl
 import json
 import sys
 import os
-from pyVim.connect import SmartConnect, Disconnect
-from pyVmomi import vim
+import itertools
+import time
+from pyVmomi import vim, vmodl
+
+from vcenter_connection import (
+    get_vcenter_connection,
+    cleanup_connections,
+    call_with_reconnect,
+    add_reconnect_hook,
+    get_call_summary,
+    check_call_budget,
+    VC_USERNAME,
+    VC_PASSWORD
+)
+from vsphere_helpers import retrieve_view_properties, retrieve_objects_properties
 
 # Parameters from Ansible
-VM_NAMES_JSON = sys.argv[1] if len(sys.argv) > 1 else "[]"  # JSON list of VM names
+VM_NAMES_SOURCE = sys.argv[1] if len(sys.argv) > 1 else "[]"  # JSON list, "-" (stdin) or "@/path/to/file"
 VCENTER_SEARCH_TARGETS_JSON = sys.argv[2] if len(sys.argv) > 2 else "[]"  # JSON list of search targets
 DOMAIN = sys.argv[3] if len(sys.argv) > 3 else "domain1"
+OUTPUT_FORMAT = sys.argv[4].lower() if len(sys.argv) > 4 else "json"  # json | ndjson
 
-# Credentials from environment variables
-VC_USERNAME = os.getenv("VC_USER")
-VC_PASSWORD = os.getenv("VC_PASS")
-
-# Parse JSON inputs
-try:
-    VM_NAMES = json.loads(VM_NAMES_JSON)
-except json.JSONDecodeError:
-    print(json.dumps({"success": False, "error": "Invalid VM names JSON"}))
-    sys.exit(1)
-
-try:
-    SEARCH_TARGETS = json.loads(VCENTER_SEARCH_TARGETS_JSON)
-except json.JSONDecodeError:
-    print(json.dumps({"success": False, "error": "Invalid search targets JSON"}))
-    sys.exit(1)
-
-# Validate inputs
-if not VM_NAMES or not isinstance(VM_NAMES, list):
-    print(json.dumps({"success": False, "error": "No VM names provided or invalid format"}))
-    sys.exit(1)
-
-if not VC_USERNAME or not VC_PASSWORD:
-    print(json.dumps({"success": False, "error": "Missing vCenter credentials"}))
-    sys.exit(1)
-
-if not SEARCH_TARGETS or not isinstance(SEARCH_TARGETS, list):
-    print(json.dumps({"success": False, "error": "No search targets provided"}))
-    sys.exit(1)
-
-# SSL context
-ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
-ssl_context.check_hostname = False
-ssl_context.verify_mode = ssl.CERT_NONE
-
-# Connection pool
-VC_CONNECTIONS = {}
-
-def get_vcenter_connection(vc_host):
-    """Get or create vCenter connection"""
-    if vc_host not in VC_CONNECTIONS:
-        try:
-            VC_CONNECTIONS[vc_host] = SmartConnect(
-                host=vc_host,
-                user=VC_USERNAME,
-                pwd=VC_PASSWORD,
-                sslContext=ssl_context
-            )
-        except Exception as e:
-            print(f"[ERROR] Failed to connect to {vc_host}: {str(e)}", file=sys.stderr)
+# Storage admission tuning from environment variables
+ADMISSION_CHECK = os.getenv("SNAPSHOT_ADMISSION_CHECK", "true").lower() == "true"
+DATASTORE_MAX_USED_PCT = float(os.getenv("SNAPSHOT_DATASTORE_MAX_USED_PCT", "90"))
+SNAPSHOT_GROWTH_PCT = float(os.getenv("SNAPSHOT_GROWTH_PCT", "10"))
+SNAPSHOT_MEMORY = os.getenv("SNAPSHOT_MEMORY", "false").lower() == "true"
+ADMISSION_BATCH_SIZE = int(os.getenv("SNAPSHOT_ADMISSION_BATCH_SIZE", "500"))
+ADMISSION_FLUSH_SEC = float(os.getenv("SNAPSHOT_ADMISSION_FLUSH_SEC", "2"))  # ndjson: max wait of a found record
+VM_INDEX_PAGE_SIZE = int(os.getenv("SNAPSHOT_VM_INDEX_PAGE_SIZE", "1000"))
+
+GB = 1024 ** 3
+
+# Datacenter index: vc_host -> {datacenter_name: vim.Datacenter}
+DC_INDEX = {}
+
+# Target index: domain -> [resolved search targets] (see get_domain_targets)
+TARGET_INDEX = {}
+
+# VM name index: (vc_host, target root moref id) -> {vm_name: [vim.VirtualMachine]}
+VM_NAME_INDEX = {}
+
+# Datastore ledger: (vc_host, datastore_moref) -> capacity/free/reserved bytes
+# Reservations of admitted VMs are kept across admission batches
+DATASTORE_LEDGER = {}
+
+def reset_vcenter_caches(vc_host):
+    """Drop cached morefs of a vCenter whose session was replaced"""
+    DC_INDEX.pop(vc_host, None)
+    TARGET_INDEX.clear()
+    for key in [key for key in VM_NAME_INDEX if key[0] == vc_host]:
+        del VM_NAME_INDEX[key]
+
+add_reconnect_hook(reset_vcenter_caches)
+
+# ============================================
+# DATACENTER INDEX
+# ============================================
+
+def get_datacenter_index(vc_host):
+    """Get datacenter name -> moref index for a vCenter (built once per run)
+    
+    Datacenters nested in folders are included: the container view is
+    rooted at rootFolder and is recursive.
+    """
+    if vc_host in DC_INDEX:
+        return DC_INDEX[vc_host]
+    
+    si = get_vcenter_connection(vc_host)
+    if not si:
+        return None
+    
+    content = si.RetrieveContent()
+    container = content.viewManager.CreateContainerView(
+        content.rootFolder, [vim.Datacenter], True
+    )
+    
+    index = {}
+    try:
+        for dc, props in retrieve_view_properties(content, container, vim.Datacenter, ["name"]):
+            dc_name = props.get("name")
+            if dc_name in index:
+                print(f"[WARN] Duplicate datacenter name '{dc_name}' in {vc_host}, using first one", file=sys.stderr)
+                continue
+            index[dc_name] = dc
+    finally:
+        container.Destroy()
+    
+    print(f"[DEBUG] Datacenter index for {vc_host}: {', '.join(sorted(index)) or 'empty'}", file=sys.stderr)
+    DC_INDEX[vc_host] = index
+    return index
+
+def get_datacenter(vc_host, datacenter_name):
+    """Resolve datacenter by name using the per-vCenter index"""
+    index = get_datacenter_index(vc_host)
+    if index is None:
+        return None
+    return index.get(datacenter_name)
+
+# ============================================
+# DOMAIN TARGET INDEX
+# ============================================
+
+def resolve_folder(vc_host, datacenter, datacenter_name, folder_path):
+    """Resolve a configured folder path (/<datacenter>/vm/<folder>...) to a Folder
+    
+    SearchIndex.FindByInventoryPath resolves the path in one call. For
+    datacenters nested in folders the inventory path has extra leading
+    components, so the path is then walked from datacenter.vmFolder with
+    FindChild (one call per level).
+    """
+    si = get_vcenter_connection(vc_host)
+    if not si:
+        return None
+    
+    content = si.RetrieveContent()
+    folder = content.searchIndex.FindByInventoryPath(folder_path.strip("/"))
+    if isinstance(folder, vim.Folder):
+        return folder
+    
+    parts = [part for part in folder_path.strip("/").split("/") if part]
+    if parts[:2] != [datacenter_name, "vm"]:
+        return None
+    
+    folder = datacenter.vmFolder
+    for name in parts[2:]:
+        folder = content.searchIndex.FindChild(folder, name)
+        if not isinstance(folder, vim.Folder):
             return None
-    return VC_CONNECTIONS[vc_host]
+    return folder
 
-def cleanup_connections():
-    """Cleanup all vCenter connections"""
-    for vc_host, connection in VC_CONNECTIONS.items():
-        try:
-            Disconnect(connection)
-        except:
-            pass
+def get_domain_targets(domain, search_targets):
+    """Compile search targets of a domain into resolved targets (built once per run)
+    
+    vcenter_mapping entries whose datacenter domain matches (or has no
+    domain) become {"vcenter", "vcenter_hostname", "datacenter_name",
+    "datacenter", "folder", "root"} entries. root is the moref the VM
+    container view is rooted at: the configured folder, or the
+    datacenter vmFolder when no folder is set. Targets that cannot be
+    resolved are skipped with a warning.
+    """
+    if domain in TARGET_INDEX:
+        return TARGET_INDEX[domain]
+    
+    targets = []
+    seen = set()
+    for target in search_targets:
+        vc_name = target.get("name")
+        vc_host = target.get("hostname")
+        
+        for dc in target.get("datacenters", []):
+            dc_name = dc.get("name")
+            folder_path = dc.get("folder") or None
+            if dc.get("domain") not in (domain, None):
+                continue
+            
+            key = (vc_host, dc_name, folder_path)
+            if key in seen:
+                continue
+            seen.add(key)
+            
+            datacenter = get_datacenter(vc_host, dc_name)
+            if not datacenter:
+                print(f"[WARN] Datacenter {dc_name} not found in {vc_name}", file=sys.stderr)
+                continue
+            
+            if folder_path:
+                root = resolve_folder(vc_host, datacenter, dc_name, folder_path)
+                if root is None:
+                    print(f"[WARN] Folder {folder_path} not found in {vc_name}", file=sys.stderr)
+                    continue
+            else:
+                root = datacenter.vmFolder
+            
+            targets.append({
+                "vcenter": vc_name,
+                "vcenter_hostname": vc_host,
+                "datacenter_name": dc_name,
+                "datacenter": datacenter,
+                "folder": folder_path,
+                "root": root
+            })
+    
+    print(f"[DEBUG] Search targets for {domain}: "
+          f"{', '.join(t['vcenter'] + (t['folder'] or '/' + t['datacenter_name']) for t in targets) or 'none'}", file=sys.stderr)
+    TARGET_INDEX[domain] = targets
+    return targets
+
+def bind_target(target, si):
+    """Return target with its datacenter/root morefs bound to si's stub
+    
+    Targets are compiled once per run. If call_with_reconnect retries on a
+    replaced connection, the cached morefs still point at the old stub;
+    moref ids stay valid across sessions, so they are rebound to the new one.
+    """
+    if getattr(target["datacenter"], "_stub", None) is si._stub:
+        return target
+    return {
+        **target,
+        "datacenter": type(target["datacenter"])(target["datacenter"]._moId, si._stub),
+        "root": type(target["root"])(target["root"]._moId, si._stub)
+    }
 
 # ============================================
 # VCENTER VM SEARCH
@@ -103,50 +243,133 @@ def get_vm_details(vm_obj):
         print(f"[WARN] Failed to get VM details: {str(e)}", file=sys.stderr)
         return {}
 
-def search_vm_in_datacenter(vm_name, vc_host, vc_name, datacenter_name, folder_path=None):
-    """Search for VM in specific datacenter"""
+def get_vm_folder_path(vm, datacenter, datacenter_name):
+    """Build VM folder path in /<datacenter>/vm/<folder>... format"""
+    folder_path = ""
+    parent = vm.parent
+    while parent and parent != datacenter.vmFolder:
+        folder_path = f"/{parent.name}{folder_path}"
+        parent = parent.parent
+    return f"/{datacenter_name}/vm{folder_path}"
+
+def build_vm_result(vm, vm_name, vc_host, vc_name, datacenter_name, folder_path_full):
+    """Build output record for a found VM"""
+    vm_details = get_vm_details(vm)
+    
+    return {
+        "name": vm_name,
+        "vcenter": vc_name,
+        "vcenter_hostname": vc_host,
+        "datacenter": datacenter_name,
+        "folder": folder_path_full,
+        "moref": vm._moId,
+        "uuid": vm_details.get("uuid", ""),
+        "instance_uuid": vm_details.get("instance_uuid", ""),
+        "power_state": vm_details.get("power_state", ""),
+        "guest_id": vm_details.get("guest_id", ""),
+        "num_cpu": vm_details.get("num_cpu", 0),
+        "memory_mb": vm_details.get("memory_mb", 0),
+        "vm_path": vm_details.get("vm_path", "")
+    }
+
+def get_vm_name_index(si, target):
+    """Get VM name -> [moref] index of one search target (built once per run)
+    
+    The container view is rooted at the target folder (datacenter.vmFolder
+    or the configured folder), so only that subtree is read. All names
+    come from one paged PropertyCollector retrieval; every input name is
+    then resolved from the index without further calls.
+    """
+    key = (target["vcenter_hostname"], target["root"]._moId)
+    if key in VM_NAME_INDEX:
+        return VM_NAME_INDEX[key]
+    
+    content = si.RetrieveContent()
+    container = content.viewManager.CreateContainerView(
+        target["root"], [vim.VirtualMachine], True
+    )
+    
+    index = {}
     try:
-        si = get_vcenter_connection(vc_host)
-        if not si:
+        for vm, props in retrieve_view_properties(content, container, vim.VirtualMachine, ["name"], page_size=VM_INDEX_PAGE_SIZE):
+            index.setdefault(props.get("name"), []).append(vm)
+    finally:
+        container.Destroy()
+    
+    print(f"[DEBUG] VM name index for {target['vcenter']}{target['folder'] or '/' + target['datacenter_name']}: "
+          f"{sum(len(vms) for vms in index.values())} VM(s)", file=sys.stderr)
+    VM_NAME_INDEX[key] = index
+    return index
+
+def search_vm_in_datacenter(si, vm_name, target):
+    """Search for VM by name in one compiled search target (via the VM name index)"""
+    vc_name = target["vcenter"]
+    datacenter_name = target["datacenter_name"]
+    
+    try:
+        found_vms = get_vm_name_index(si, target).get(vm_name, [])
+        
+        if len(found_vms) == 0:
             return None
         
-        content = si.RetrieveContent()
+        if len(found_vms) > 1:
+            return {
+                "error": "multiple_vms_found",
+                "count": len(found_vms),
+                "message": f"Multiple VMs ({len(found_vms)}) with name '{vm_name}' found in {vc_name}/{datacenter_name}"
+            }
         
-        # Find datacenter
-        datacenter = None
-        for dc in content.rootFolder.childEntity:
-            if hasattr(dc, 'name') and dc.name == datacenter_name:
-                datacenter = dc
-                break
+        # Single VM found
+        vm = found_vms[0]
+        folder_path_full = get_vm_folder_path(vm, target["datacenter"], datacenter_name)
         
-        if not datacenter:
-            print(f"[WARN] Datacenter {datacenter_name} not found in {vc_name}", file=sys.stderr)
-            return None
+        return build_vm_result(vm, vm_name, target["vcenter_hostname"], vc_name, datacenter_name, folder_path_full)
+    
+    except vim.fault.NotAuthenticated:
+        raise
+    except Exception as e:
+        print(f"[ERROR] Error searching VM {vm_name} in {vc_name}/{datacenter_name}: {str(e)}", file=sys.stderr)
+        return None
+
+def is_vm_in_folder(vm, folder, datacenter):
+    """Check whether VM is inside folder (any depth, within the datacenter)"""
+    parent = vm.parent
+    while parent is not None and parent != datacenter:
+        if parent == folder:
+            return True
+        parent = parent.parent
+    return False
+
+def search_vm_by_uuid_in_datacenter(si, vm_entry, target):
+    """Search for VM by BIOS/instance UUID in one compiled search target
+    
+    Uses SearchIndex.FindAllByUuid (constant time on the vCenter side).
+    FindAllByUuid is FindByUuid plus duplicate detection: cloned VMs can
+    share a BIOS UUID, so more than one hit is reported as ambiguous.
+    instance_uuid is preferred over uuid when both are given.
+    """
+    use_instance_uuid = bool(vm_entry.get("instance_uuid"))
+    lookup_uuid = vm_entry["instance_uuid"] if use_instance_uuid else vm_entry["uuid"]
+    label = vm_entry["label"]
+    vc_name = target["vcenter"]
+    datacenter_name = target["datacenter_name"]
+    datacenter = target["datacenter"]
+    
+    try:
+        content = si.RetrieveContent()
         
-        # Container view for VMs
-        container = content.viewManager.CreateContainerView(
-            datacenter.vmFolder, [vim.VirtualMachine], True
-        )
+        candidates = content.searchIndex.FindAllByUuid(
+            datacenter=datacenter,
+            uuid=lookup_uuid,
+            vmSearch=True,
+            instanceUuid=use_instance_uuid
+        ) or []
         
         found_vms = []
-        for vm in container.view:
-            if vm.name == vm_name:
-                # Check folder path if specified
-                if folder_path:
-                    vm_folder_path = ""
-                    parent = vm.parent
-                    while parent and parent != datacenter.vmFolder:
-                        vm_folder_path = f"/{parent.name}{vm_folder_path}"
-                        parent = parent.parent
-                    
-                    vm_folder_path = f"/{datacenter_name}/vm{vm_folder_path}"
-                    
-                    if not vm_folder_path.startswith(folder_path):
-                        continue
-                
-                found_vms.append(vm)
-        
-        container.Destroy()
+        for vm in candidates:
+            if target["folder"] and not is_vm_in_folder(vm, target["root"], datacenter):
+                continue
+            found_vms.append(vm)
         
         if len(found_vms) == 0:
             return None
@@ -155,78 +378,85 @@ def search_vm_in_datacenter(vm_name, vc_host, vc_name, datacenter_name, folder_p
             return {
                 "error": "multiple_vms_found",
                 "count": len(found_vms),
-                "message": f"Multiple VMs ({len(found_vms)}) with name '{vm_name}' found in {vc_name}/{datacenter_name}"
+                "message": f"Multiple VMs ({len(found_vms)}) with UUID '{lookup_uuid}' found in {vc_name}/{datacenter_name}"
             }
         
-        # Single VM found
         vm = found_vms[0]
+        vm_name = vm_entry["name"] or vm.name
+        folder_path_full = get_vm_folder_path(vm, datacenter, datacenter_name)
         
-        # Get folder path
-        folder_path_full = ""
-        parent = vm.parent
-        while parent and parent != datacenter.vmFolder:
-            folder_path_full = f"/{parent.name}{folder_path_full}"
-            parent = parent.parent
-        folder_path_full = f"/{datacenter_name}/vm{folder_path_full}"
-        
-        vm_details = get_vm_details(vm)
-        
-        return {
-            "name": vm_name,
-            "vcenter": vc_name,
-            "vcenter_hostname": vc_host,
-            "datacenter": datacenter_name,
-            "folder": folder_path_full,
-            "uuid": vm_details.get("uuid", ""),
-            "instance_uuid": vm_details.get("instance_uuid", ""),
-            "power_state": vm_details.get("power_state", ""),
-            "guest_id": vm_details.get("guest_id", ""),
-            "num_cpu": vm_details.get("num_cpu", 0),
-            "memory_mb": vm_details.get("memory_mb", 0),
-            "vm_path": vm_details.get("vm_path", "")
-        }
-        
+        return build_vm_result(vm, vm_name, target["vcenter_hostname"], vc_name, datacenter_name, folder_path_full)
+    
+    except vim.fault.NotAuthenticated:
+        raise
     except Exception as e:
-        print(f"[ERROR] Error searching VM {vm_name} in {vc_name}/{datacenter_name}: {str(e)}", file=sys.stderr)
+        print(f"[ERROR] Error searching VM {label} by UUID in {vc_name}/{datacenter_name}: {str(e)}", file=sys.stderr)
         return None
 
-def find_vm_across_targets(vm_name, search_targets):
-    """Search for VM across all search targets"""
-    print(f"\n[INFO] Searching for VM: {vm_name}", file=sys.stderr)
+def parse_vm_entry(entry):
+    """Normalize an input entry
+    
+    Entry is either a VM name string or a dict with "name", "uuid"
+    and/or "instance_uuid" keys. Entries with a UUID are resolved through
+    the SearchIndex fast path, the rest by name.
+    """
+    if isinstance(entry, dict):
+        vm_entry = {
+            "name": entry.get("name") or None,
+            "uuid": entry.get("uuid") or None,
+            "instance_uuid": entry.get("instance_uuid") or None
+        }
+    else:
+        vm_entry = {"name": str(entry).strip(), "uuid": None, "instance_uuid": None}
+    
+    vm_entry["label"] = vm_entry["name"] or vm_entry["instance_uuid"] or vm_entry["uuid"] or ""
+    return vm_entry
+
+def find_vm_across_targets(vm_entry, targets):
+    """Search for VM across the compiled search targets of the domain"""
+    label = vm_entry["label"]
+    if not label:
+        return {"found": False, "error": "invalid_entry", "message": "VM entry has no name, uuid or instance_uuid"}
+    
+    by_uuid = bool(vm_entry["uuid"] or vm_entry["instance_uuid"])
+    print(f"\n[INFO] Searching for VM: {label}{' (by UUID)' if by_uuid else ''}", file=sys.stderr)
     
     found_results = []
     
-    for target in search_targets:
-        vc_name = target.get("name")
-        vc_hostname = target.get("hostname")
-        datacenters = target.get("datacenters", [])
+    for target in targets:
+        vc_name = target["vcenter"]
+        dc_name = target["datacenter_name"]
+        folder_path = target["folder"]
         
-        for dc in datacenters:
-            dc_name = dc.get("name")
-            dc_domain = dc.get("domain")
-            folder_path = dc.get("folder")
-            
-            print(f"[DEBUG]   Checking {vc_name}/{dc_name} (domain: {dc_domain}){' [folder: ' + folder_path + ']' if folder_path else ''}", file=sys.stderr)
-            
-            result = search_vm_in_datacenter(vm_name, vc_hostname, vc_name, dc_name, folder_path)
-            
-            if result:
-                if "error" in result:
-                    # Multiple VMs found - skip this VM entirely
-                    print(f"[ERROR]   {result['message']}", file=sys.stderr)
-                    return {
-                        "found": False,
-                        "error": result["error"],
-                        "message": result["message"]
-                    }
-                else:
-                    # Single VM found
-                    print(f"[SUCCESS] Found in {vc_name}/{dc_name}", file=sys.stderr)
-                    found_results.append(result)
+        print(f"[DEBUG]   Checking {vc_name}/{dc_name}{' [folder: ' + folder_path + ']' if folder_path else ''}", file=sys.stderr)
+        
+        # Oturum düşmüşse (NotAuthenticated) yeniden bağlanıp bir kez tekrar denenir
+        try:
+            if by_uuid:
+                result = call_with_reconnect(target["vcenter_hostname"], lambda si: search_vm_by_uuid_in_datacenter(si, vm_entry, bind_target(target, si)))
+            else:
+                result = call_with_reconnect(target["vcenter_hostname"], lambda si: search_vm_in_datacenter(si, vm_entry["name"], bind_target(target, si)))
+        except vim.fault.NotAuthenticated:
+            print(f"[ERROR]   Session lost on {vc_name}, search skipped", file=sys.stderr)
+            result = None
+        
+        if result:
+            if "error" in result:
+                # Multiple VMs found - skip this VM entirely
+                print(f"[ERROR]   {result['message']}", file=sys.stderr)
+                return {
+                    "found": False,
+                    "error": result["error"],
+                    "message": result["message"]
+                }
+            else:
+                # Single VM found
+                print(f"[SUCCESS] Found in {vc_name}/{dc_name}", file=sys.stderr)
+                found_results.append(result)
     
     if len(found_results) == 0:
         print(f"[WARN]   VM not found in any location", file=sys.stderr)
-        return {"found": False, "error": "vm_not_found", "message": f"VM '{vm_name}' not found"}
+        return {"found": False, "error": "vm_not_found", "message": f"VM '{label}' not found"}
     
     if len(found_results) > 1:
         print(f"[WARN]   VM found in multiple locations ({len(found_results)}), using first one", file=sys.stderr)
@@ -234,60 +464,418 @@ def find_vm_across_targets(vm_name, search_targets):
     # Return first found result
     return {"found": True, "vm_data": found_results[0]}
 
+# ============================================
+# STORAGE ADMISSION
+# ============================================
+
+def fetch_storage_usage(vc_host, records):
+    """Fetch datastore capacity and per-VM committed sizes in one retrieval
+    
+    VM storage.perDatastoreUsage and the summary of every datastore the
+    VMs live on come from a single PropertyCollector call (VM -> datastore
+    traversal). Datastores are added to DATASTORE_LEDGER on first sight.
+    
+    Returns: {vm_moref: {"power_state", "usage": {datastore_moref: committed_bytes}}}
+    """
+    si = get_vcenter_connection(vc_host)
+    if not si:
+        raise RuntimeError(f"Failed to connect to {vc_host}")
+    
+    content = si.RetrieveContent()
+    vms = [vim.VirtualMachine(record["moref"], si._stub) for record in records]
+    
+    traversal_spec = vmodl.query.PropertyCollector.TraversalSpec(
+        name="vmToDatastore",
+        path="datastore",
+        skip=False,
+        type=vim.VirtualMachine
+    )
+    datastore_spec = vmodl.query.PropertyCollector.PropertySpec(
+        type=vim.Datastore,
+        pathSet=["name", "summary.capacity", "summary.freeSpace", "summary.accessible"],
+        all=False
+    )
+    props_list = retrieve_objects_properties(
+        content,
+        vms,
+        vim.VirtualMachine,
+        ["storage.perDatastoreUsage", "runtime.powerState"],
+        select_set=[traversal_spec],
+        extra_prop_specs=[datastore_spec]
+    )
+    
+    vm_usage = {}
+    for obj, props in props_list:
+        if isinstance(obj, vim.Datastore):
+            key = (vc_host, obj._moId)
+            if key not in DATASTORE_LEDGER:
+                DATASTORE_LEDGER[key] = {
+                    "name": props.get("name", obj._moId),
+                    "capacity": props.get("summary.capacity") or 0,
+                    "free": props.get("summary.freeSpace") or 0,
+                    "accessible": props.get("summary.accessible", True) is not False,
+                    "reserved": 0
+                }
+            continue
+        
+        vm_usage[obj._moId] = {
+            "power_state": props.get("runtime.powerState"),
+            "usage": {
+                usage.datastore._moId: usage.committed or 0
+                for usage in (props.get("storage.perDatastoreUsage") or [])
+            }
+        }
+    
+    return vm_usage
+
+def estimate_snapshot_growth(vc_host, record, vm_usage):
+    """Estimate bytes a snapshot will need on each datastore of the VM
+    
+    Delta disks grow to SNAPSHOT_GROWTH_PCT of the committed size per
+    datastore. With memory snapshots a powered-on VM also writes its
+    memory (vmem) to the home datastore taken from vm_path.
+    """
+    growth = {
+        ds_id: int(committed * SNAPSHOT_GROWTH_PCT / 100)
+        for ds_id, committed in vm_usage["usage"].items()
+    }
+    
+    if SNAPSHOT_MEMORY and vm_usage["power_state"] == "poweredOn":
+        home_name = record.get("vm_path", "").partition("]")[0].lstrip("[")
+        for ds_id in growth:
+            if DATASTORE_LEDGER[(vc_host, ds_id)]["name"] == home_name:
+                growth[ds_id] += record.get("memory_mb", 0) * 1024 * 1024
+                break
+    
+    return growth
+
+def admit_vms_on_vcenter(vc_host, records):
+    """Admit or reject VMs of one vCenter against the datastore threshold
+    
+    VMs are ranked by estimated growth (smallest first) so that as many
+    VMs as possible fit. A VM is admitted only if, together with all
+    previously admitted VMs, no datastore it uses goes over
+    DATASTORE_MAX_USED_PCT; its growth is then reserved in the ledger.
+    The decision is written to record["admission"].
+    """
+    try:
+        usage_by_vm = fetch_storage_usage(vc_host, records)
+    except Exception as e:
+        # Kapasite okunamazsa snapshot engellenmez, karar "unchecked" olarak raporlanır
+        print(f"[WARN] Datastore capacity check skipped for {vc_host}: {str(e)}", file=sys.stderr)
+        for record in records:
+            record["admission"] = {"decision": "unchecked", "message": f"Capacity check failed: {str(e)}"}
+        return
+    
+    estimates = {}
+    for index, record in enumerate(records):
+        vm_usage = usage_by_vm.get(record["moref"], {"power_state": None, "usage": {}})
+        estimates[index] = estimate_snapshot_growth(vc_host, record, vm_usage)
+    
+    ranked = sorted(estimates, key=lambda index: sum(estimates[index].values()))
+    for rank, index in enumerate(ranked, 1):
+        growth = estimates[index]
+        checks = []
+        reject_reason = None
+        
+        for ds_id, needed in growth.items():
+            ds = DATASTORE_LEDGER[(vc_host, ds_id)]
+            capacity = ds["capacity"]
+            used_after = capacity - ds["free"] + ds["reserved"] + needed
+            used_pct = round(used_after * 100 / capacity, 1) if capacity else 100.0
+            checks.append({
+                "datastore": ds["name"],
+                "capacity_gb": round(capacity / GB, 1),
+                "free_gb": round(ds["free"] / GB, 1),
+                "reserved_gb": round(ds["reserved"] / GB, 1),
+                "needed_gb": round(needed / GB, 2),
+                "projected_used_pct": used_pct
+            })
+            
+            if reject_reason:
+                continue
+            if not ds["accessible"]:
+                reject_reason = f"Datastore {ds['name']} is not accessible"
+            elif used_pct > DATASTORE_MAX_USED_PCT:
+                reject_reason = f"Datastore {ds['name']} would reach {used_pct}% (limit {DATASTORE_MAX_USED_PCT}%)"
+        
+        if not reject_reason:
+            for ds_id, needed in growth.items():
+                DATASTORE_LEDGER[(vc_host, ds_id)]["reserved"] += needed
+        
+        records[index]["admission"] = {
+            "decision": "rejected" if reject_reason else "admitted",
+            "rank": rank,
+            "estimated_growth_gb": round(sum(growth.values()) / GB, 2),
+            "datastores": checks,
+            "message": reject_reason or "Datastore capacity OK"
+        }
+
+def admit_vms(records):
+    """Run storage admission for found VM records (grouped per vCenter)
+    
+    Returns: (admitted records, rejected error infos) - input order kept
+    """
+    if not ADMISSION_CHECK:
+        return records, []
+    
+    by_vcenter = {}
+    for record in records:
+        by_vcenter.setdefault(record["vcenter_hostname"], []).append(record)
+    
+    for vc_host, vc_records in by_vcenter.items():
+        print(f"[INFO] Storage admission check: {len(vc_records)} VM(s) on {vc_host}", file=sys.stderr)
+        admit_vms_on_vcenter(vc_host, vc_records)
+    
+    admitted = []
+    rejected = []
+    for record in records:
+        admission = record["admission"]
+        if admission["decision"] == "rejected":
+            print(f"[WARN]   {record['name']}: {admission['message']}", file=sys.stderr)
+            rejected.append({
+                "name": record["name"],
+                "error": "datastore_threshold_exceeded",
+                "message": admission["message"],
+                "admission": admission
+            })
+        else:
+            admitted.append(record)
+    
+    return admitted, rejected
+
+# ============================================
+# INPUT / OUTPUT
+# ============================================
+
+def iter_entry_lines(handle):
+    """Yield VM entries from a file-like object
+    
+    Accepts either a JSON list (read as a whole) or one entry per line:
+    a plain VM name, or a JSON string/object ({"name", "uuid", ...}).
+    The line format is read lazily so thousands of names stay cheap.
+    """
+    first_line = None
+    for line in handle:
+        if line.strip():
+            first_line = line
+            break
+    
+    if first_line is None:
+        return
+    
+    if first_line.lstrip().startswith("["):
+        entries = json.loads(first_line + handle.read())
+        if not isinstance(entries, list):
+            raise ValueError("VM names JSON must be a list")
+        yield from entries
+        return
+    
+    for line in itertools.chain([first_line], handle):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if line[0] in "{\"":
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                print(f"[WARN] Invalid JSON entry skipped: {line[:80]}", file=sys.stderr)
+                yield {}
+        else:
+            yield line
+
+def iter_entry_file(path):
+    """Yield VM entries from a file (see iter_entry_lines)"""
+    with open(path, encoding="utf-8") as handle:
+        yield from iter_entry_lines(handle)
+
+def load_vm_entries(source):
+    """Return an iterable of raw VM entries
+    
+    source: JSON list (argv), "-" (stdin) or "@/path/to/file"
+    """
+    if source == "-":
+        return iter_entry_lines(sys.stdin)
+    
+    if source.startswith("@"):
+        path = source[1:]
+        if not os.path.isfile(path):
+            print(json.dumps({"success": False, "error": f"VM names file not found: {path}"}))
+            sys.exit(1)
+        return iter_entry_file(path)
+    
+    try:
+        entries = json.loads(source)
+    except json.JSONDecodeError:
+        print(json.dumps({"success": False, "error": "Invalid VM names JSON"}))
+        sys.exit(1)
+    
+    if not entries or not isinstance(entries, list):
+        print(json.dumps({"success": False, "error": "No VM names provided or invalid format"}))
+        sys.exit(1)
+    
+    return entries
+
+def load_search_targets():
+    """Parse and validate search targets JSON"""
+    try:
+        search_targets = json.loads(VCENTER_SEARCH_TARGETS_JSON)
+    except json.JSONDecodeError:
+        print(json.dumps({"success": False, "error": "Invalid search targets JSON"}))
+        sys.exit(1)
+    
+    if not search_targets or not isinstance(search_targets, list):
+        print(json.dumps({"success": False, "error": "No search targets provided"}))
+        sys.exit(1)
+    
+    return search_targets
+
+def emit_record(record):
+    """Write one NDJSON record to stdout and flush it immediately"""
+    sys.stdout.write(json.dumps(record) + "\n")
+    sys.stdout.flush()
+
 # ============================================
 # MAIN
 # ============================================
 
 def main():
     """Main entry point"""
+    if OUTPUT_FORMAT not in ("json", "ndjson"):
+        print(json.dumps({"success": False, "error": f"Invalid output format: {OUTPUT_FORMAT} (json or ndjson)"}))
+        sys.exit(1)
+    
+    if not VC_USERNAME or not VC_PASSWORD:
+        print(json.dumps({"success": False, "error": "Missing vCenter credentials"}))
+        sys.exit(1)
+    
+    search_targets = load_search_targets()
+    vm_entries = load_vm_entries(VM_NAMES_SOURCE)
+    streaming = OUTPUT_FORMAT == "ndjson"
+    
     print("=" * 60, file=sys.stderr)
     print("VM SEARCH FOR SNAPSHOT OPERATIONS", file=sys.stderr)
     print("=" * 60, file=sys.stderr)
     print(f"[INFO] Domain: {DOMAIN}", file=sys.stderr)
-    print(f"[INFO] VMs to search: {len(VM_NAMES)}", file=sys.stderr)
-    print(f"[INFO] Search targets: {len(SEARCH_TARGETS)} vCenters", file=sys.stderr)
+    if isinstance(vm_entries, list):
+        print(f"[INFO] VMs to search: {len(vm_entries)}", file=sys.stderr)
+    else:
+        print(f"[INFO] VMs to search: streamed from {'stdin' if VM_NAMES_SOURCE == '-' else VM_NAMES_SOURCE[1:]}", file=sys.stderr)
+    print(f"[INFO] Search targets: {len(search_targets)} vCenters", file=sys.stderr)
+    print(f"[INFO] Output format: {OUTPUT_FORMAT}", file=sys.stderr)
+    if ADMISSION_CHECK:
+        print(f"[INFO] Storage admission: max {DATASTORE_MAX_USED_PCT}% used, growth {SNAPSHOT_GROWTH_PCT}%", file=sys.stderr)
     
     # Count total datacenters
-    total_dcs = sum(len(t.get("datacenters", [])) for t in SEARCH_TARGETS)
+    total_dcs = sum(1 for t in search_targets for dc in t.get("datacenters", []) if dc.get("domain") in (DOMAIN, None))
     print(f"[INFO] Total datacenters to search: {total_dcs}", file=sys.stderr)
     print("=" * 60, file=sys.stderr)
     
+    # In ndjson mode only counters are kept, records are streamed
     results = {
         "success": True,
         "domain": DOMAIN,
-        "total_requested": len(VM_NAMES),
+        "total_requested": 0,
         "vms_found": [],
         "vms_not_found": [],
         "vms_with_errors": []
     }
+    counts = {"found": 0, "not_found": 0, "with_errors": 0}
+    admission_counts = {"admitted": 0, "rejected": 0, "unchecked": 0}
+    
+    # Found VMs are admitted in batches (bounded memory in ndjson mode). In
+    # ndjson mode a batch is also flushed once its oldest record has waited
+    # ADMISSION_FLUSH_SEC (immediately without admission), so records keep
+    # streaming as they are resolved
+    pending_found = []
+    pending_since = {"time": 0.0}
+    
+    def flush_due():
+        if len(pending_found) >= ADMISSION_BATCH_SIZE:
+            return True
+        if not streaming or not pending_found:
+            return False
+        return not ADMISSION_CHECK or time.monotonic() - pending_since["time"] >= ADMISSION_FLUSH_SEC
+    
+    def flush_found():
+        admitted, rejected = admit_vms(pending_found)
+        for record in admitted:
+            decision = record.get("admission", {}).get("decision")
+            if decision:
+                admission_counts[decision] += 1
+            counts["found"] += 1
+            if streaming:
+                emit_record({"type": "vm", "status": "found", **record})
+            else:
+                results["vms_found"].append(record)
+        for error_info in rejected:
+            admission_counts["rejected"] += 1
+            counts["with_errors"] += 1
+            if streaming:
+                emit_record({"type": "vm", "status": "rejected", **error_info})
+            else:
+                results["vms_with_errors"].append(error_info)
+        pending_found.clear()
     
     try:
         # Search each VM
-        for vm_name in VM_NAMES:
-            search_result = find_vm_across_targets(vm_name, SEARCH_TARGETS)
+        for entry in vm_entries:
+            results["total_requested"] += 1
+            vm_entry = parse_vm_entry(entry)
+            search_result = find_vm_across_targets(vm_entry, get_domain_targets(DOMAIN, search_targets))
             
             if search_result.get("found"):
-                results["vms_found"].append(search_result["vm_data"])
+                if not pending_found:
+                    pending_since["time"] = time.monotonic()
+                pending_found.append(search_result["vm_data"])
+                if flush_due():
+                    flush_found()
+                continue
+            
+            error_info = {
+                "name": vm_entry["label"],
+                "error": search_result.get("error", "unknown"),
+                "message": search_result.get("message", "Unknown error")
+            }
+            
+            if search_result.get("error") == "vm_not_found":
+                counts["not_found"] += 1
+                status, bucket = "not_found", "vms_not_found"
             else:
-                error_info = {
-                    "name": vm_name,
-                    "error": search_result.get("error", "unknown"),
-                    "message": search_result.get("message", "Unknown error")
-                }
-                
-                if search_result.get("error") == "vm_not_found":
-                    results["vms_not_found"].append(error_info)
-                else:
-                    results["vms_with_errors"].append(error_info)
+                counts["with_errors"] += 1
+                status, bucket = "error", "vms_with_errors"
+            
+            if streaming:
+                emit_record({"type": "vm", "status": status, **error_info})
+            else:
+                results[bucket].append(error_info)
+            
+            if flush_due():
+                flush_found()
+        
+        flush_found()
+        
+        if results["total_requested"] == 0:
+            raise ValueError("No VM names provided or invalid format")
+        
+        results["admission"] = {
+            "enabled": ADMISSION_CHECK,
+            "max_used_pct": DATASTORE_MAX_USED_PCT,
+            "growth_pct": SNAPSHOT_GROWTH_PCT,
+            **admission_counts
+        }
         
         # Summary
         print("\n" + "=" * 60, file=sys.stderr)
         print("SEARCH SUMMARY", file=sys.stderr)
         print("=" * 60, file=sys.stderr)
         print(f"[INFO] Total Requested: {results['total_requested']}", file=sys.stderr)
-        print(f"[INFO] Found: {len(results['vms_found'])}", file=sys.stderr)
-        print(f"[INFO] Not Found: {len(results['vms_not_found'])}", file=sys.stderr)
-        print(f"[INFO] Errors (ambiguous/multiple): {len(results['vms_with_errors'])}", file=sys.stderr)
+        print(f"[INFO] Found: {counts['found']}", file=sys.stderr)
+        print(f"[INFO] Not Found: {counts['not_found']}", file=sys.stderr)
+        print(f"[INFO] Errors (ambiguous/multiple/rejected): {counts['with_errors']}", file=sys.stderr)
+        if ADMISSION_CHECK:
+            print(f"[INFO] Storage admission: {admission_counts['admitted']} admitted, "
+                  f"{admission_counts['rejected']} rejected, {admission_counts['unchecked']} unchecked", file=sys.stderr)
         print("=" * 60, file=sys.stderr)
         
         if results["vms_found"]:
@@ -307,14 +895,46 @@ def main():
         
         print("", file=sys.stderr)
         
-        # Output JSON result (stdout for Ansible parsing)
-        print(json.dumps(results, indent=2))
+        # SOAP çağrı özeti (VC_INSTRUMENT) ve çağrı bütçesi kontrolü
+        call_summary = get_call_summary()
+        if call_summary:
+            results["vcenter_calls"] = call_summary
+            print(f"[INFO] vCenter SOAP calls: {call_summary['total_calls']} ({call_summary['total_time_sec']} sec)", file=sys.stderr)
         
+        budget_error = check_call_budget()
+        if budget_error:
+            raise RuntimeError(budget_error)
+        
+        # Output JSON result (stdout for Ansible parsing)
+        if streaming:
+            emit_record({
+                "type": "summary",
+                "success": True,
+                "domain": DOMAIN,
+                "total_requested": results["total_requested"],
+                "admission": results["admission"],
+                **({"vcenter_calls": call_summary} if call_summary else {}),
+                **counts
+            })
+        else:
+            print(json.dumps(results, indent=2))
+    
     except Exception as e:
         print(f"\n[ERROR] Unexpected error: {str(e)}", file=sys.stderr)
-        results["success"] = False
-        results["error"] = str(e)
-        print(json.dumps(results, indent=2))
+        if streaming:
+            emit_record({
+                "type": "summary",
+                "success": False,
+                "error": str(e),
+                "domain": DOMAIN,
+                "total_requested": results["total_requested"],
+                **({"vcenter_calls": results["vcenter_calls"]} if "vcenter_calls" in results else {}),
+                **counts
+            })
+        else:
+            results["success"] = False
+            results["error"] = str(e)
+            print(json.dumps(results, indent=2))
         sys.exit(1)
     
     finally:
@@ -0,0 +1,346 @@
+#!/usr/bin/env python3
+# Dosya: files/snapshot_executor.py
+# Açıklama: Toplu Snapshot Alma (vCenter Task Multiplexing)
+
+"""
+Snapshot Executor
+- Accepts VM records produced by find_vms_for_snapshot.py (vms_found / NDJSON)
+- Issues CreateSnapshot_Task for all VMs over one pooled session per vCenter
+- Waits on all tasks together through one PropertyCollector filter (ListView)
+- Per-host and per-datastore concurrency caps
+- Returns JSON in report_data shape (servers_snapshot_success/failed, errors)
+- Verify mode: snapshot trees of all VMs in one PropertyCollector call per vCenter
+
+Parameters:
+  1. OPERATION: "create" or "verify"
+  2. VM_RECORDS: JSON list, "-" (stdin) or "@/path/to/file"
+  3. SNAPSHOT_NAME: Snapshot name ({service_desk_no}_{date}_{time})
+  4. SNAPSHOT_DESCRIPTION: Snapshot description
+"""
+
+import json
+import sys
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pyVmomi import vim, vmodl
+
+from find_vms_for_snapshot import (
+    get_vcenter_connection,
+    cleanup_connections,
+    get_datacenter,
+    load_vm_entries,
+    VC_USERNAME,
+    VC_PASSWORD
+)
+from vsphere_helpers import retrieve_objects_properties, iter_snapshot_tree, run_throttled_tasks
+
+# Parameters from Ansible
+OPERATION = sys.argv[1].lower() if len(sys.argv) > 1 else None
+VM_RECORDS_SOURCE = sys.argv[2] if len(sys.argv) > 2 else "[]"
+SNAPSHOT_NAME = sys.argv[3] if len(sys.argv) > 3 else None
+SNAPSHOT_DESCRIPTION = sys.argv[4] if len(sys.argv) > 4 else ""
+
+# Tuning from environment variables
+SNAPSHOT_MEMORY = os.getenv("SNAPSHOT_MEMORY", "false").lower() == "true"
+SNAPSHOT_QUIESCE = os.getenv("SNAPSHOT_QUIESCE", "true").lower() == "true"
+MAX_PER_HOST = int(os.getenv("SNAPSHOT_MAX_PER_HOST", "4"))
+MAX_PER_DATASTORE = int(os.getenv("SNAPSHOT_MAX_PER_DATASTORE", "4"))
+MAX_PER_VCENTER = int(os.getenv("SNAPSHOT_MAX_PER_VCENTER", "32"))
+TASK_TIMEOUT = int(os.getenv("SNAPSHOT_TASK_TIMEOUT", "1800"))
+
+OPERATIONS = ["create", "verify"]
+
+# ============================================
+# VM RESOLUTION / PLACEMENT
+# ============================================
+
+def resolve_vm(si, record):
+    """Resolve VM moref from record (moref or UUID)"""
+    if record.get("moref"):
+        return vim.VirtualMachine(record["moref"], si._stub)
+    
+    datacenter = get_datacenter(record["vcenter_hostname"], record.get("datacenter"))
+    content = si.RetrieveContent()
+    if record.get("instance_uuid"):
+        return content.searchIndex.FindByUuid(datacenter, record["instance_uuid"], True, True)
+    return content.searchIndex.FindByUuid(datacenter, record.get("uuid"), True)
+
+def resolve_vms(si, records, use_moref=True):
+    """Resolve VM objects for (index, record) pairs
+
+    Returns: (vms: {index: vm}, errors: {index: message})
+    """
+    vms = {}
+    errors = {}
+    
+    for index, record in records:
+        try:
+            vm = resolve_vm(si, record if use_moref else {**record, "moref": None})
+            if vm is None:
+                errors[index] = "VM not found by UUID"
+            else:
+                vms[index] = vm
+        except Exception as e:
+            errors[index] = f"VM resolve error: {str(e)}"
+    
+    return vms, errors
+
+def retrieve_vm_properties(si, records, path_set):
+    """Resolve VMs of one vCenter and fetch path_set for all of them in one call
+
+    VM morefs come from the finder output (UUID lookup as fallback). A
+    stale moref makes the whole retrieval fail, in that case all VMs are
+    resolved again by UUID and the retrieval is repeated once.
+
+    Returns: (vm_props: {index: (vm, {path: value})}, errors: {index: message})
+    """
+    content = si.RetrieveContent()
+    vms, errors = resolve_vms(si, records)
+    
+    try:
+        props_list = retrieve_objects_properties(content, list(vms.values()), vim.VirtualMachine, path_set)
+    except vmodl.fault.ManagedObjectNotFound:
+        # Stale moref (VM yeniden kaydedilmiş olabilir) - UUID ile tekrar çöz
+        print("[WARN] Stale VM moref detected, resolving by UUID", file=sys.stderr)
+        vms, errors = resolve_vms(si, records, use_moref=False)
+        props_list = retrieve_objects_properties(content, list(vms.values()), vim.VirtualMachine, path_set)
+    
+    props_by_id = {obj._moId: props for obj, props in props_list}
+    vm_props = {index: (vm, props_by_id.get(vm._moId, {})) for index, vm in vms.items()}
+    return vm_props, errors
+
+def resolve_vm_placement(si, records):
+    """Resolve VM objects and their host/datastore placement for one vCenter
+
+    Returns: (placements: {index: (vm, host_id, [datastore_ids])}, errors: {index: message})
+    """
+    vm_props, errors = retrieve_vm_properties(si, records, ["runtime.host", "datastore"])
+    
+    placements = {}
+    for index, (vm, props) in vm_props.items():
+        host = props.get("runtime.host")
+        datastores = props.get("datastore") or []
+        placements[index] = (vm, host._moId if host is not None else None, [ds._moId for ds in datastores])
+    
+    return placements, errors
+
+# ============================================
+# OPERATIONS
+# ============================================
+
+def create_snapshots_on_vcenter(vc_host, records):
+    """Create snapshots for all records of one vCenter
+    
+    Returns: list of per-VM result dicts
+    """
+    si = get_vcenter_connection(vc_host)
+    if not si:
+        return [make_vm_result(record, "failed", f"Failed to connect to {vc_host}") for _, record in records]
+    
+    placements, errors = resolve_vm_placement(si, records)
+    
+    jobs = []
+    for index, (vm, host_id, datastore_ids) in placements.items():
+        jobs.append({
+            "key": index,
+            "host": host_id,
+            "datastores": datastore_ids,
+            "start": lambda vm=vm: vm.CreateSnapshot_Task(
+                name=SNAPSHOT_NAME,
+                description=SNAPSHOT_DESCRIPTION,
+                memory=SNAPSHOT_MEMORY,
+                quiesce=SNAPSHOT_QUIESCE
+            )
+        })
+    
+    print(f"[INFO] {vc_host}: {len(jobs)} snapshot task(s), caps host={MAX_PER_HOST} datastore={MAX_PER_DATASTORE} vcenter={MAX_PER_VCENTER}", file=sys.stderr)
+    task_results = run_throttled_tasks(si, jobs, MAX_PER_HOST, MAX_PER_DATASTORE, MAX_PER_VCENTER, TASK_TIMEOUT)
+    
+    vm_results = []
+    for index, record in records:
+        if index in errors:
+            vm_results.append(make_vm_result(record, "failed", errors[index]))
+            continue
+        task_result = task_results.get(index, {"state": "error", "message": "No task result"})
+        status = "success" if task_result["state"] == "success" else "failed"
+        vm_results.append(make_vm_result(record, status, task_result["message"], task_result.get("duration_sec", 0.0)))
+    
+    return vm_results
+
+def verify_snapshots_on_vcenter(vc_host, records):
+    """Verify that SNAPSHOT_NAME exists on all records of one vCenter
+
+    snapshot.rootSnapshotList of every VM is fetched in one
+    PropertyCollector retrieval and the trees are searched locally, so
+    the number of round trips does not grow with the batch size.
+
+    Returns: list of per-VM result dicts
+    """
+    si = get_vcenter_connection(vc_host)
+    if not si:
+        return [make_vm_result(record, "failed", f"Failed to connect to {vc_host}") for _, record in records]
+    
+    vm_props, errors = retrieve_vm_properties(si, records, ["snapshot.rootSnapshotList"])
+    
+    vm_results = []
+    for index, record in records:
+        if index in errors:
+            vm_results.append(make_vm_result(record, "failed", errors[index]))
+            continue
+        
+        _, props = vm_props[index]
+        snapshot_names = [node.name for node in iter_snapshot_tree(props.get("snapshot.rootSnapshotList"))]
+        
+        if SNAPSHOT_NAME in snapshot_names:
+            vm_result = make_vm_result(record, "success")
+        else:
+            vm_result = make_vm_result(record, "failed", f"Snapshot '{SNAPSHOT_NAME}' not found")
+        vm_result["snapshot_count"] = len(snapshot_names)
+        vm_results.append(vm_result)
+    
+    print(f"[INFO] {vc_host}: {len(records)} VM(s) verified", file=sys.stderr)
+    return vm_results
+
+def make_vm_result(record, status, message="", duration_sec=0.0):
+    """Build per-VM result record"""
+    return {
+        "name": record.get("name"),
+        "vcenter": record.get("vcenter"),
+        "datacenter": record.get("datacenter"),
+        "uuid": record.get("uuid"),
+        "status": status,
+        "message": message,
+        "duration_sec": duration_sec
+    }
+
+def run_on_all_vcenters(records, operation_func):
+    """Group records by vCenter and run operation_func per vCenter in parallel
+    
+    Each vCenter gets its own thread (WaitForUpdatesEx blocks), results are
+    returned in input order.
+    """
+    groups = {}
+    for index, record in enumerate(records):
+        groups.setdefault(record.get("vcenter_hostname"), []).append((index, record))
+    
+    indexed_results = {}
+    with ThreadPoolExecutor(max_workers=max(1, len(groups))) as executor:
+        futures = {executor.submit(operation_func, vc_host, group): group for vc_host, group in groups.items()}
+        for future, group in futures.items():
+            try:
+                vm_results = future.result()
+            except Exception as e:
+                vm_results = [make_vm_result(record, "failed", f"vCenter error: {str(e)}") for _, record in group]
+            for (index, _), vm_result in zip(group, vm_results):
+                indexed_results[index] = vm_result
+    
+    return [indexed_results[index] for index in sorted(indexed_results)]
+
+def load_vm_records(source):
+    """Load VM records (finder vms_found list or NDJSON stream)"""
+    records = []
+    for entry in load_vm_entries(source):
+        if not isinstance(entry, dict):
+            continue
+        if entry.get("type") == "summary" or entry.get("status", "found") != "found":
+            continue
+        if not entry.get("vcenter_hostname"):
+            print(f"[WARN] Record without vcenter_hostname skipped: {entry.get('name')}", file=sys.stderr)
+            continue
+        records.append(entry)
+    return records
+
+# ============================================
+# MAIN
+# ============================================
+
+def main():
+    """Main entry point"""
+    if OPERATION not in OPERATIONS:
+        print(json.dumps({"success": False, "error": f"Invalid operation: {OPERATION} ({', '.join(OPERATIONS)})"}))
+        sys.exit(1)
+    
+    if not SNAPSHOT_NAME:
+        print(json.dumps({"success": False, "error": "No snapshot name provided"}))
+        sys.exit(1)
+    
+    if not VC_USERNAME or not VC_PASSWORD:
+        print(json.dumps({"success": False, "error": "Missing vCenter credentials"}))
+        sys.exit(1)
+    
+    records = load_vm_records(VM_RECORDS_SOURCE)
+    if not records:
+        print(json.dumps({"success": False, "error": "No VM records provided"}))
+        sys.exit(1)
+    
+    print("=" * 60, file=sys.stderr)
+    print(f"SNAPSHOT EXECUTOR - {OPERATION.upper()}", file=sys.stderr)
+    print("=" * 60, file=sys.stderr)
+    print(f"[INFO] Snapshot name: {SNAPSHOT_NAME}", file=sys.stderr)
+    print(f"[INFO] VMs: {len(records)}", file=sys.stderr)
+    if OPERATION == "create":
+        print(f"[INFO] Memory: {SNAPSHOT_MEMORY}, Quiesce: {SNAPSHOT_QUIESCE}", file=sys.stderr)
+    print("=" * 60, file=sys.stderr)
+    
+    start_time = time.time()
+    
+    try:
+        if OPERATION == "create":
+            vm_results = run_on_all_vcenters(records, create_snapshots_on_vcenter)
+        else:
+            vm_results = run_on_all_vcenters(records, verify_snapshots_on_vcenter)
+        
+        succeeded = [r for r in vm_results if r["status"] == "success"]
+        failed = [r for r in vm_results if r["status"] != "success"]
+        
+        results = {
+            "success": True,
+            "operation": OPERATION,
+            "snapshot_name": SNAPSHOT_NAME,
+            "total": len(vm_results),
+            "duration_sec": round(time.time() - start_time, 1)
+        }
+        
+        if OPERATION == "create":
+            results["servers_snapshot_success"] = [r["name"] for r in succeeded]
+            results["servers_snapshot_failed"] = [r["name"] for r in failed]
+            results["errors"] = [f"Snapshot alma hatası ({r['name']}): {r['message']}" for r in failed]
+        else:
+            results["servers_snapshot_verified"] = [r["name"] for r in succeeded]
+            results["servers_snapshot_missing"] = [r["name"] for r in failed]
+            results["errors"] = [f"Snapshot doğrulama hatası ({r['name']}): {r['message']}" for r in failed]
+        
+        results["results"] = vm_results
+        
+        print("\n" + "=" * 60, file=sys.stderr)
+        print(f"SNAPSHOT {OPERATION.upper()} SUMMARY", file=sys.stderr)
+        print("=" * 60, file=sys.stderr)
+        print(f"[INFO] Success: {len(succeeded)}", file=sys.stderr)
+        print(f"[INFO] Failed: {len(failed)}", file=sys.stderr)
+        print(f"[INFO] Duration: {results['duration_sec']}s", file=sys.stderr)
+        for r in failed:
+            print(f"  - {r['name']}: {r['message']}", file=sys.stderr)
+        print("=" * 60, file=sys.stderr)
+        
+        # Output JSON result (stdout for Ansible parsing)
+        print(json.dumps(results, indent=2))
+    
+    finally:
+        cleanup_connections()
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n[INFO] Interrupted by user", file=sys.stderr)
+        cleanup_connections()
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n[ERROR] Fatal error: {str(e)}", file=sys.stderr)
+        cleanup_connections()
+        print(json.dumps({
+            "success": False,
+            "error": f"Script error: {str(e)}"
+        }))
+        sys.exit(1)
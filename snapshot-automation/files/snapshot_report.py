@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# Dosya: files/snapshot_report.py
+# Açıklama: Tüm vCenter'larda Snapshot Envanteri ve Yaş Raporu
+
+"""
+Fleet-wide Snapshot Report
+- Reads snapshot tree and layoutEx of all VMs, one PropertyCollector query per vCenter
+- Computes age and on-disk size (delta disks + vmsn/vmem) of every snapshot
+- Streams records as CSV or NDJSON (bounded memory, suitable for 50k+ VMs)
+- Filters snapshots older than MIN_AGE_DAYS
+
+Parameters:
+  1. VCENTERS: JSON list of vCenters ({"name", "hostname"} or hostname strings)
+  2. MIN_AGE_DAYS: only report snapshots at least this old (default 0)
+  3. FORMAT: "ndjson" (default) or "csv"
+  4. OUTPUT: file path for records, "-" for stdout (default)
+     With a file path the summary JSON is printed to stdout
+"""
+
+import csv
+import json
+import sys
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from pyVmomi import vim
+
+from vcenter_connection import get_vcenter_connection, cleanup_connections, VC_USERNAME, VC_PASSWORD
+from vsphere_helpers import retrieve_view_properties, iter_snapshot_tree, parse_vcenters
+
+# Parameters from Ansible
+VCENTERS_JSON = sys.argv[1] if len(sys.argv) > 1 else "[]"
+MIN_AGE_DAYS = float(sys.argv[2]) if len(sys.argv) > 2 and sys.argv[2] else 0.0
+OUTPUT_FORMAT = sys.argv[3].lower() if len(sys.argv) > 3 else "ndjson"
+OUTPUT_PATH = sys.argv[4] if len(sys.argv) > 4 else "-"
+
+# Tuning from environment variables
+# layoutEx is large per VM, so pages are smaller than in the sweeper
+PAGE_SIZE = int(os.getenv("SNAPSHOT_REPORT_PAGE_SIZE", "200"))
+
+FORMATS = ["ndjson", "csv"]
+
+CSV_FIELDS = [
+    "vcenter_hostname", "vm", "moref", "snapshot", "description",
+    "created", "age_days", "size_mb", "power_state", "quiesced"
+]
+
+MB = 1024 * 1024
+
+# ============================================
+# SNAPSHOT SIZE
+# ============================================
+
+def get_snapshot_sizes(layout):
+    """Compute on-disk size of every snapshot of a VM from layoutEx
+    
+    A snapshot owns its vmsn/vmem files and the delta disks created when
+    it was taken: for each disk, the chain level right after the
+    snapshot's own chain in any later chain (child snapshot or current
+    disk). Files are counted once even if shared between branches.
+    
+    Returns: {snapshot moref: size in bytes}
+    """
+    if layout is None or not layout.snapshot:
+        return {}
+    
+    file_sizes = {file_info.key: file_info.size or 0 for file_info in (layout.file or [])}
+    
+    # Her disk için bilinen tüm zincirler (snapshot'lar + mevcut disk durumu)
+    chains_by_disk = {}
+    for snapshot_layout in layout.snapshot:
+        for disk in snapshot_layout.disk or []:
+            chains_by_disk.setdefault(disk.key, []).append([unit.fileKey for unit in disk.chain or []])
+    for disk in layout.disk or []:
+        chains_by_disk.setdefault(disk.key, []).append([unit.fileKey for unit in disk.chain or []])
+    
+    sizes = {}
+    for snapshot_layout in layout.snapshot:
+        owned = set()
+        for key in (snapshot_layout.dataKey, snapshot_layout.memoryKey):
+            if key is not None and key >= 0:
+                owned.add(key)
+        
+        for disk in snapshot_layout.disk or []:
+            chain = [unit.fileKey for unit in disk.chain or []]
+            for other in chains_by_disk.get(disk.key, []):
+                if len(other) > len(chain) and other[:len(chain)] == chain:
+                    owned.update(other[len(chain)])
+        
+        sizes[snapshot_layout.key._moId] = sum(file_sizes.get(key, 0) for key in owned)
+    
+    return sizes
+
+# ============================================
+# SCAN
+# ============================================
+
+def scan_vcenter(vc_host, now, writer):
+    """Stream snapshot records of all VMs in one vCenter
+    
+    Snapshot tree and layoutEx of every VM come from one paged
+    PropertyCollector retrieval over a container view. Records are written
+    as soon as a page is processed, nothing is accumulated per vCenter.
+    
+    Returns: {"vcenter_hostname", "scanned", "snapshots", "size_mb"[, "error"]}
+    """
+    summary = {"vcenter_hostname": vc_host, "scanned": 0, "snapshots": 0, "size_mb": 0.0}
+    
+    si = get_vcenter_connection(vc_host)
+    if not si:
+        summary["error"] = f"Failed to connect to {vc_host}"
+        return summary
+    
+    print(f"[INFO] Scanning {vc_host}", file=sys.stderr)
+    content = si.RetrieveContent()
+    container = content.viewManager.CreateContainerView(
+        content.rootFolder, [vim.VirtualMachine], True
+    )
+    
+    try:
+        path_set = ["name", "snapshot.rootSnapshotList", "layoutEx", "runtime.powerState"]
+        for vm, props in retrieve_view_properties(content, container, vim.VirtualMachine, path_set, page_size=PAGE_SIZE):
+            summary["scanned"] += 1
+            snapshot_list = props.get("snapshot.rootSnapshotList")
+            if not snapshot_list:
+                continue
+            
+            sizes = get_snapshot_sizes(props.get("layoutEx"))
+            for node in iter_snapshot_tree(snapshot_list):
+                age_days = (now - node.createTime).total_seconds() / 86400
+                if age_days < MIN_AGE_DAYS:
+                    continue
+                
+                size_mb = round(sizes.get(node.snapshot._moId, 0) / MB, 1)
+                summary["snapshots"] += 1
+                summary["size_mb"] += size_mb
+                writer({
+                    "vcenter_hostname": vc_host,
+                    "vm": props.get("name"),
+                    "moref": vm._moId,
+                    "snapshot": node.name,
+                    "description": node.description or "",
+                    "created": node.createTime.isoformat(),
+                    "age_days": round(age_days, 1),
+                    "size_mb": size_mb,
+                    "power_state": props.get("runtime.powerState"),
+                    "quiesced": bool(node.quiesced)
+                })
+    except Exception as e:
+        print(f"[ERROR] Snapshot scan failed on {vc_host}: {str(e)}", file=sys.stderr)
+        summary["error"] = f"Snapshot scan failed on {vc_host}: {str(e)}"
+    finally:
+        container.Destroy()
+    
+    summary["size_mb"] = round(summary["size_mb"], 1)
+    print(f"[INFO] {vc_host}: {summary['scanned']} VM(s) scanned, {summary['snapshots']} snapshot(s)", file=sys.stderr)
+    return summary
+
+# ============================================
+# OUTPUT
+# ============================================
+
+def make_writer(handle):
+    """Return a thread-safe record writer for the selected format"""
+    lock = threading.Lock()
+    
+    if OUTPUT_FORMAT == "csv":
+        csv_writer = csv.DictWriter(handle, fieldnames=CSV_FIELDS)
+        csv_writer.writeheader()
+        
+        def write(record):
+            with lock:
+                csv_writer.writerow(record)
+    else:
+        def write(record):
+            with lock:
+                handle.write(json.dumps({"type": "snapshot", **record}) + "\n")
+    
+    return write
+
+# ============================================
+# MAIN
+# ============================================
+
+def main():
+    """Main entry point"""
+    if OUTPUT_FORMAT not in FORMATS:
+        print(json.dumps({"success": False, "error": f"Invalid output format: {OUTPUT_FORMAT} ({', '.join(FORMATS)})"}))
+        sys.exit(1)
+    
+    if not VC_USERNAME or not VC_PASSWORD:
+        print(json.dumps({"success": False, "error": "Missing vCenter credentials"}))
+        sys.exit(1)
+    
+    vc_hosts = parse_vcenters(VCENTERS_JSON)
+    now = datetime.now(timezone.utc)
+    start_time = time.time()
+    to_stdout = OUTPUT_PATH == "-"
+    
+    print("=" * 60, file=sys.stderr)
+    print("SNAPSHOT INVENTORY REPORT", file=sys.stderr)
+    print("=" * 60, file=sys.stderr)
+    print(f"[INFO] vCenters: {', '.join(vc_hosts)}", file=sys.stderr)
+    print(f"[INFO] Minimum age: {MIN_AGE_DAYS} day(s)", file=sys.stderr)
+    print(f"[INFO] Output: {OUTPUT_FORMAT} -> {'stdout' if to_stdout else OUTPUT_PATH}", file=sys.stderr)
+    print("=" * 60, file=sys.stderr)
+    
+    handle = sys.stdout if to_stdout else open(OUTPUT_PATH, "w", encoding="utf-8", newline="")
+    try:
+        writer = make_writer(handle)
+        
+        # vCenter'lar paralel taranır, kayıtlar ortak writer ile akış halinde yazılır
+        with ThreadPoolExecutor(max_workers=len(vc_hosts)) as executor:
+            vc_results = list(executor.map(lambda vc_host: scan_vcenter(vc_host, now, writer), vc_hosts))
+        
+        summary = {
+            "success": True,
+            "now": now.isoformat(),
+            "min_age_days": MIN_AGE_DAYS,
+            "duration_sec": round(time.time() - start_time, 1),
+            "scanned_vms": sum(vc_result["scanned"] for vc_result in vc_results),
+            "snapshots": sum(vc_result["snapshots"] for vc_result in vc_results),
+            "size_mb": round(sum(vc_result["size_mb"] for vc_result in vc_results), 1),
+            "vcenters": vc_results,
+            "errors": [vc_result["error"] for vc_result in vc_results if vc_result.get("error")]
+        }
+        
+        print("\n" + "=" * 60, file=sys.stderr)
+        print("REPORT SUMMARY", file=sys.stderr)
+        print("=" * 60, file=sys.stderr)
+        print(f"[INFO] Scanned VMs: {summary['scanned_vms']}", file=sys.stderr)
+        print(f"[INFO] Snapshots: {summary['snapshots']} ({summary['size_mb']} MB)", file=sys.stderr)
+        print(f"[INFO] Duration: {summary['duration_sec']} sec", file=sys.stderr)
+        for error in summary["errors"]:
+            print(f"  - {error}", file=sys.stderr)
+        print("=" * 60, file=sys.stderr)
+        
+        # Summary: NDJSON akışının son kaydı veya (dosya çıktısında) stdout JSON
+        if not to_stdout:
+            print(json.dumps({**summary, "output": OUTPUT_PATH}, indent=2))
+        elif OUTPUT_FORMAT == "ndjson":
+            handle.write(json.dumps({"type": "summary", **summary}) + "\n")
+    
+    finally:
+        if not to_stdout:
+            handle.close()
+        cleanup_connections()
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n[INFO] Interrupted by user", file=sys.stderr)
+        cleanup_connections()
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n[ERROR] Fatal error: {str(e)}", file=sys.stderr)
+        cleanup_connections()
+        print(json.dumps({
+            "success": False,
+            "error": f"Script error: {str(e)}"
+        }))
+        sys.exit(1)
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+# Dosya: files/snapshot_sweeper.py
+# Açıklama: Süresi Dolan Snapshot'ları Toplu Silme (Periyodik İş)
+
+"""
+Expired Snapshot Sweeper
+- Scans snapshot trees of all VMs, one PropertyCollector pass per vCenter
+- Retention is read from the automation marker in the snapshot description
+  ("snapshot-automation retention=<N>d", written by snapshot_create.yaml)
+- Snapshots without the marker (not created by this automation) are never touched
+- A failing vCenter is reported in errors, the other vCenters are still swept
+- Removes expired snapshots in parallel with per-datastore throttling
+- Replaces per-ticket AWX deletion schedules with one periodic job
+
+Parameters:
+  1. VCENTERS: JSON list of vCenters ({"name", "hostname"} or hostname strings)
+  2. MODE: "report" (dry run, default) or "delete"
+"""
+
+import json
+import sys
+import os
+import re
+import time
+from datetime import datetime, timedelta, timezone
+from concurrent.futures import ThreadPoolExecutor
+from pyVmomi import vim
+
+from vcenter_connection import get_vcenter_connection, cleanup_connections, VC_USERNAME, VC_PASSWORD
+from vsphere_helpers import retrieve_view_properties, iter_snapshot_tree, run_throttled_tasks, parse_vcenters
+
+# Parameters from Ansible
+VCENTERS_JSON = sys.argv[1] if len(sys.argv) > 1 else "[]"
+MODE = sys.argv[2].lower() if len(sys.argv) > 2 else "report"
+
+# Tuning from environment variables
+MAX_PER_HOST = int(os.getenv("SNAPSHOT_SWEEP_MAX_PER_HOST", "4"))
+MAX_PER_DATASTORE = int(os.getenv("SNAPSHOT_SWEEP_MAX_PER_DATASTORE", "2"))
+MAX_PER_VCENTER = int(os.getenv("SNAPSHOT_SWEEP_MAX_PER_VCENTER", "16"))
+TASK_TIMEOUT = int(os.getenv("SNAPSHOT_SWEEP_TASK_TIMEOUT", "3600"))
+PAGE_SIZE = int(os.getenv("SNAPSHOT_SWEEP_PAGE_SIZE", "1000"))
+
+MODES = ["report", "delete"]
+
+# Snapshot description içindeki otomasyon retention işareti (snapshot_create.yaml yazar);
+# genel "Retention: Nd" metni eşleşmez, otomasyon dışı snapshot'lar silinmez
+RETENTION_PATTERN = re.compile(r"\bsnapshot-automation retention=(\d+)d\b")
+
+# ============================================
+# SCAN
+# ============================================
+
+def get_retention_days(description):
+    """Parse retention days from snapshot description (None if not managed)"""
+    match = RETENTION_PATTERN.search(description or "")
+    return int(match.group(1)) if match else None
+
+def scan_expired_snapshots(si, vc_host, now):
+    """Find expired snapshots of all VMs in one vCenter
+    
+    name / snapshot tree / placement of every VM come from one paged
+    PropertyCollector retrieval over a container view; only expired
+    snapshots are kept in memory.
+    
+    Returns: (scanned_vm_count, [expired snapshot dicts])
+    """
+    content = si.RetrieveContent()
+    container = content.viewManager.CreateContainerView(
+        content.rootFolder, [vim.VirtualMachine], True
+    )
+    
+    scanned = 0
+    expired = []
+    try:
+        path_set = ["name", "snapshot.rootSnapshotList", "runtime.host", "datastore"]
+        for vm, props in retrieve_view_properties(content, container, vim.VirtualMachine, path_set, page_size=PAGE_SIZE):
+            scanned += 1
+            snapshot_list = props.get("snapshot.rootSnapshotList")
+            if not snapshot_list:
+                continue
+            
+            for node in iter_snapshot_tree(snapshot_list):
+                retention_days = get_retention_days(node.description)
+                if retention_days is None:
+                    continue
+                
+                expires_at = node.createTime + timedelta(days=retention_days)
+                if expires_at > now:
+                    continue
+                
+                host = props.get("runtime.host")
+                expired.append({
+                    "vm": props.get("name"),
+                    "vcenter_hostname": vc_host,
+                    "snapshot": node.name,
+                    "created": node.createTime.isoformat(),
+                    "expired_at": expires_at.isoformat(),
+                    "retention_days": retention_days,
+                    "vm_id": vm._moId,
+                    "host": host._moId if host is not None else None,
+                    "datastores": [ds._moId for ds in (props.get("datastore") or [])],
+                    "snapshot_obj": node.snapshot
+                })
+    finally:
+        container.Destroy()
+    
+    return scanned, expired
+
+# ============================================
+# DELETE
+# ============================================
+
+def remove_expired_snapshots(si, expired):
+    """Remove expired snapshots with host/datastore throttling
+    
+    vCenter runs one snapshot operation per VM at a time, so removals are
+    done in passes: pass N removes the N-th expired snapshot of every VM
+    and all tasks of a pass are multiplexed by run_throttled_tasks.
+    
+    Returns: {index in expired: {"state", "message", "duration_sec"}}
+    """
+    per_vm = {}
+    for index, item in enumerate(expired):
+        per_vm.setdefault(item["vm_id"], []).append(index)
+    
+    results = {}
+    pass_count = max((len(indexes) for indexes in per_vm.values()), default=0)
+    for pass_no in range(pass_count):
+        jobs = []
+        for indexes in per_vm.values():
+            if pass_no >= len(indexes):
+                continue
+            index = indexes[pass_no]
+            item = expired[index]
+            jobs.append({
+                "key": index,
+                "host": item["host"],
+                "datastores": item["datastores"],
+                "start": lambda snapshot=item["snapshot_obj"]: snapshot.RemoveSnapshot_Task(
+                    removeChildren=False,
+                    consolidate=True
+                )
+            })
+        
+        print(f"[INFO]   Pass {pass_no + 1}/{pass_count}: {len(jobs)} snapshot(s)", file=sys.stderr)
+        results.update(run_throttled_tasks(
+            si,
+            jobs,
+            max_per_host=MAX_PER_HOST,
+            max_per_datastore=MAX_PER_DATASTORE,
+            max_in_flight=MAX_PER_VCENTER,
+            timeout=TASK_TIMEOUT
+        ))
+    
+    return results
+
+def sweep_vcenter(vc_host, now):
+    """Scan (and in delete mode remove) expired snapshots of one vCenter
+    
+    Errors are returned in the result ("error"), never raised, so one failing
+    vCenter does not hide the results of the others.
+    """
+    si = get_vcenter_connection(vc_host)
+    if not si:
+        return {"vcenter_hostname": vc_host, "error": f"Failed to connect to {vc_host}", "scanned": 0, "items": []}
+    
+    print(f"[INFO] Scanning {vc_host}", file=sys.stderr)
+    try:
+        scanned, expired = scan_expired_snapshots(si, vc_host, now)
+    except Exception as e:
+        print(f"[ERROR] Snapshot scan failed on {vc_host}: {str(e)}", file=sys.stderr)
+        return {"vcenter_hostname": vc_host, "error": f"Snapshot scan failed on {vc_host}: {str(e)}", "scanned": 0, "items": []}
+    print(f"[INFO] {vc_host}: {scanned} VM(s) scanned, {len(expired)} expired snapshot(s)", file=sys.stderr)
+    
+    task_results = {}
+    error = None
+    if MODE == "delete" and expired:
+        try:
+            task_results = remove_expired_snapshots(si, expired)
+        except Exception as e:
+            # Sonucu alınamayan silmeler "failed" olarak raporlanır
+            print(f"[ERROR] Snapshot removal failed on {vc_host}: {str(e)}", file=sys.stderr)
+            error = f"Snapshot removal failed on {vc_host}: {str(e)}"
+    
+    items = []
+    for index, item in enumerate(expired):
+        record = {key: value for key, value in item.items() if key not in ("snapshot_obj", "host", "datastores", "vm_id")}
+        if MODE == "delete":
+            task_result = task_results.get(index, {"state": "error", "message": "No task result"})
+            record["status"] = "deleted" if task_result["state"] == "success" else "failed"
+            record["message"] = task_result["message"]
+        else:
+            record["status"] = "expired"
+        items.append(record)
+    
+    result = {"vcenter_hostname": vc_host, "scanned": scanned, "items": items}
+    if error:
+        result["error"] = error
+    return result
+
+# ============================================
+# MAIN
+# ============================================
+
+def main():
+    """Main entry point"""
+    if MODE not in MODES:
+        print(json.dumps({"success": False, "error": f"Invalid mode: {MODE} ({', '.join(MODES)})"}))
+        sys.exit(1)
+    
+    if not VC_USERNAME or not VC_PASSWORD:
+        print(json.dumps({"success": False, "error": "Missing vCenter credentials"}))
+        sys.exit(1)
+    
+    vc_hosts = parse_vcenters(VCENTERS_JSON)
+    now = datetime.now(timezone.utc)
+    start_time = time.time()
+    
+    print("=" * 60, file=sys.stderr)
+    print(f"EXPIRED SNAPSHOT SWEEP - {MODE.upper()}", file=sys.stderr)
+    print("=" * 60, file=sys.stderr)
+    print(f"[INFO] vCenters: {', '.join(vc_hosts)}", file=sys.stderr)
+    print(f"[INFO] Now: {now.isoformat()}", file=sys.stderr)
+    print("=" * 60, file=sys.stderr)
+    
+    try:
+        # vCenter'lar paralel taranır (her biri kendi oturumu ile)
+        with ThreadPoolExecutor(max_workers=len(vc_hosts)) as executor:
+            vc_results = list(executor.map(lambda vc_host: sweep_vcenter(vc_host, now), vc_hosts))
+        
+        items = [item for vc_result in vc_results for item in vc_result["items"]]
+        errors = [vc_result["error"] for vc_result in vc_results if vc_result.get("error")]
+        errors += [f"Snapshot silme hatası ({item['vm']}/{item['snapshot']}): {item['message']}"
+                   for item in items if item["status"] == "failed"]
+        
+        results = {
+            "success": True,
+            "mode": MODE,
+            "now": now.isoformat(),
+            "duration_sec": round(time.time() - start_time, 1),
+            "scanned_vms": sum(vc_result["scanned"] for vc_result in vc_results),
+            "expired_snapshots": len(items),
+            "deleted": [item for item in items if item["status"] == "deleted"],
+            "failed": [item for item in items if item["status"] == "failed"],
+            "expired": [item for item in items if item["status"] == "expired"],
+            "errors": errors
+        }
+        
+        print("\n" + "=" * 60, file=sys.stderr)
+        print("SWEEP SUMMARY", file=sys.stderr)
+        print("=" * 60, file=sys.stderr)
+        print(f"[INFO] Scanned VMs: {results['scanned_vms']}", file=sys.stderr)
+        print(f"[INFO] Expired snapshots: {results['expired_snapshots']}", file=sys.stderr)
+        if MODE == "delete":
+            print(f"[INFO] Deleted: {len(results['deleted'])}", file=sys.stderr)
+            print(f"[INFO] Failed: {len(results['failed'])}", file=sys.stderr)
+        for error in errors:
+            print(f"  - {error}", file=sys.stderr)
+        print("=" * 60, file=sys.stderr)
+        
+        # Output JSON result (stdout for Ansible parsing)
+        print(json.dumps(results, indent=2))
+    
+    finally:
+        cleanup_connections()
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        print("\n[INFO] Interrupted by user", file=sys.stderr)
+        cleanup_connections()
+        sys.exit(1)
+    except Exception as e:
+        print(f"\n[ERROR] Fatal error: {str(e)}", file=sys.stderr)
+        cleanup_connections()
+        print(json.dumps({
+            "success": False,
+            "error": f"Script error: {str(e)}"
+        }))
+        sys.exit(1)
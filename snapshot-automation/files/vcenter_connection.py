@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# Dosya: files/vcenter_connection.py
+# Açıklama: Ortak vCenter Bağlantı Katmanı (pyVmomi script'leri için)
+
+"""
+Shared vCenter Connection Layer
+- One pooled ServiceInstance per vCenter host, shared by all threads
+- Per-host lock: concurrent callers never log in twice to the same vCenter
+- Liveness probe (SessionManager.currentSession) before reusing an idle session
+- Expired sessions are re-logged on the same stub, so cached morefs stay valid
+- call_with_reconnect(): retries an operation once after NotAuthenticated
+- Failed connects are not cached: the host is retried after an exponential backoff
+- Optional keepalive thread (VC_KEEPALIVE_INTERVAL seconds, 0 = off)
+- Opt-in SOAP call instrumentation (VC_INSTRUMENT): counts and times every
+  stub call by managed-object type and method, with an optional call budget
+
+Used by find_vms_for_snapshot.py (and the snapshot scripts importing it),
+find_available_vm_final.py and find_available_vm_improved.py.
+"""
+
+import ssl
+import os
+import sys
+import threading
+import time
+from pyVim.connect import SmartConnect, Disconnect
+from pyVmomi import vim
+
+# Credentials from environment variables
+VC_USERNAME = os.getenv("VC_USER")
+VC_PASSWORD = os.getenv("VC_PASS")
+
+# Tuning from environment variables
+PROBE_INTERVAL = float(os.getenv("VC_PROBE_INTERVAL", "60"))
+CONNECT_BACKOFF = float(os.getenv("VC_CONNECT_BACKOFF", "5"))
+CONNECT_BACKOFF_MAX = float(os.getenv("VC_CONNECT_BACKOFF_MAX", "300"))
+KEEPALIVE_INTERVAL = float(os.getenv("VC_KEEPALIVE_INTERVAL", "0"))
+CALL_BUDGET = int(os.getenv("VC_CALL_BUDGET", "0"))
+CALL_BUDGET_ACTION = os.getenv("VC_CALL_BUDGET_ACTION", "warn").lower()  # warn | fail
+INSTRUMENT = os.getenv("VC_INSTRUMENT", "false").lower() == "true" or CALL_BUDGET > 0
+
+# SSL context
+ssl_context = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
+ssl_context.check_hostname = False
+ssl_context.verify_mode = ssl.CERT_NONE
+
+# Connection pool: vc_host -> ServiceInstance
+VC_CONNECTIONS = {}
+
+# vc_host -> time of the last successful use or probe
+LAST_CHECKED = {}
+
+# vc_host -> {"failures": n, "retry_at": timestamp} (failed connects, backoff)
+FAILED_CONNECTS = {}
+
+# Called with vc_host when a host gets a new ServiceInstance (old morefs are invalid)
+RECONNECT_HOOKS = []
+
+HOST_LOCKS = {}
+HOST_LOCKS_GUARD = threading.Lock()
+
+KEEPALIVE_STOP = threading.Event()
+KEEPALIVE_THREAD = None
+
+# SOAP call statistics: "<mo type>.<method/property>" -> {"kind", "calls", "time"}
+CALL_STATS = {}
+CALL_STATS_LOCK = threading.Lock()
+CALL_COUNTERS = {"total": 0, "logins": 0, "budget_warned": False}
+
+def log(message):
+    """Connection layer logs go to stderr (stdout is reserved for JSON output)"""
+    print(message, file=sys.stderr)
+
+def get_host_lock(vc_host):
+    """Return the lock serializing logins to one vCenter"""
+    with HOST_LOCKS_GUARD:
+        if vc_host not in HOST_LOCKS:
+            HOST_LOCKS[vc_host] = threading.Lock()
+        return HOST_LOCKS[vc_host]
+
+def add_reconnect_hook(hook):
+    """Register hook(vc_host), called when a host's ServiceInstance is replaced"""
+    if hook not in RECONNECT_HOOKS:
+        RECONNECT_HOOKS.append(hook)
+
+# ============================================
+# SESSION HANDLING
+# ============================================
+
+def is_session_alive(si):
+    """Liveness probe: currentSession is None once the session has expired"""
+    try:
+        return si.content.sessionManager.currentSession is not None
+    except vim.fault.NotAuthenticated:
+        return False
+    except Exception:
+        return False
+
+def relogin(si):
+    """Log in again on the existing stub (keeps morefs bound to it valid)"""
+    try:
+        si.content.sessionManager.Login(userName=VC_USERNAME, password=VC_PASSWORD)
+        if INSTRUMENT:
+            CALL_COUNTERS["logins"] += 1
+        return True
+    except Exception:
+        return False
+
+def connect(vc_host):
+    """Open a new session; failures are recorded for backoff instead of cached"""
+    failed = FAILED_CONNECTS.get(vc_host)
+    if failed and time.time() < failed["retry_at"]:
+        log(f"[WARN] Skipping connect to {vc_host}: backoff until {time.strftime('%H:%M:%S', time.localtime(failed['retry_at']))}")
+        return None
+    
+    try:
+        si = SmartConnect(
+            host=vc_host,
+            user=VC_USERNAME,
+            pwd=VC_PASSWORD,
+            sslContext=ssl_context
+        )
+    except Exception as e:
+        failures = (failed["failures"] if failed else 0) + 1
+        delay = min(CONNECT_BACKOFF * 2 ** (failures - 1), CONNECT_BACKOFF_MAX)
+        FAILED_CONNECTS[vc_host] = {"failures": failures, "retry_at": time.time() + delay}
+        log(f"[ERROR] Failed to connect to {vc_host}: {str(e)} (retry in {delay:.0f}s)")
+        return None
+    
+    FAILED_CONNECTS.pop(vc_host, None)
+    if INSTRUMENT:
+        CALL_COUNTERS["logins"] += 1
+        instrument_stub(si._stub)
+    return si
+
+def get_vcenter_connection(vc_host):
+    """Get a live vCenter connection from the pool (connects on first use)
+    
+    A pooled session idle for more than PROBE_INTERVAL seconds is probed
+    first; an expired one is re-logged on the same stub, or replaced by a
+    new connection (reconnect hooks are called) if that fails. Returns
+    None when the host cannot be reached (see FAILED_CONNECTS backoff).
+    """
+    with get_host_lock(vc_host):
+        si = VC_CONNECTIONS.get(vc_host)
+        
+        if si is not None and time.time() - LAST_CHECKED.get(vc_host, 0) > PROBE_INTERVAL:
+            if not is_session_alive(si):
+                log(f"[WARN] vCenter session expired for {vc_host}, reconnecting")
+                if not relogin(si):
+                    drop_connection(vc_host)
+                    si = None
+        
+        if si is None:
+            replaced = vc_host in LAST_CHECKED
+            si = connect(vc_host)
+            if si is None:
+                return None
+            VC_CONNECTIONS[vc_host] = si
+            if replaced:
+                for hook in RECONNECT_HOOKS:
+                    hook(vc_host)
+            start_keepalive()
+        
+        LAST_CHECKED[vc_host] = time.time()
+        return si
+
+def drop_connection(vc_host):
+    """Remove a host from the pool and close its session (best effort)"""
+    si = VC_CONNECTIONS.pop(vc_host, None)
+    if si is not None:
+        try:
+            Disconnect(si)
+        except Exception:
+            pass
+
+def call_with_reconnect(vc_host, operation):
+    """Run operation(si), reconnecting and retrying once on NotAuthenticated
+    
+    If the connection was replaced, morefs bound to the old stub are dead:
+    operation must resolve (or rebind) its morefs from the si it receives.
+    Returns operation's result, or None if no connection can be made.
+    """
+    si = get_vcenter_connection(vc_host)
+    if si is None:
+        return None
+    
+    try:
+        return operation(si)
+    except vim.fault.NotAuthenticated:
+        log(f"[WARN] NotAuthenticated on {vc_host}, reconnecting and retrying")
+        LAST_CHECKED[vc_host] = 0
+        si = get_vcenter_connection(vc_host)
+        if si is None:
+            return None
+        return operation(si)
+
+# ============================================
+# SOAP CALL INSTRUMENTATION
+# ============================================
+
+def record_call(kind, mo, info, elapsed):
+    """Add one stub call to CALL_STATS (warns once when the budget is exceeded)"""
+    key = f"{getattr(mo, '_wsdlName', type(mo).__name__)}.{getattr(info, 'name', '?')}"
+    with CALL_STATS_LOCK:
+        stats = CALL_STATS.setdefault(key, {"kind": kind, "calls": 0, "time": 0.0})
+        stats["calls"] += 1
+        stats["time"] += elapsed
+        CALL_COUNTERS["total"] += 1
+        over_budget = CALL_BUDGET > 0 and CALL_COUNTERS["total"] > CALL_BUDGET and not CALL_COUNTERS["budget_warned"]
+        if over_budget:
+            CALL_COUNTERS["budget_warned"] = True
+    if over_budget:
+        log(f"[WARN] vCenter call budget exceeded: more than {CALL_BUDGET} SOAP calls")
+
+def instrument_stub(stub):
+    """Wrap InvokeMethod of a SOAP stub adapter
+    
+    Every managed-object method call goes through InvokeMethod. Lazy
+    property reads do too: InvokeAccessor turns them into a "Fetch"
+    method call on the same stub, so only InvokeMethod is wrapped (each
+    round trip is counted once) and Fetch calls are filed as "property".
+    The login itself is counted under "logins".
+    """
+    if getattr(stub, "_call_instrumented", False):
+        return
+    
+    invoke_method = stub.InvokeMethod
+    
+    def timed_invoke_method(mo, info, args):
+        kind = "property" if getattr(info, "wsdlName", None) == "Fetch" else "method"
+        start = time.perf_counter()
+        try:
+            return invoke_method(mo, info, args)
+        finally:
+            record_call(kind, mo, info, time.perf_counter() - start)
+    
+    stub.InvokeMethod = timed_invoke_method
+    stub._call_instrumented = True
+
+def get_call_summary():
+    """Return the SOAP call summary for JSON output (None if not enabled)"""
+    if not INSTRUMENT:
+        return None
+    
+    with CALL_STATS_LOCK:
+        by_call = sorted(CALL_STATS.items(), key=lambda item: item[1]["calls"], reverse=True)
+        return {
+            "total_calls": CALL_COUNTERS["total"],
+            "total_time_sec": round(sum(stats["time"] for _, stats in by_call), 3),
+            "logins": CALL_COUNTERS["logins"],
+            "by_call": [
+                {"call": key, "kind": stats["kind"], "calls": stats["calls"], "time_sec": round(stats["time"], 3)}
+                for key, stats in by_call
+            ],
+            "budget": {
+                "limit": CALL_BUDGET,
+                "action": CALL_BUDGET_ACTION,
+                "exceeded": CALL_BUDGET > 0 and CALL_COUNTERS["total"] > CALL_BUDGET
+            }
+        }
+
+def check_call_budget():
+    """Return an error message if the call budget is exceeded in "fail" mode"""
+    if CALL_BUDGET <= 0 or CALL_COUNTERS["total"] <= CALL_BUDGET:
+        return None
+    
+    message = f"vCenter call budget exceeded: {CALL_COUNTERS['total']} SOAP calls (budget {CALL_BUDGET})"
+    if CALL_BUDGET_ACTION == "fail":
+        return message
+    return None
+
+# ============================================
+# KEEPALIVE
+# ============================================
+
+def keepalive_loop():
+    """Probe every pooled session periodically (keeps idle sessions alive)"""
+    while not KEEPALIVE_STOP.wait(KEEPALIVE_INTERVAL):
+        for vc_host in list(VC_CONNECTIONS):
+            with get_host_lock(vc_host):
+                si = VC_CONNECTIONS.get(vc_host)
+                if si is None:
+                    continue
+                if is_session_alive(si) or relogin(si):
+                    LAST_CHECKED[vc_host] = time.time()
+                else:
+                    log(f"[WARN] Keepalive failed for {vc_host}")
+
+def start_keepalive():
+    """Start the keepalive thread once (only if VC_KEEPALIVE_INTERVAL > 0)"""
+    global KEEPALIVE_THREAD
+    if KEEPALIVE_INTERVAL <= 0 or KEEPALIVE_THREAD is not None:
+        return
+    KEEPALIVE_STOP.clear()
+    KEEPALIVE_THREAD = threading.Thread(target=keepalive_loop, name="vcenter-keepalive", daemon=True)
+    KEEPALIVE_THREAD.start()
+
+def cleanup_connections():
+    """Stop keepalive and disconnect all pooled vCenter connections"""
+    global KEEPALIVE_THREAD
+    KEEPALIVE_STOP.set()
+    KEEPALIVE_THREAD = None
+    
+    for vc_host in list(VC_CONNECTIONS):
+        drop_connection(vc_host)
+    LAST_CHECKED.clear()
@@ -0,0 +1,287 @@
+#!/usr/bin/env python3
+# Dosya: files/vsphere_helpers.py
+# Açıklama: Ortak pyVmomi Yardımcıları (snapshot script'leri için)
+
+"""
+Shared pyVmomi Helpers
+- PropertyCollector retrievals (container view traversal, explicit object lists)
+- Snapshot tree iteration
+- Throttled vCenter task multiplexing (one ListView + WaitForUpdatesEx)
+- vCenter list parsing for the per-vCenter scripts
+
+Has no command line parameters: the scripts read their own sys.argv and
+import these helpers without importing each other.
+Used by find_vms_for_snapshot.py, snapshot_executor.py, snapshot_sweeper.py
+and snapshot_report.py.
+"""
+
+import json
+import sys
+import time
+from collections import Counter, deque
+from pyVmomi import vim, vmodl
+
+# WaitForUpdatesEx wait per round (seconds); task timeouts are checked between rounds
+TASK_WAIT_INTERVAL = 30
+
+# ============================================
+# PROPERTY COLLECTOR
+# ============================================
+
+def retrieve_view_properties(content, view, obj_type, path_set, page_size=None):
+    """Retrieve properties of every object in a container view
+    
+    Uses a single PropertyCollector filter traversing the view instead of
+    reading lazy properties object by object. Results are paged by the
+    server (page_size = maxObjects) and yielded as (obj, {path: value}).
+    """
+    traversal_spec = vmodl.query.PropertyCollector.TraversalSpec(
+        name="traverseView",
+        path="view",
+        skip=False,
+        type=vim.view.ContainerView
+    )
+    obj_spec = vmodl.query.PropertyCollector.ObjectSpec(
+        obj=view,
+        skip=True,
+        selectSet=[traversal_spec]
+    )
+    prop_spec = vmodl.query.PropertyCollector.PropertySpec(
+        type=obj_type,
+        pathSet=path_set,
+        all=False
+    )
+    filter_spec = vmodl.query.PropertyCollector.FilterSpec(
+        objectSet=[obj_spec],
+        propSet=[prop_spec]
+    )
+    options = vmodl.query.PropertyCollector.RetrieveOptions(maxObjects=page_size)
+    
+    collector = content.propertyCollector
+    result = collector.RetrievePropertiesEx([filter_spec], options)
+    while result:
+        for obj_content in result.objects:
+            props = {prop.name: prop.val for prop in (obj_content.propSet or [])}
+            yield obj_content.obj, props
+        if not result.token:
+            break
+        result = collector.ContinueRetrievePropertiesEx(result.token)
+
+def retrieve_objects_properties(content, objects, obj_type, path_set, select_set=None, extra_prop_specs=None):
+    """Retrieve properties of an explicit list of managed objects in one call
+    
+    All objects go into a single FilterSpec (one ObjectSpec each), so the
+    round trip count does not grow with the number of objects. select_set /
+    extra_prop_specs allow following references (e.g. VM -> datastore) in
+    the same retrieval. Returns a list of (obj, {path: value}).
+    """
+    if not objects:
+        return []
+    
+    obj_specs = [
+        vmodl.query.PropertyCollector.ObjectSpec(obj=obj, skip=False, selectSet=select_set or [])
+        for obj in objects
+    ]
+    prop_specs = [
+        vmodl.query.PropertyCollector.PropertySpec(type=obj_type, pathSet=path_set, all=False)
+    ] + list(extra_prop_specs or [])
+    filter_spec = vmodl.query.PropertyCollector.FilterSpec(
+        objectSet=obj_specs,
+        propSet=prop_specs
+    )
+    
+    collector = content.propertyCollector
+    results = []
+    result = collector.RetrievePropertiesEx([filter_spec], vmodl.query.PropertyCollector.RetrieveOptions())
+    while result:
+        for obj_content in result.objects:
+            props = {prop.name: prop.val for prop in (obj_content.propSet or [])}
+            results.append((obj_content.obj, props))
+        if not result.token:
+            break
+        result = collector.ContinueRetrievePropertiesEx(result.token)
+    return results
+
+# ============================================
+# SNAPSHOT TREE
+# ============================================
+
+def iter_snapshot_tree(snapshot_list):
+    """Yield every node of a snapshot tree (rootSnapshotList) depth-first"""
+    stack = list(snapshot_list or [])
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(node.childSnapshotList or [])
+
+# ============================================
+# TASK MULTIPLEXING
+# ============================================
+
+def get_task_error_message(error):
+    """Extract readable message from a task MethodFault"""
+    if error is None:
+        return "Unknown error"
+    message = getattr(error, "msg", None) or getattr(error, "localizedMessage", None)
+    return message or str(error)
+
+def run_throttled_tasks(si, jobs, max_per_host, max_per_datastore, max_in_flight, timeout):
+    """Run vCenter tasks with concurrency caps, waiting on all of them together
+    
+    jobs: list of dicts with keys
+      - key: unique job key (used in the result dict)
+      - host: host moref id the job is placed on (or None)
+      - datastores: list of datastore moref ids the job touches
+      - start: callable returning a vim.Task
+    
+    Started tasks are added to one ListView; a private PropertyCollector
+    has a single filter on that view for info.state / info.error, so one
+    WaitForUpdatesEx call reports every task that changed instead of
+    polling each task.
+    
+    Returns: {key: {"state": "success"|"error", "message": str, "duration_sec": float}}
+    """
+    results = {}
+    if not jobs:
+        return results
+    
+    content = si.RetrieveContent()
+    collector = content.propertyCollector.CreatePropertyCollector()
+    task_view = content.viewManager.CreateListView([])
+    
+    traversal_spec = vmodl.query.PropertyCollector.TraversalSpec(
+        name="traverseTasks",
+        path="view",
+        skip=False,
+        type=vim.view.ListView
+    )
+    filter_spec = vmodl.query.PropertyCollector.FilterSpec(
+        objectSet=[vmodl.query.PropertyCollector.ObjectSpec(obj=task_view, skip=True, selectSet=[traversal_spec])],
+        propSet=[vmodl.query.PropertyCollector.PropertySpec(type=vim.Task, pathSet=["info.state", "info.error"], all=False)]
+    )
+    collector.CreateFilter(filter_spec, partialUpdates=False)
+    
+    pending = deque(jobs)
+    in_flight = {}  # task moref id -> (job, task, start_time)
+    host_load = Counter()
+    datastore_load = Counter()
+    
+    def fits(job):
+        if len(in_flight) >= max_in_flight:
+            return False
+        if job.get("host") and host_load[job["host"]] >= max_per_host:
+            return False
+        return all(datastore_load[ds] < max_per_datastore for ds in job.get("datastores", []))
+    
+    def release(job):
+        if job.get("host"):
+            host_load[job["host"]] -= 1
+        for ds in job.get("datastores", []):
+            datastore_load[ds] -= 1
+    
+    def admit():
+        started = []
+        for _ in range(len(pending)):
+            job = pending.popleft()
+            if not fits(job):
+                pending.append(job)
+                continue
+            try:
+                task = job["start"]()
+            except Exception as e:
+                results[job["key"]] = {"state": "error", "message": str(e), "duration_sec": 0.0}
+                continue
+            if job.get("host"):
+                host_load[job["host"]] += 1
+            for ds in job.get("datastores", []):
+                datastore_load[ds] += 1
+            in_flight[task._moId] = (job, task, time.time())
+            started.append(task)
+        if started:
+            task_view.ModifyListView(add=started)
+        return started
+    
+    try:
+        admit()
+        version = ""
+        wait_options = vmodl.query.PropertyCollector.WaitOptions(maxWaitSeconds=TASK_WAIT_INTERVAL)
+        
+        while in_flight:
+            update = collector.WaitForUpdatesEx(version, wait_options)
+            finished = []
+            
+            if update:
+                version = update.version
+                for filter_set in update.filterSet or []:
+                    for obj_update in filter_set.objectSet or []:
+                        task_id = obj_update.obj._moId
+                        if task_id not in in_flight:
+                            continue
+                        changes = {change.name: change.val for change in (obj_update.changeSet or [])}
+                        state = changes.get("info.state")
+                        if state not in ("success", "error"):
+                            continue
+                        job, task, started_at = in_flight.pop(task_id)
+                        results[job["key"]] = {
+                            "state": state,
+                            "message": "" if state == "success" else get_task_error_message(changes.get("info.error")),
+                            "duration_sec": round(time.time() - started_at, 1)
+                        }
+                        release(job)
+                        finished.append(task)
+            
+            # Timeout kontrolü
+            now = time.time()
+            for task_id, (job, task, started_at) in list(in_flight.items()):
+                if now - started_at > timeout:
+                    in_flight.pop(task_id)
+                    results[job["key"]] = {
+                        "state": "error",
+                        "message": f"Task timeout ({timeout}s)",
+                        "duration_sec": round(now - started_at, 1)
+                    }
+                    release(job)
+                    finished.append(task)
+            
+            if finished:
+                task_view.ModifyListView(remove=finished)
+                admit()
+        
+        # Admit edilemeyen job kalmamalı, kaldıysa hata olarak işaretle
+        for job in pending:
+            results[job["key"]] = {"state": "error", "message": "Job could not be scheduled", "duration_sec": 0.0}
+        
+        return results
+    
+    finally:
+        try:
+            collector.Destroy()
+        except Exception:
+            pass
+        try:
+            task_view.Destroy()
+        except Exception:
+            pass
+
+# ============================================
+# VCENTER LIST
+# ============================================
+
+def parse_vcenters(vcenters_json):
+    """Parse vCenter list (vcenter_list entries or hostname strings)"""
+    try:
+        vcenters = json.loads(vcenters_json)
+    except json.JSONDecodeError:
+        print(json.dumps({"success": False, "error": "Invalid vCenter list JSON"}))
+        sys.exit(1)
+    
+    if not vcenters or not isinstance(vcenters, list):
+        print(json.dumps({"success": False, "error": "No vCenters provided"}))
+        sys.exit(1)
+    
+    hostnames = []
+    for vc in vcenters:
+        hostname = vc.get("hostname") if isinstance(vc, dict) else str(vc)
+        if hostname and hostname not in hostnames:
+            hostnames.append(hostname)
+    return hostnames
@@ -0,0 +1 @@
+snapshot-automation/files/vcenter_connection.py
\ No newline at end of file